@@ -3,9 +3,13 @@ from pages.summary_page import SummaryPage
 from pages.expenses_page import ExpensesPage
 from pages.analytics_page import AnalyticsPage
 from pages.settings_page import AccountSettingsPage
+from utils.profiler import profile_action
+
+# Delay before the hidden tabs are built in the background after the first paint
+PREFETCH_DELAY_MS = 1500
 
 class MainApp(ctk.CTkFrame):
-    def __init__(self, parent, controller):
+    def __init__(self, parent, controller, prefetch=True):
         super().__init__(parent)
         self.controller = controller
         self.pack(expand=True, fill="both")
@@ -13,17 +17,16 @@ class MainApp(ctk.CTkFrame):
         self.tabview = ctk.CTkTabview(self)
         self.tabview.pack(expand=True, fill="both", padx=20, pady=20)
 
-        self.tab_summary = self.tabview.add("Summary Page (Dashboard)")
-        self.tab_expenses = self.tabview.add("Expenses Management Page")
-        self.tab_analytics = self.tabview.add("Analytics")
-        self.tab_settings = self.tabview.add("Account Settings")
-
-        self.pages = {
-            "summary": SummaryPage(self.tab_summary, controller),
-            "expenses": ExpensesPage(self.tab_expenses, controller),
-            "analytics": AnalyticsPage(self.tab_analytics, controller),
-            "settings": AccountSettingsPage(self.tab_settings, controller),
+        # Pages are built (and start loading data) only when their tab is first shown
+        self.page_specs = {
+            "summary": ("Summary Page (Dashboard)", SummaryPage),
+            "expenses": ("Expenses Management Page", ExpensesPage),
+            "analytics": ("Analytics", AnalyticsPage),
+            "settings": ("Account Settings", AccountSettingsPage),
         }
+        self.tabs = {key: self.tabview.add(name) for key, (name, _) in self.page_specs.items()}
+        self.pages = {}
+        self.ensure_page("summary")
 
         self.tabview.configure(command=self.on_tab_change)
 
@@ -31,6 +34,36 @@ class MainApp(ctk.CTkFrame):
                                    command=self.controller.show_login)
         logout_btn.place(relx=0.92, rely=0.02)
 
+        if prefetch:
+            self.after(PREFETCH_DELAY_MS, self.prefetch_next_page)
+
+    def ensure_page(self, key):
+        """Builds the page for `key` if it does not exist yet and returns it."""
+        page = self.pages.get(key)
+        if page is None:
+            _, page_class = self.page_specs[key]
+            page = self.pages[key] = page_class(self.tabs[key], self.controller)
+        return page
+
+    def prefetch_next_page(self):
+        """Builds one hidden page per idle slot so the UI stays responsive."""
+        for key in self.page_specs:
+            if key not in self.pages:
+                self.ensure_page(key)
+                self.after_idle(lambda: self.after(50, self.prefetch_next_page))
+                return
+
     def on_tab_change(self):
-        if self.tabview.get() == "Summary Page (Dashboard)":
-            self.pages["summary"].refresh()
+        profile_action("tab_switch")
+        store = self.controller.expense_store
+        if store and store.loaded:
+            # Pick up changes made elsewhere; costs one small delta query
+            store.sync()
+        selected = self.tabview.get()
+        for key, (name, _) in self.page_specs.items():
+            if name == selected:
+                already_built = key in self.pages
+                page = self.ensure_page(key)
+                if key == "summary" and already_built:
+                    page.refresh()
+                return
@@ -0,0 +1,4 @@
+"""Offline benchmarks for the data layer and the analytics computations.
+
+Run with `python -m benchmarks --expenses 100000`; see benchmarks/runner.py.
+"""
@@ -0,0 +1,283 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+from benchmarks.synthetic import generate_expenses, populate, write_csv
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# A median this much slower than the baseline is reported as a regression
+REGRESSION_RATIO = 1.2
+
+
+class Bench:
+    """Collects the timings of named benchmarks."""
+
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = {}
+
+    def measure(self, name, fn, *args, repeat=None, setup=None, **kwargs):
+        """Runs `fn` `repeat` times and records min/median/mean seconds.
+
+        `setup()`, if given, runs untimed before every run and its result is
+        passed as the first argument. If `fn` returns an int or a sequence of
+        rows (not a dict or tuple record), it is recorded as the row count.
+        """
+        timings, rows = [], None
+        for _ in range(repeat or self.repeat):
+            call_args = (setup(),) + args if setup else args
+            started = time.perf_counter()
+            result = fn(*call_args, **kwargs)
+            timings.append(time.perf_counter() - started)
+            if isinstance(result, int) and not isinstance(result, bool):
+                rows = result
+            elif hasattr(result, "__len__") and not isinstance(result, (dict, tuple, str)):
+                rows = len(result)
+        self.results[name] = {
+            "runs": len(timings),
+            "min": min(timings),
+            "median": statistics.median(timings),
+            "mean": statistics.fmean(timings),
+            "rows": rows,
+        }
+        print(f"{name:<48} {statistics.median(timings) * 1000:>11.2f} ms  rows={rows}")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(RESULTS_DIR)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ------------ BENCHMARK GROUPS ------------
+
+def bench_queries(bench, database, user_id, year, month):
+    bench.measure("get_user", database.get_user, "bench_user_0")
+    bench.measure("load_user_settings", database.load_user_settings, user_id)
+    bench.measure("fetch_expenses", database.fetch_expenses, user_id)
+    bench.measure("fetch_expenses(limit=100)", database.fetch_expenses, user_id, limit=100)
+    bench.measure("fetch_expenses(as_frame)", database.fetch_expenses, user_id, as_frame=True)
+    bench.measure("fetch_expenses_page(date)", database.fetch_expenses_page, user_id)
+    bench.measure("fetch_expenses_page(amount, category)", database.fetch_expenses_page, user_id,
+                  sort_by="amount", category="Category 00")
+    bench.measure("fetch_expense_ids", database.fetch_expense_ids, user_id)
+    bench.measure("fetch_categories", database.fetch_categories, user_id)
+    bench.measure("fetch_analytics_summary", database.fetch_analytics_summary, user_id, year, month)
+    bench.measure("fetch_dashboard_bootstrap", database.fetch_dashboard_bootstrap, user_id)
+    bench.measure("fetch_changes_since(None)", lambda: database.fetch_changes_since(user_id)["upserts"])
+    watermark = database.get_change_watermark()
+    bench.measure("fetch_changes_since(watermark)",
+                  lambda: database.fetch_changes_since(user_id, watermark)["upserts"])
+    bench.measure("count_expenses", database.count_expenses, user_id)
+    bench.measure("get_total_amount", database.get_total_amount, user_id)
+    bench.measure("get_total_amount_for_month", database.get_total_amount_for_month, user_id, year, month)
+
+
+def bench_writes(bench, database, user_id, batch):
+    rows = list(generate_expenses(batch, seed=10_000))
+    # Every group removes what it added so the history size stays the same
+    added = []
+
+    def cleanup():
+        if added:
+            database.delete_expenses(user_id, added)
+            added.clear()
+
+    def insert_one(_):
+        added.append(database.insert_expense(user_id, *rows[0]))
+        return 1
+
+    def insert_many(_):
+        inserted = database.bulk_insert_expenses(user_id, rows)
+        added.extend(row[0] for row in inserted)
+        return inserted
+
+    bench.measure("insert_expense", insert_one, setup=cleanup)
+    bench.measure(f"bulk_insert_expenses({batch})", insert_many, setup=cleanup)
+    cleanup()
+    bench.measure(f"delete_expenses({batch})", lambda ids: database.delete_expenses(user_id, ids),
+                  setup=lambda: [row[0] for row in database.bulk_insert_expenses(user_id, rows)])
+
+
+def bench_import_export(bench, database, user_id, workdir, import_rows):
+    from utils.csv_export import export_expenses_csv
+    from utils.csv_import import CsvImport
+
+    csv_path = os.path.join(workdir, "import.csv")
+    write_csv(csv_path, import_rows, seed=20_000)
+    runs = iter(range(bench.repeat))
+
+    def import_user():
+        # A fresh user per run so every import starts from the same state
+        username = f"bench_import_{next(runs)}"
+        database.create_user(username, "bench")
+        return database.get_user(username)["id"]
+
+    bench.measure(f"CsvImport.run({import_rows})",
+                  lambda uid: CsvImport(uid, csv_path, checkpoint_dir=workdir).run()["inserted"],
+                  setup=import_user)
+    bench.measure("export_expenses_csv", export_expenses_csv, user_id,
+                  os.path.join(workdir, "export.csv"))
+    bench.measure("export_expenses_csv(gzip)", export_expenses_csv, user_id,
+                  os.path.join(workdir, "export.csv.gz"))
+
+    from utils.parquet_export import PARQUET_AVAILABLE, ParquetDataset
+    if not PARQUET_AVAILABLE:
+        print("pyarrow is not installed, skipping the Parquet benchmarks.")
+        return
+    root = os.path.join(workdir, "parquet")
+
+    def full_export():
+        dataset = ParquetDataset(user_id, root)
+        if os.path.exists(dataset.manifest_path):
+            os.remove(dataset.manifest_path)
+        return dataset.export()
+
+    bench.measure("ParquetDataset.export(full)", full_export)
+    bench.measure("ParquetDataset.export(no changes)", ParquetDataset(user_id, root).export)
+    bench.measure("ParquetDataset.read_frame", lambda: ParquetDataset(user_id, root).read_frame()[0])
+
+
+def bench_analytics(bench, database, user_id, year, month):
+    from utils.expense_aggregates import ExpenseAggregates
+    from utils.expense_frame import ExpenseFrame
+
+    rows = database.fetch_changes_since(user_id)["upserts"]
+    bench.measure("ExpenseFrame.from_rows", ExpenseFrame.from_rows, rows)
+    frame = ExpenseFrame.from_rows(rows)
+    bench.measure("ExpenseFrame.analytics_summary", frame.analytics_summary, year, month)
+    bench.measure("ExpenseFrame.group_by_month_category", frame.group_by_month_category)
+    bench.measure("ExpenseAggregates.from_frame", ExpenseAggregates.from_frame, frame)
+    aggregates = ExpenseAggregates.from_frame(frame)
+    bench.measure("ExpenseAggregates.analytics_summary", aggregates.analytics_summary, year, month)
+
+    changes = [(-(i + 1),) + row for i, row in enumerate(generate_expenses(1000, seed=30_000))]
+
+    def deltas():
+        for row in changes:
+            aggregates.apply_insert(row)
+        for row in changes:
+            aggregates.apply_delete(row)
+        return len(changes)
+
+    bench.measure("ExpenseAggregates.apply_insert+delete(1000)", deltas)
+
+
+# ------------ COMPARISON ------------
+
+def compare(results, baseline_path, ratio=REGRESSION_RATIO):
+    """Prints median changes against a saved run; returns the names that regressed."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline['meta'].get('commit')} ({baseline_path}):")
+    regressed = []
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if not old or not old["median"]:
+            continue
+        change = result["median"] / old["median"]
+        marker = ""
+        if change >= ratio:
+            marker = "  SLOWER"
+            regressed.append(name)
+        elif change <= 1 / ratio:
+            marker = "  faster"
+        print(f"{name:<48} {old['median'] * 1000:>11.2f} -> {result['median'] * 1000:>11.2f} ms"
+              f"  x{change:.2f}{marker}")
+    return regressed
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmarks on a synthetic SQLite database")
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--expenses", type=int, default=100_000, help="expenses per user")
+    parser.add_argument("--categories", type=int, default=12)
+    parser.add_argument("--days", type=int, default=5 * 365, help="date spread of the history")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--import-rows", type=int, default=50_000)
+    parser.add_argument("--write-batch", type=int, default=1000)
+    parser.add_argument("--groups", default="queries,writes,io,analytics",
+                        help="comma separated subset of: queries, writes, io, analytics")
+    parser.add_argument("--workdir", default=None, help="keep the database and files here")
+    parser.add_argument("--output", default=None, help="results file (JSON)")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare with")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="finance_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    # The storage backend is chosen when database.py is imported
+    os.environ["DB_BACKEND"] = "sqlite"
+    os.environ["SQLITE_PATH"] = os.path.join(workdir, "bench.db")
+    # Measure the functions themselves: no tracing wrappers, no slow-query log writes
+    os.environ["DB_METRICS"] = "0"
+    os.environ["DB_SLOW_QUERY_LOG"] = ""
+    import database
+
+    if not database.init_database():
+        sys.exit(1)
+    if database.get_user("bench_user_0") is None:
+        print(f"Generating {args.users} x {args.expenses} expenses in {workdir} ...")
+        started = time.perf_counter()
+        user_ids = populate(database, args.users, args.expenses, seed=args.seed,
+                            categories=args.categories, days=args.days)
+        print(f"Generated in {time.perf_counter() - started:.1f} s")
+    else:
+        print(f"Reusing the database in {workdir}")
+        user_ids = [database.get_user(f"bench_user_{n}")["id"] for n in range(args.users)]
+    user_id = user_ids[0]
+    last_day = date(2020, 1, 1).toordinal() + args.days - 1
+    year, month = date.fromordinal(last_day).year, date.fromordinal(last_day).month
+
+    bench = Bench(args.repeat)
+    groups = {g.strip() for g in args.groups.split(",")}
+    if "queries" in groups:
+        bench_queries(bench, database, user_id, year, month)
+    if "writes" in groups:
+        bench_writes(bench, database, user_id, args.write_batch)
+    if "io" in groups:
+        bench_import_export(bench, database, user_id, workdir, args.import_rows)
+    if "analytics" in groups:
+        bench_analytics(bench, database, user_id, year, month)
+    database.close_pool()
+
+    commit = _git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {k: v for k, v in vars(args).items()
+                       if k not in ("output", "compare", "fail_on_regression")},
+        },
+        "results": bench.results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{commit or 'unknown'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        regressed = compare(bench.results, args.compare)
+        if regressed and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
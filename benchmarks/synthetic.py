@@ -0,0 +1,61 @@
+import csv
+import random
+from datetime import date, timedelta
+
+# A small vocabulary so titles repeat like real ones do
+TITLE_WORDS = ("Coffee", "Groceries", "Rent", "Fuel", "Lunch", "Cinema", "Books", "Taxi",
+               "Pharmacy", "Gym", "Internet", "Phone", "Dinner", "Train", "Clothes", "Gift")
+
+
+def category_names(count):
+    return [f"Category {i:02d}" for i in range(count)]
+
+
+def generate_expenses(count, seed=0, categories=12, start=date(2020, 1, 1), days=5 * 365):
+    """Yields `count` (title, category, amount, 'YYYY-MM-DD') rows.
+
+    The output depends only on the arguments. Categories follow a skewed
+    distribution and amounts a log-normal one, both roughly like a real
+    history; dates are spread uniformly over `days` days from `start`.
+    """
+    rng = random.Random(seed)
+    names = category_names(categories)
+    weights = [1.0 / (i + 1) for i in range(categories)]
+    for _ in range(count):
+        title = f"{rng.choice(TITLE_WORDS)} {rng.randrange(1000)}"
+        amount = round(min(rng.lognormvariate(3.0, 1.0), 99999.0), 2)
+        expense_date = start + timedelta(days=rng.randrange(days))
+        yield title, rng.choices(names, weights)[0], amount, expense_date.isoformat()
+
+
+def populate(database, users, expenses_per_user, seed=0, categories=12, days=5 * 365,
+             batch_size=50000):
+    """Creates `users` users with `expenses_per_user` expenses each; returns their ids.
+
+    `database` is the database module (already pointed at the benchmark file).
+    Every user gets a different seed so their histories differ.
+    """
+    user_ids = []
+    for n in range(users):
+        username = f"bench_user_{n}"
+        database.create_user(username, "bench")
+        user_id = database.get_user(username)["id"]
+        rows = generate_expenses(expenses_per_user, seed=seed + n, categories=categories, days=days)
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                database.bulk_insert_expenses(user_id, batch)
+                batch = []
+        if batch:
+            database.bulk_insert_expenses(user_id, batch)
+        user_ids.append(user_id)
+    return user_ids
+
+
+def write_csv(path, count, seed=0, categories=12, days=5 * 365):
+    """Writes an import file in the format the Expenses page accepts."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["title", "category", "amount", "date"])
+        writer.writerows(generate_expenses(count, seed=seed, categories=categories, days=days))
@@ -5,6 +5,14 @@ from app_main import MainApp
 from database import get_total_amount_for_month
 from utils.currency_formatter import format_currency
 from utils.app_init import AppInitializer
+from utils.expense_store import ExpenseStore
+from utils.snapshot_cache import SnapshotCache
+from utils.parquet_export import PARQUET_AVAILABLE, ParquetDataset
+from utils.write_queue import WriteQueue
+from tkinter import messagebox
+from utils.task_scheduler import TaskScheduler
+from utils.refresh_coordinator import RefreshCoordinator
+from utils.ui_watchdog import UI_WATCHDOG_ENABLED, UiWatchdog
 
 
 class AppController(ctk.CTk):
@@ -20,7 +28,16 @@ class AppController(ctk.CTk):
         }
 
         self.current_user = None
+        self.expense_store = None
+        self.write_queue = None
+        self.scheduler = TaskScheduler(self)
+        self.refresh_coordinator = RefreshCoordinator(self)
+        self.snapshot_cache = SnapshotCache()
         self.initializer = AppInitializer(self)
+        # Opt-in main loop stall detector (UI_WATCHDOG=1)
+        self.watchdog = UiWatchdog(self) if UI_WATCHDOG_ENABLED else None
+        if self.watchdog:
+            self.watchdog.start()
 
         self.container = ctk.CTkFrame(self)
         self.container.pack(fill="both", expand=True)
@@ -28,8 +45,14 @@ class AppController(ctk.CTk):
 
     def show_login(self):
         """Displays the login screen."""
+        self.scheduler.cancel_all()
+        self.refresh_coordinator.cancel()
         for widget in self.container.winfo_children():
             widget.destroy()
+        if self.write_queue:
+            self.write_queue.stop()  # unsaved rows stay in the journal for the next login
+        self.expense_store = None
+        self.write_queue = None
         LoginFrame(self.container, self)
 
     def show_main_app(self):
@@ -39,9 +62,30 @@ class AppController(ctk.CTk):
         if not self.current_user:
             self.show_login()
             return
+        # The full snapshot is loaded lazily by the pages that need it
+        parquet_dataset = ParquetDataset(self.current_user["id"]) if PARQUET_AVAILABLE else None
+        self.expense_store = ExpenseStore(self.current_user["id"], self.scheduler,
+                                          self.refresh_coordinator, self.snapshot_cache,
+                                          parquet_dataset)
+        self.write_queue = WriteQueue(self, self.current_user["id"], self.scheduler, self.expense_store,
+                                      on_failure=self._on_queued_writes_failed,
+                                      on_rejected=self._on_queued_writes_rejected)
         self.initializer.user_id = self.current_user["id"]
         self.initializer.start_loading()
 
+    def _on_queued_writes_failed(self, count):
+        messagebox.showwarning(
+            "DB Error",
+            f"{count} new expense(s) could not be saved yet.\n"
+            "They are kept and saving is retried in the background."
+        )
+
+    def _on_queued_writes_rejected(self, rejected):
+        lines = "\n".join(f"{title}: {reason}" for title, reason in rejected[:10])
+        more = f"\n... and {len(rejected) - 10} more" if len(rejected) > 10 else ""
+        messagebox.showerror("DB Error", f"{len(rejected)} new expense(s) were rejected and not saved:\n"
+                                         f"{lines}{more}")
+
     def get_total_amount_for_month(self):
         """Returns the user's total expenses for the current month."""
         if not self.current_user:
@@ -50,12 +94,23 @@ class AppController(ctk.CTk):
         return get_total_amount_for_month(self.current_user["id"], now.year, now.month)
 
     def refresh_all_pages(self):
-        """Triggers refresh on all active pages."""
+        """Requests a (debounced) refresh of all active pages."""
         if not hasattr(self, "main_app"):
             return
         for key, page in self.main_app.pages.items():
             if hasattr(page, "refresh"):
-                page.refresh()
+                self.refresh_coordinator.request(page.refresh)
+
+    def apply_settings(self, settings_data):
+        """Applies settings that arrived after the UI was built; returns True if anything changed."""
+        changed = {k: v for k, v in settings_data.items() if self.settings.get(k) != v}
+        if not changed:
+            return False
+        self.settings.update(changed)
+        if "theme" in changed:
+            ctk.set_appearance_mode(self.settings["theme"])
+        self.refresh_all_pages()
+        return True
 
     def format_currency(self, amount: float) -> str:
         """Formats a numeric value using the chosen currency."""
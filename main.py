@@ -1,10 +1,39 @@
-import customtkinter as ctk
-from controller import AppController
-from database import init_database
+import sys
+from utils.profiler import PROFILE_ENABLED, start_session
+
+# Started before the imports below so their import time is measured
+profile_session = start_session() if PROFILE_ENABLED else None
+
+import customtkinter as ctk  # noqa: E402
+from controller import AppController  # noqa: E402
+from database import DB_BACKEND, init_database, close_pool  # noqa: E402
 
 if __name__ == "__main__":
-    init_database()
+    if profile_session:
+        profile_session.mark("imports_done")
+        profile_session.mark("init_database")
+    if not init_database():
+        print(f"Cannot open the '{DB_BACKEND}' database. Set DB_BACKEND=sqlite to run with a local database.")
+        sys.exit(1)
+    if profile_session:
+        profile_session.mark("init_database_done")
     ctk.set_appearance_mode("dark")
 
     app = AppController()
-    app.mainloop()
+    if profile_session:
+        profile_session.mark("window_created")
+        profile_session.attach(app)
+    try:
+        app.mainloop()
+    finally:
+        if app.watchdog:
+            app.watchdog.stop()
+            print(app.watchdog.format_report())
+            app.watchdog.save_report()
+        if profile_session:
+            profile_session.close()
+        if app.write_queue:
+            # A group commit in flight takes its rows out of the journal before the pool closes
+            app.write_queue.stop(timeout=10)
+        app.scheduler.shutdown()
+        close_pool()
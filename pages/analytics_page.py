@@ -1,9 +1,5 @@
 import customtkinter as ctk
-from database import fetch_expenses
 from datetime import datetime
-from collections import defaultdict
-import threading
-from tkinter import messagebox
 
 class AnalyticsPage(ctk.CTkFrame):
     def __init__(self, parent, controller):
@@ -72,6 +68,10 @@ class AnalyticsPage(ctk.CTkFrame):
         # -------------------------
         # Initial Data Refresh (Threaded)
         # -------------------------
+        # Aggregates are recomputed whenever the shared expense snapshot changes
+        self._rendered = None  # (settings, section data) last drawn, see _update_all_gui
+        if controller.expense_store:
+            controller.expense_store.subscribe(self.refresh_all)
         self.refresh_all()
 
     def refresh(self):
@@ -79,7 +79,7 @@ class AnalyticsPage(ctk.CTkFrame):
         self.refresh_all()
 
     # ---------------------------------------------------------
-    # Threaded Data Fetch
+    # Data Refresh
     # ---------------------------------------------------------
     def refresh_all(self):
         """Main entry point for refreshing all analytics data."""
@@ -87,40 +87,54 @@ class AnalyticsPage(ctk.CTkFrame):
         if not user:
             return
 
-        self.budget_label.configure(text="Loading data...")
-
-        thread = threading.Thread(target=self._fetch_analytics_data, args=(user["id"],))
-        thread.start()
-
-    def _fetch_analytics_data(self, user_id):
-        """Fetch expenses in a background thread."""
-        try:
-            expenses = fetch_expenses(user_id)
-        except Exception as e:
-            print(f"Error fetching analytics data: {e}")
-            self.controller.after(1, lambda: messagebox.showerror("DB Error", "Failed to load analytics data."))
-            expenses = []
+        now = datetime.now()
+        store = self.controller.expense_store
+        if not store or not store.loaded:
+            cached = self.controller.initializer.snapshot_analytics(now.year, now.month)
+            if cached and self._rendered is None:
+                # Previous session's numbers until the fresh snapshot arrives
+                self._update_all_gui(cached)
+            elif self._rendered is None:
+                self.budget_label.configure(text="Loading data...")
+            if store:
+                store.ensure_loaded()  # refresh_all() runs again once the snapshot arrives
+            return
 
-        self.controller.after(1, lambda: self._update_all_gui(expenses))
+        # The store keeps the aggregates up to date incrementally, so reading
+        # them is cheap enough for the Tk thread.
+        self._update_all_gui(store.analytics_summary(now.year, now.month))
 
     # ---------------------------------------------------------
     # GUI Updates (Main Thread)
     # ---------------------------------------------------------
-    def _update_all_gui(self, expenses):
-        """Perform all calculations locally and update GUI widgets."""
-        self._update_budget(expenses)
-        self._update_top5(expenses)
-        self._update_timeline(expenses)
-        self._update_charts(expenses)
+    def _update_all_gui(self, summary):
+        """Render the pre-aggregated analytics results, skipping sections that did not change."""
+        # Formatting depends on the settings, so a settings change redraws everything
+        settings = (self.controller.settings.get("currency"), self.controller.settings.get("budget"),
+                    ctk.get_appearance_mode())
+        previous = self._rendered if self._rendered and self._rendered[0] == settings else (None, {})
+        sections = {
+            "budget": (summary["month_total"],),
+            "top": (summary["top"],),
+            "recent": (summary["recent"],),
+            "charts": (summary["category_totals"], summary["monthly_totals"]),
+        }
+        updaters = {
+            "budget": self._update_budget,
+            "top": self._update_top5,
+            "recent": self._update_timeline,
+            "charts": self._update_charts,
+        }
+        for name, args in sections.items():
+            if previous[1].get(name) != args:
+                updaters[name](*args)
+        self._rendered = (settings, sections)
 
     # -------------------------
     # Budget Tracker
     # -------------------------
-    def _update_budget(self, expenses):
+    def _update_budget(self, total_month):
         """Update budget tracker based on current month expenses."""
-        current_month = datetime.now().strftime("%Y-%m")
-        total_month = sum(amount for _, _, _, amount, date in expenses if date.startswith(current_month))
-
         budget_limit = self.controller.settings.get("budget", 0.0)
         formatted_total = self.controller.format_currency(total_month)
         formatted_limit = self.controller.format_currency(budget_limit)
@@ -135,15 +149,14 @@ class AnalyticsPage(ctk.CTkFrame):
     # -------------------------
     # Top 5 Expenses
     # -------------------------
-    def _update_top5(self, expenses):
+    def _update_top5(self, top5):
         for widget in self.top5_frame.winfo_children():
             widget.destroy()
 
-        if not expenses:
+        if not top5:
             ctk.CTkLabel(self.top5_frame, text="No expenses yet").pack()
             return
 
-        top5 = sorted(expenses, key=lambda x: x[3], reverse=True)[:5]
         for _, title, category, amount, date in top5:
             formatted_amount = self.controller.format_currency(amount)
             ctk.CTkLabel(self.top5_frame, text=f"{title} | {category} | {formatted_amount} | {date}").pack(anchor="w")
@@ -151,38 +164,32 @@ class AnalyticsPage(ctk.CTkFrame):
     # -------------------------
     # Timeline
     # -------------------------
-    def _update_timeline(self, expenses):
+    def _update_timeline(self, recent):
+        """Show the newest expenses (already sorted newest first)."""
         for widget in self.timeline_frame.winfo_children():
             widget.destroy()
 
-        if not expenses:
+        if not recent:
             ctk.CTkLabel(self.timeline_frame, text="No expenses yet").pack()
             return
 
-        sorted_expenses = sorted(expenses, key=lambda x: x[4], reverse=True)
-        for _, title, category, amount, date in sorted_expenses:
+        for _, title, category, amount, date in recent:
             formatted_amount = self.controller.format_currency(amount)
             ctk.CTkLabel(self.timeline_frame, text=f"{date} | {title} | {category} | {formatted_amount}").pack(fill="x", padx=5, pady=2)
 
     # -------------------------
     # Charts
     # -------------------------
-    def _update_charts(self, expenses):
-        self._update_bar_chart(expenses)
-        self._update_line_chart(expenses)
+    def _update_charts(self, category_totals, monthly_totals):
+        self._update_bar_chart(category_totals)
+        self._update_line_chart(monthly_totals)
 
-    def _update_bar_chart(self, expenses):
+    def _update_bar_chart(self, category_totals):
         self.bar_canvas.delete("all")
-        if not expenses:
+        if not category_totals:
             return
 
-        # Sum amounts per category
-        totals = {}
-        for _, _, category, amount, _ in expenses:
-            totals[category] = totals.get(category, 0) + amount
-
-        if not totals:
-            return
+        totals = dict(category_totals)
 
         categories = list(totals.keys())
         amounts = list(totals.values())
@@ -205,21 +212,13 @@ class AnalyticsPage(ctk.CTkFrame):
             self.bar_canvas.create_text((x0 + x1) / 2, y0 - 10, text=self.controller.format_currency(amt), fill=text_color, font=("Arial", 7))
             self.bar_canvas.create_text((x0 + x1) / 2, self.canvas_height - bottom / 2, text=cat, fill=text_color, font=("Arial", 7))
 
-    def _update_line_chart(self, expenses):
+    def _update_line_chart(self, monthly_totals):
         self.line_canvas.delete("all")
-        if not expenses:
+        if not monthly_totals:
             return
 
-        monthly_totals = defaultdict(float)
-        for _, _, _, amount, date in expenses:
-            try:
-                key = datetime.strptime(date, "%Y-%m-%d").strftime("%Y-%m")
-                monthly_totals[key] += amount
-            except ValueError:
-                continue
-
-        months_sorted = sorted(monthly_totals.keys())
-        totals_sorted = [monthly_totals[m] for m in months_sorted]
+        months_sorted = [month for month, _ in monthly_totals]
+        totals_sorted = [total for _, total in monthly_totals]
 
         if not months_sorted:
             return
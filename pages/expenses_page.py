@@ -1,11 +1,26 @@
 import customtkinter as ctk
-from database import insert_expense, delete_expense, fetch_expenses
+from database import (EXPENSE_PAGE_SIZE, delete_expenses, fetch_categories, fetch_expense_ids,
+                      fetch_expenses_page, get_total_amount)
+from utils.csv_export import export_expenses_csv
+from utils.csv_import import CsvImport
+from utils.expense_validation import validate_expense
+from utils.profiler import profile_action
+from utils.virtual_list import VirtualCheckList
 from tkcalendar import Calendar
 from datetime import datetime
 import tkinter as tk
 from tkinter import filedialog, messagebox
-import pandas as pd
-import threading
+
+# Sort dropdown label -> (sort key for fetch_expenses_page, descending)
+SORT_OPTIONS = {
+    "Date (Newest)": ("date", True),
+    "Date (Oldest)": ("date", False),
+    "Amount (High → Low)": ("amount", True),
+    "Amount (Low → High)": ("amount", False),
+    "Title (A → Z)": ("title", False),
+    "Title (Z → A)": ("title", True),
+    "Category (A → Z)": ("category", False),
+}
 
 class ExpensesPage(ctk.CTkFrame):
     def __init__(self, parent, controller):
@@ -39,9 +54,7 @@ class ExpensesPage(ctk.CTkFrame):
         self.sort_var = ctk.StringVar(value="Date (Newest)")
         self.sort_dropdown = ctk.CTkOptionMenu(
             filter_sort_frame,
-            values=["Date (Newest)", "Date (Oldest)", "Amount (High → Low)",
-                    "Amount (Low → High)", "Title (A → Z)", "Title (Z → A)",
-                    "Category (A → Z)"],
+            values=list(SORT_OPTIONS),
             variable=self.sort_var,
             command=self.apply_filter_or_sort
         )
@@ -96,10 +109,17 @@ class ExpensesPage(ctk.CTkFrame):
         self.select_all_cb.pack(side="left", padx=(0,5))
         ctk.CTkLabel(header_frame, text="Your Expenses", font=("Arial", 16)).place(relx=0.5, rely=0.5, anchor="center")
 
-        # Scrollable list area
-        self.list_frame = ctk.CTkScrollableFrame(self)
-        self.list_frame.pack(expand=True, fill="both", pady=10, padx=10)
-        self.checkboxes = []
+        # Virtualized list area (only the visible rows are materialized)
+        self.expense_list = VirtualCheckList(
+            self,
+            format_row=self._format_row,
+            on_near_end=self.load_next_page,
+            on_selection_change=self._on_selection_change,
+        )
+        self.expense_list.pack(expand=True, fill="both", pady=10, padx=10)
+        self._next_cursor = None
+        self._page_loading = False
+        self._loaded_rows = 0  # saved rows loaded so far through keyset pages
 
         # Total bar
         self.total_frame = ctk.CTkFrame(self)
@@ -111,97 +131,96 @@ class ExpensesPage(ctk.CTkFrame):
         action_row = ctk.CTkFrame(self)
         action_row.pack(fill="x", pady=5)
         action_row.grid_columnconfigure(0, weight=1)
+        self.status_label = ctk.CTkLabel(action_row, text="", anchor="w")
+        self.status_label.grid(row=0, column=0, sticky="w", padx=10)
         ctk.CTkButton(action_row, text="Export CSV", width=120, command=self.export_csv).grid(row=0, column=1, padx=5)
         ctk.CTkButton(action_row, text="Import CSV", width=120, command=self.import_csv).grid(row=0, column=2, padx=5)
 
-        # Initial refresh
+        # Initial refresh (and reload whenever the app changes the user's expenses)
+        if controller.expense_store:
+            controller.expense_store.subscribe(self.refresh)
         self.refresh()
 
-    # --------------------- Background Refresh ---------------------
+    # --------------------- Refresh ---------------------
     def refresh(self):
-        """Start background thread to fetch all expenses and categories."""
-        user = self.controller.current_user
-        if not user:
+        """Reload the pages shown so far from the DB, plus the rows not saved yet."""
+        if not self.controller.current_user or not self.controller.expense_store:
             return
-        threading.Thread(target=self.perform_full_refresh_task, args=(user["id"],), daemon=True).start()
+        # One query for everything loaded so far, so the scroll position survives
+        self._load_page(None, max(EXPENSE_PAGE_SIZE, self._loaded_rows), keep_position=True)
 
-    def perform_full_refresh_task(self, user_id):
-        """Fetch all expenses and categories in background."""
-        expenses, categories = [], []
-        try:
-            expenses = fetch_expenses(user_id)
-            categories = sorted({exp[2] for exp in expenses})
-        except Exception as e:
-            print(f"Error loading expenses: {e}")
-            self.controller.after(1, lambda: messagebox.showerror("DB Error", "Failed to load expense data."))
-        self.controller.after(1, lambda: self.complete_full_refresh(expenses, categories))
-
-    def complete_full_refresh(self, expenses, categories_from_db):
-        """Update GUI with fetched expenses and categories."""
-        self.categories_from_db = ["All"] + categories_from_db
-        self.filter_dropdown.configure(values=self.categories_from_db)
-        self.update_expense_list_gui(expenses, self.filter_var.get(), self.sort_var.get())
+    def _current_query(self):
+        """Return (category, sort_by, descending) for the current dropdown values."""
+        filter_by = self.filter_var.get()
+        sort_by, descending = SORT_OPTIONS.get(self.sort_var.get(), ("date", True))
+        return (None if filter_by == "All" else filter_by), sort_by, descending
 
     # --------------------- Filter & Sort ---------------------
     def apply_filter_or_sort(self, event=None):
-        """Start background thread for filtering/sorting."""
-        user = self.controller.current_user
-        if not user:
+        """Reload the list from the first page for the new filter/sort."""
+        self.expense_list.selection.clear()
+        self.select_all_var.set(False)
+        self._loaded_rows = 0
+        self._load_page(None)
+
+    # --------------------- Paging ---------------------
+    def load_next_page(self):
+        """Fetch the next keyset page when the list is scrolled near its end."""
+        if self._page_loading or self._next_cursor is None or not self.controller.current_user:
             return
-        threading.Thread(target=self.perform_filter_sort_task, args=(user["id"],), daemon=True).start()
+        self._load_page(self._next_cursor)
+
+    def _load_page(self, cursor, page_size=EXPENSE_PAGE_SIZE, keep_position=False):
+        # A newer request supersedes an older one, so a stale page never reaches the list
+        self._page_loading = True
+        self.controller.scheduler.submit(
+            "expenses:page", self.perform_page_task, self.controller.current_user["id"],
+            self._current_query(), cursor, page_size,
+            on_done=lambda result: self.complete_page_load(result, cursor is None, keep_position),
+            on_error=self._on_page_error
+        )
 
-    def perform_filter_sort_task(self, user_id):
-        """Fetch expenses in background for filtering/sorting."""
-        expenses = []
-        try:
-            expenses = fetch_expenses(user_id)
-        except Exception as e:
-            print(f"Error fetching expenses: {e}")
-            self.controller.after(1, lambda: messagebox.showerror("DB Error", "Failed to load expenses."))
-        self.controller.after(1, lambda: self.update_expense_list_gui(expenses, self.filter_var.get(), self.sort_var.get()))
+    def perform_page_task(self, user_id, query, cursor, page_size):
+        """Fetch one page after `cursor`; the first page also brings the categories and the total."""
+        category, sort_by, descending = query
+        expenses, next_cursor = fetch_expenses_page(user_id, after=cursor, page_size=page_size,
+                                                    sort_by=sort_by, descending=descending,
+                                                    category=category)
+        if cursor is not None:
+            return expenses, next_cursor, None, None
+        return expenses, next_cursor, fetch_categories(user_id), get_total_amount(user_id, category=category)
+
+    def complete_page_load(self, result, first_page, keep_position):
+        expenses, next_cursor, categories, total = result
+        self._page_loading = False
+        self._next_cursor = next_cursor
+        if not first_page:
+            self._loaded_rows += len(expenses)
+            self.expense_list.append_items(expenses, has_more=next_cursor is not None)
+            return
+        self._loaded_rows = len(expenses)
+        self.update_expense_list_gui(expenses, next_cursor, categories, total, keep_position)
+
+    def _on_page_error(self, error):
+        self._page_loading = False
+        print(f"Error loading expenses: {error}")
+        messagebox.showerror("DB Error", "Failed to load expense data.")
 
     # --------------------- GUI Update ---------------------
-    def update_expense_list_gui(self, expenses, filter_by="All", sort_by="Date (Newest)"):
-        """Update GUI expense list based on data, filter, and sort."""
-        for cb in self.checkboxes:
-            cb.destroy()
-        self.checkboxes.clear()
-
-        if filter_by != "All":
-            expenses = [e for e in expenses if e[2] == filter_by]
-
-        if sort_by == "Date (Newest)": expenses.sort(key=lambda e: e[4], reverse=True)
-        elif sort_by == "Date (Oldest)": expenses.sort(key=lambda e: e[4])
-        elif sort_by == "Amount (High → Low)": expenses.sort(key=lambda e: e[3], reverse=True)
-        elif sort_by == "Amount (Low → High)": expenses.sort(key=lambda e: e[3])
-        elif sort_by == "Title (A → Z)": expenses.sort(key=lambda e: e[1].lower())
-        elif sort_by == "Title (Z → A)": expenses.sort(key=lambda e: e[1].lower(), reverse=True)
-        elif sort_by == "Category (A → Z)": expenses.sort(key=lambda e: e[2].lower())
-
-        total = sum(e[3] for e in expenses)
+    def update_expense_list_gui(self, expenses, cursor, categories, total, keep_position=False):
+        """Show the first pages of the current view below the unsaved rows, and the total."""
+        pending = self.controller.expense_store.pending_rows(self._current_query()[0])
+        self.categories_from_db = ["All"] + sorted(set(categories) | {e[2] for e in pending})
+        self.filter_dropdown.configure(values=self.categories_from_db)
+        total += sum(e[3] for e in pending)
         self.total_label.configure(text=f"Total: {self.controller.format_currency(total)}")
-
-        if not expenses:
-            lbl = ctk.CTkLabel(self.list_frame, text="No expenses found.")
-            lbl.pack(pady=5)
-            self.checkboxes.append(lbl)
-            self.select_all_var.set(False)
-            return
-
-        self.select_all_cb.pack(anchor="nw", padx=5, pady=5)
-        for exp in expenses:
-            exp_id, title, category, amount, date = exp
-            cb = ctk.CTkCheckBox(master=self.list_frame, text=f"{title} | {category} | {self.controller.format_currency(amount)} | {date}", variable=ctk.BooleanVar())
-            cb.expense_id = exp_id
-            cb.var = cb.cget("variable")
-            cb.pack(anchor="w", pady=3)
-            self.checkboxes.append(cb)
-        self.select_all_var.set(all(cb.var.get() for cb in self.checkboxes if hasattr(cb, "var")))
-        self.filter_dropdown.configure(values=["All"] + sorted({exp[2] for exp in expenses}))
+        self.expense_list.set_items(pending + expenses, has_more=cursor is not None,
+                                    keep_position=keep_position)
+        self.select_all_var.set(self.expense_list.selection.is_everything_selected())
 
     # --------------------- Add Expense ---------------------
     def add_expense(self):
-        """Validate input and start background thread to insert expense."""
+        """Validate input and start background task to insert expense."""
         title = self.entry_title.get().strip()
         category = self.category_var.get()
         if category == "Other":
@@ -220,121 +239,197 @@ class ExpensesPage(ctk.CTkFrame):
         except ValueError:
             messagebox.showerror("Error", "Amount must be a number.")
             return
-        user_id = self.controller.current_user["id"]
+        try:
+            # NaN, infinity, values beyond DECIMAL(18, 2) and overlong text would fail the whole group commit
+            validate_expense(title, category, amount_float)
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid expense: {e}.")
+            return
         date = self.entry_date.get().strip()
-        threading.Thread(target=self.perform_add_task, args=(user_id, title, category, amount_float, date), daemon=True).start()
-
-    def perform_add_task(self, user_id, title, category, amount, date):
-        """Insert expense in DB (background thread)."""
         try:
-            insert_expense(user_id, title, category, amount, date)
-            self.controller.after(1, self.complete_add_task)
-            self.perform_full_refresh_task(user_id)
-        except Exception as e:
-            print(f"Error inserting expense: {e}")
-            self.controller.after(1, lambda: messagebox.showerror("DB Error", "Failed to insert expense."))
-
-    def complete_add_task(self):
-        """Clear input fields and notify other pages."""
+            # strptime also accepts "2024-1-5"; the queue and the store need the canonical form
+            date = datetime.strptime(date, "%Y-%m-%d").strftime("%Y-%m-%d")
+        except ValueError:
+            messagebox.showerror("Error", "Date must be in YYYY-MM-DD format.")
+            return
+        profile_action("add")
+        # Shown at once as a pending row; the write queue saves it in the next group commit
+        self.controller.write_queue.enqueue(title, category, amount_float, date)
         self.entry_title.delete(0, "end")
         self.entry_amount.delete(0, "end")
         self.entry_custom_category.delete(0, "end")
-        if hasattr(self.controller, "main_app"):
-            for page in ["analytics", "summary"]:
-                p = self.controller.main_app.pages.get(page)
-                if p: p.refresh_all() if page=="analytics" else p.refresh()
 
     # --------------------- Remove Expense ---------------------
     def remove_selected(self):
-        """Collect IDs and start background thread to delete."""
+        """Resolve the selected IDs and start background task to delete."""
         user_id = self.controller.current_user["id"]
-        ids_to_delete = [cb.expense_id for cb in self.checkboxes if hasattr(cb, "var") and cb.var.get()]
+        selection = self.expense_list.selection
+        if not selection.has_selection():
+            messagebox.showinfo("Select", "Select at least one expense to delete.")
+            return
+        if selection.needs_full_id_list():
+            # "Select All" also covers pages that have not been loaded yet
+            category = self._current_query()[0]
+            self.controller.scheduler.submit(
+                "expenses:select", fetch_expense_ids, user_id, category,
+                on_done=lambda ids: self.complete_resolve_selection(user_id, category, ids),
+                on_error=self._on_remove_error
+            )
+            return
+        self.confirm_remove(user_id, selection.resolve())
+
+    def complete_resolve_selection(self, user_id, category, all_ids):
+        pending = [e[0] for e in self.controller.expense_store.pending_rows(category)]
+        self.confirm_remove(user_id, self.expense_list.selection.resolve(pending + all_ids))
+
+    def confirm_remove(self, user_id, ids_to_delete):
         if not ids_to_delete:
             messagebox.showinfo("Select", "Select at least one expense to delete.")
             return
         if not messagebox.askyesno("Confirm Delete", f"Delete {len(ids_to_delete)} selected expenses?"):
             return
-        threading.Thread(target=self.perform_remove_task, args=(user_id, ids_to_delete), daemon=True).start()
+        profile_action("remove")
+        store = self.controller.expense_store
+        # Rows not saved yet are simply dropped from the write queue
+        pending = {i for i in ids_to_delete if store.is_pending(i)}
+        if pending:
+            self.controller.write_queue.discard(pending)
+            ids_to_delete = [i for i in ids_to_delete if i not in pending]
+            if not ids_to_delete:
+                self.expense_list.selection.clear()
+                self.select_all_var.set(False)
+                return
+        self.controller.scheduler.submit(
+            "expenses:remove", delete_expenses, user_id, ids_to_delete,
+            on_done=self.complete_remove_task, on_error=self._on_remove_error, supersede=False
+        )
+
+    def complete_remove_task(self, deleted):
+        """Apply the deletion to the shared store and reset the selection."""
+        if not deleted:
+            self._on_remove_error("no rows deleted")
+            return
+        self.controller.expense_store.apply_delete(deleted)
+        self.expense_list.selection.clear()
+        self.select_all_var.set(False)
 
-    def perform_remove_task(self, user_id, ids_to_delete):
-        """Delete expenses in background."""
-        try:
-            for eid in ids_to_delete:
-                delete_expense(eid, user_id)
-            self.controller.after(1, self.complete_remove_task)
-            self.perform_full_refresh_task(user_id)
-        except Exception as e:
-            print(f"Error deleting expenses: {e}")
-            self.controller.after(1, lambda: messagebox.showerror("DB Error", "Failed to delete one or more expenses."))
-
-    def complete_remove_task(self):
-        """Notify other pages after deletion."""
-        if hasattr(self.controller, "main_app"):
-            for page in ["analytics", "summary"]:
-                p = self.controller.main_app.pages.get(page)
-                if p: p.refresh_all() if page=="analytics" else p.refresh()
+    def _on_remove_error(self, error):
+        print(f"Error deleting expenses: {error}")
+        messagebox.showerror("DB Error", "Failed to delete one or more expenses.")
 
     # --------------------- CSV Export ---------------------
     def export_csv(self):
         user_id = self.controller.current_user["id"]
-        threading.Thread(target=self.perform_export_task, args=(user_id,), daemon=True).start()
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("Compressed CSV", "*.csv.gz")],
+            title="Save Expenses to CSV"
+        )
+        if not file_path:
+            return
+        # The export follows the category currently shown in the list
+        category = self._current_query()[0]
+        self.controller.scheduler.submit(
+            "expenses:export", self.perform_export_task, user_id, file_path, category,
+            on_done=lambda written: self.complete_export_task(written, file_path),
+            on_error=self._on_export_error, supersede=False
+        )
 
-    def perform_export_task(self, user_id):
-        try:
-            expenses = fetch_expenses(user_id)
-            if not expenses:
-                self.controller.after(1, lambda: messagebox.showwarning("No Data", "No expenses to export."))
-                return
-            df = pd.DataFrame(expenses, columns=["id", "title", "category", "amount", "date"])
-            self.controller.after(1, lambda: self.save_csv_file(df))
-        except Exception as e:
-            self.controller.after(1, lambda: messagebox.showerror("DB Error", f"Failed to fetch data for export:\n{e}"))
-
-    def save_csv_file(self, df):
-        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files","*.csv")], title="Save Expenses to CSV")
-        if file_path:
-            try:
-                df.to_csv(file_path, index=False)
-                messagebox.showinfo("Success", f"Expenses exported to:\n{file_path}")
-            except Exception as e:
-                messagebox.showerror("Save Error", f"Failed to save file:\n{e}")
+    def perform_export_task(self, user_id, file_path, category):
+        """Stream the expenses straight into the file (background worker)."""
+        return export_expenses_csv(user_id, file_path, category=category,
+                                   progress_callback=self._report_export_progress)
+
+    def _report_export_progress(self, written, total):
+        """Called from the export worker after every written batch."""
+        text = f"Exporting... {written}/{total}" if total else f"Exporting... {written}"
+        self.controller.scheduler.call_in_main(lambda: self.status_label.configure(text=text))
+
+    def complete_export_task(self, written, file_path):
+        self.status_label.configure(text="")
+        if not written:
+            messagebox.showwarning("No Data", "No expenses to export.")
+            return
+        messagebox.showinfo("Success", f"{written} expenses exported to:\n{file_path}")
+
+    def _on_export_error(self, error):
+        self.status_label.configure(text="")
+        messagebox.showerror("Export Error", f"Failed to export expenses:\n{error}")
 
     # --------------------- CSV Import ---------------------
     def import_csv(self):
         user_id = self.controller.current_user["id"]
         file_path = filedialog.askopenfilename(title="Select CSV file", filetypes=[("CSV files","*.csv")])
-        if file_path:
-            threading.Thread(target=self.perform_import_task, args=(user_id, file_path), daemon=True).start()
-
-    def perform_import_task(self, user_id, file_path):
+        if not file_path:
+            return
         try:
-            df = pd.read_csv(file_path)
-            required_cols = {"title", "category", "amount", "date"}
-            if not required_cols.issubset(df.columns):
-                self.controller.after(1, lambda: messagebox.showerror("Error", f"CSV must contain columns:\n{', '.join(required_cols)}"))
-                return
-            for _, row in df.iterrows():
-                insert_expense(user_id, str(row["title"]), str(row["category"]), float(row["amount"]), str(row["date"]))
-            self.controller.after(1, self.complete_import_task)
-            self.perform_full_refresh_task(user_id)
-        except Exception as e:
-            self.controller.after(1, lambda: messagebox.showerror("Import Error", f"Failed to import CSV:\n{e}"))
-
-    def complete_import_task(self):
-        messagebox.showinfo("Success", "Expenses imported successfully!")
-        if hasattr(self.controller, "main_app"):
-            for page in ["analytics", "summary"]:
-                p = self.controller.main_app.pages.get(page)
-                if p: p.refresh_all() if page=="analytics" else p.refresh()
+            job = CsvImport(user_id, file_path)
+        except OSError as e:
+            messagebox.showerror("Import Error", f"Cannot open file:\n{e}")
+            return
+        if job.resumable and not messagebox.askyesno(
+                "Resume Import",
+                f"An earlier import of this file stopped after {job.rows_done} rows. Resume from there?"):
+            job.discard_checkpoint()
+        profile_action("import")
+        self.controller.scheduler.submit(
+            "expenses:import", self.perform_import_task, job,
+            on_done=self.complete_import_task, on_error=self._on_import_error, supersede=False
+        )
+
+    def perform_import_task(self, job):
+        """Stream, validate and insert the CSV chunk by chunk (background worker)."""
+        return job.run(progress_callback=self._report_import_progress,
+                       chunk_callback=self._report_import_chunk)
+
+    def _report_import_progress(self, rows_done, inserted, rejected, fraction):
+        """Called from the import worker after every committed chunk."""
+        text = f"Importing... {fraction:.0%} ({inserted} saved, {rejected} rejected)"
+        self.controller.scheduler.call_in_main(lambda: self.status_label.configure(text=text))
+
+    def _report_import_chunk(self, rows):
+        """Called from the import worker with the rows of every committed chunk."""
+        self.controller.scheduler.call_in_main(self._apply_import_chunk, rows)
+
+    def _apply_import_chunk(self, rows):
+        store = self.controller.expense_store
+        # An unloaded store picks the rows up with its download / next sync
+        if store and store.loaded:
+            store.apply_inserts(rows)  # the store notification reloads the list
+        else:
+            self.controller.refresh_coordinator.request(self.refresh)
+
+    def complete_import_task(self, result):
+        self.status_label.configure(text="")
+        message = f"Imported {result['inserted']} expenses."
+        if result["rejected"]:
+            message += f"\n{result['rejected']} invalid rows were skipped, see:\n{result['rejects_path']}"
+        messagebox.showinfo("Success", message)
+
+    def _on_import_error(self, error):
+        self.status_label.configure(text="")
+        messagebox.showerror("Import Error", f"Failed to import CSV:\n{error}")
 
     # --------------------- Misc GUI Methods ---------------------
+    def _format_row(self, e):
+        marker = "[saving] " if self.controller.expense_store.is_pending(e[0]) else ""
+        return f"{marker}{e[1]} | {e[2]} | {self.controller.format_currency(e[3])} | {e[4]}"
+
     def category_changed(self, selected_value):
         if selected_value == "Other":
             self.entry_custom_category.pack(side="left", padx=5)
         else:
             self.entry_custom_category.pack_forget()
 
+    def destroy(self):
+        self.controller.scheduler.cancel_owner("expenses")
+        if self.controller.expense_store:
+            self.controller.expense_store.unsubscribe(self.refresh)
+        super().destroy()
+
     def toggle_select_all(self):
-        for cb in self.checkboxes:
-            if hasattr(cb, "var"):
-                cb.var.set(self.select_all_var.get())
+        self.expense_list.selection.select_all(self.select_all_var.get())
+        self.expense_list.refresh_visible()
+
+    def _on_selection_change(self):
+        self.select_all_var.set(self.expense_list.selection.is_everything_selected())
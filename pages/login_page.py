@@ -1,7 +1,7 @@
 import customtkinter as ctk
 from database import get_user, create_user
 import bcrypt
-import threading
+from utils.profiler import profile_action
 
 
 # --------------------------
@@ -63,6 +63,10 @@ class LoginFrame(ctk.CTkFrame):
         self.back_to_login_button = ctk.CTkButton(self.register_frame, text="Back to Login", command=self.show_login)
         self.back_to_login_button.pack(pady=5)
 
+    def destroy(self):
+        self.controller.scheduler.cancel_owner("login")
+        super().destroy()
+
     # --------------------------
     # Show register screen
     # --------------------------
@@ -88,8 +92,11 @@ class LoginFrame(ctk.CTkFrame):
             self.login_message_label.configure(text="Username and password are required.", text_color="red")
             return
 
-        login_thread = threading.Thread(target=self.perform_login_task, args=(username, password))
-        login_thread.start()
+        profile_action("login")
+        self.controller.scheduler.submit(
+            "login:login", self.perform_login_task, username, password,
+            on_done=lambda result: self.handle_login_result(*result)
+        )
 
     # --------------------------
     # Registration Logic
@@ -135,6 +142,9 @@ class LoginFrame(ctk.CTkFrame):
                 if bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8')):
                     login_success = True
                     user_id = user_data["id"]
+                    # Start loading the dashboard on the Tk thread right away; it is queued
+                    # ahead of handle_login_result, so the bootstrap runs during the switch
+                    self.controller.scheduler.call_in_main(self.controller.initializer.begin, user_id)
 
         except Exception as e:
             # Złapanie błędu pyodbc/SQL
@@ -143,12 +153,9 @@ class LoginFrame(ctk.CTkFrame):
             user_id = None
         
         # 2. Powrót do Main Thread (manipulacja GUI)
-        # Używamy self.controller.after() do bezpiecznego wykonania handle_login_result 
-        # w wątku głównym Tkinter, gdy operacja tła się zakończy.
-        self.controller.after(
-            1, # Wykonaj natychmiast
-            lambda: self.handle_login_result(login_success, username, user_id)
-        )
+        # Scheduler przekazuje wynik do handle_login_result w wątku głównym
+        # Tkinter (przez after()), gdy operacja tła się zakończy.
+        return login_success, username, user_id
 
     # --------------------------
     # Login Logic (WYKONYWANE PONOWNIE W MAIN THREAD)
@@ -1,7 +1,8 @@
 import customtkinter as ctk
 from tkinter import messagebox
-from database import save_user_setting, delete_all_expenses
-import threading
+from database import save_user_setting, delete_all_expenses, get_db_stats
+
+DIAGNOSTICS_REFRESH_MS = 2000
 
 class AccountSettingsPage(ctk.CTkFrame):
     def __init__(self, parent, controller):
@@ -76,6 +77,19 @@ class AccountSettingsPage(ctk.CTkFrame):
         )
         self.reset_button.pack(pady=10)
 
+        # -------------------------
+        # Diagnostics (hidden, toggled with Ctrl+Shift+D)
+        # -------------------------
+        self.diagnostics_frame = ctk.CTkFrame(self)
+        ctk.CTkLabel(self.diagnostics_frame, text="DB Diagnostics", font=("Arial", 14)).pack(pady=5)
+        self.diagnostics_text = ctk.CTkTextbox(self.diagnostics_frame, font=("Courier", 12),
+                                               wrap="none", height=220)
+        self.diagnostics_text.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        self._diagnostics_after_id = None
+        self._diagnostics_binding = self.winfo_toplevel().bind(
+            "<Control-Shift-KeyPress-D>", self.toggle_diagnostics, add="+"
+        )
+
     # -------------------------
     # Theme / Currency Changes
     # -------------------------
@@ -84,33 +98,38 @@ class AccountSettingsPage(ctk.CTkFrame):
         ctk.set_appearance_mode(value)
         self.controller.settings["theme"] = value
         user_id = self.controller.current_user["id"]
-        threading.Thread(
-            target=self._save_setting_task, 
-            args=(user_id, "Theme", value, None)
-        ).start()
+        self._submit_setting_save(user_id, "Theme", value, None)
 
     def change_currency(self, value):
         """Update currency and save in background, then refresh pages."""
         self.controller.settings["currency"] = value
         user_id = self.controller.current_user["id"]
-        threading.Thread(
-            target=self._save_setting_task, 
-            args=(user_id, "Currency", value, self._on_currency_saved)
-        ).start()
-
-    def _save_setting_task(self, user_id, name, value, callback):
-        """Background DB save with optional callback in main thread."""
-        success = False
+        self._submit_setting_save(user_id, "Currency", value, self._on_currency_saved)
+
+    def _submit_setting_save(self, user_id, name, value, callback):
+        """Background DB save with optional callback in main thread.
+
+        Saves of the same setting supersede each other, so the last choice wins.
+        """
+        self.controller.scheduler.submit(
+            f"settings:save:{name}", self._save_setting_task, user_id, name, value,
+            on_done=lambda success: self._on_setting_saved(success, name, callback),
+            on_error=lambda e: self._on_setting_saved(False, name, callback)
+        )
+
+    def _save_setting_task(self, user_id, name, value):
+        """Background DB save of a single setting."""
         try:
-            save_user_setting(user_id, name, value)
-            success = True
+            return save_user_setting(user_id, name, value)
         except Exception as e:
             print(f"Error saving setting {name}: {e}")
+            return False
 
+    def _on_setting_saved(self, success, name, callback):
         if success and callback:
-            self.controller.after(1, callback)
+            callback()
         elif not success:
-            self.controller.after(1, lambda: messagebox.showerror("DB Error", f"Failed to save setting: {name}"))
+            messagebox.showerror("DB Error", f"Failed to save setting: {name}")
 
     def _on_currency_saved(self):
         """Refresh all pages after currency change."""
@@ -132,21 +151,10 @@ class AccountSettingsPage(ctk.CTkFrame):
             return
 
         user_id = self.controller.current_user["id"]
-        threading.Thread(
-            target=self._save_budget_task, 
-            args=(user_id, budget_value)
-        ).start()
-
-    def _save_budget_task(self, user_id, value):
-        """Background DB save for budget."""
-        success = False
-        try:
-            save_user_setting(user_id, "Budget", value)
-            success = True
-        except Exception as e:
-            print(f"Error saving budget: {e}")
-
-        self.controller.after(1, lambda: self._on_budget_saved(success, value))
+        self.controller.scheduler.submit(
+            "settings:save:Budget", self._save_setting_task, user_id, "Budget", budget_value,
+            on_done=lambda success: self._on_budget_saved(success, budget_value)
+        )
 
     def _on_budget_saved(self, success, value):
         """Update GUI after budget save."""
@@ -172,30 +180,71 @@ class AccountSettingsPage(ctk.CTkFrame):
             return
 
         user_id = self.controller.current_user["id"]
-        threading.Thread(
-            target=self._reset_expenses_task, 
-            args=(user_id,)
-        ).start()
+        self.controller.scheduler.submit(
+            "settings:reset", self._reset_expenses_task, user_id,
+            on_done=self._on_reset_expenses
+        )
 
     def _reset_expenses_task(self, user_id):
         """Background DB deletion."""
-        success = False
         try:
-            delete_all_expenses(user_id)
-            success = True
+            return delete_all_expenses(user_id)
         except Exception as e:
             print(f"Error deleting expenses: {e}")
-
-        self.controller.after(1, lambda: self._on_reset_expenses(success))
+            return False
 
     def _on_reset_expenses(self, success):
         """Update GUI after expenses reset."""
         if success:
             messagebox.showinfo("Success", "All expenses have been deleted.")
-            self.controller.refresh_all_pages()
+            if self.controller.expense_store:
+                self.controller.expense_store.apply_clear()
         else:
             messagebox.showerror("Error", "Failed to delete expenses.")
 
+    # -------------------------
+    # Diagnostics Panel
+    # -------------------------
+    def toggle_diagnostics(self, event=None):
+        """Shows or hides the per-function DB latency table."""
+        if self.diagnostics_frame.winfo_ismapped():
+            self.diagnostics_frame.pack_forget()
+            if self._diagnostics_after_id:
+                self.after_cancel(self._diagnostics_after_id)
+                self._diagnostics_after_id = None
+        else:
+            self.diagnostics_frame.pack(fill="both", expand=True, padx=20, pady=15)
+            self._refresh_diagnostics()
+
+    def _refresh_diagnostics(self):
+        """Redraws the table and re-schedules itself while the panel is visible."""
+        stats = get_db_stats()
+        lines = [f"{'function':<28}{'calls':>7}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}"
+                 f"{'p99 ms':>10}{'rows':>10}{'KB':>9}"]
+        functions = sorted(stats["functions"].items(), key=lambda item: item[1]["total"]["p95_ms"],
+                           reverse=True)
+        for name, entry in functions:
+            total = entry["total"]
+            lines.append(f"{name:<28}{entry['calls']:>7}{entry['errors']:>5}{total['p50_ms']:>10.1f}"
+                         f"{total['p95_ms']:>10.1f}{total['p99_ms']:>10.1f}{entry['rows']:>10}"
+                         f"{entry['bytes'] / 1024:>9.0f}")
+        pool = stats["pool"]
+        lines.append("")
+        lines.append(f"backend: {stats['backend']}   pool: {pool['in_use']} in use, "
+                     f"{pool['idle']} idle, max {pool['max_size']}")
+        self.diagnostics_text.configure(state="normal")
+        self.diagnostics_text.delete("1.0", "end")
+        self.diagnostics_text.insert("1.0", "\n".join(lines))
+        self.diagnostics_text.configure(state="disabled")
+        self._diagnostics_after_id = self.after(DIAGNOSTICS_REFRESH_MS, self._refresh_diagnostics)
+
+    def destroy(self):
+        self.controller.scheduler.cancel_owner("settings")
+        if self._diagnostics_after_id:
+            self.after_cancel(self._diagnostics_after_id)
+        self.winfo_toplevel().unbind("<Control-Shift-KeyPress-D>", self._diagnostics_binding)
+        super().destroy()
+
     # -------------------------
     # Refresh Fields from Controller
     # -------------------------
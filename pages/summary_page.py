@@ -1,5 +1,4 @@
 import customtkinter as ctk
-import threading
 from tkinter import messagebox
 from database import fetch_expenses, get_total_amount
 
@@ -16,39 +15,71 @@ class SummaryPage(ctk.CTkFrame):
 
         self.recent_box = ctk.CTkTextbox(self, width=500, height=200, state="disabled")
         self.recent_box.pack(pady=10)
+        self._rendered_total = None
+        self._rendered_recent = None
 
+        if controller.expense_store:
+            controller.expense_store.subscribe(self.refresh)
         self.refresh()
 
     def refresh(self):
-        """Start background thread to fetch user data."""
+        """Render the total and recent expenses (from the shared store once it is loaded)."""
         user = self.controller.current_user
-        if not user:
+        store = self.controller.expense_store
+        if not user or not store:
             self.total_label.configure(text="Total Spent: $0.00")
             return
-        threading.Thread(target=self.perform_fetch_task, args=(user["id"],), daemon=True).start()
+        if not store.loaded:
+            prefetched = self.controller.initializer.take_dashboard_data()
+            if prefetched:
+                # First paint straight from the post-login bootstrap batch or snapshot
+                self.complete_refresh(prefetched["total"], prefetched["recent"])
+                return
+            # Don't wait for the full snapshot: the dashboard needs only two small queries
+            self.controller.scheduler.submit(
+                "summary:dashboard", self.perform_fetch_task, user["id"],
+                on_done=lambda result: self.complete_refresh(*result)
+            )
+            return
+        self.controller.scheduler.cancel("summary:dashboard")
+        self.complete_refresh(store.total(), store.recent(5))
 
     def perform_fetch_task(self, user_id):
-        """Fetch total and recent expenses in a background thread."""
+        """Fetch total and recent expenses in a background worker."""
         total, expenses = 0.0, []
         try:
             total = get_total_amount(user_id)
             expenses = fetch_expenses(user_id, limit=5)
         except Exception as e:
             print(f"Error fetching summary data: {e}")
-            self.controller.after(1, lambda: messagebox.showerror("Database Error", "Failed to load summary data."))
-
-        self.controller.after(1, lambda: self.complete_refresh(total, expenses))
+            self.controller.scheduler.call_in_main(
+                lambda: messagebox.showerror("Database Error", "Failed to load summary data.")
+            )
+        return total, expenses
 
     def complete_refresh(self, total, expenses):
-        """Update GUI widgets with fetched data."""
-        self.total_label.configure(text=f"Total Spent: {self.controller.format_currency(total)}")
-        self.recent_box.configure(state="normal")
-        self.recent_box.delete("1.0", "end")
-
+        """Update GUI widgets with fetched data (only the ones whose text changed)."""
+        total_text = f"Total Spent: {self.controller.format_currency(total)}"
         if not expenses:
-            self.recent_box.insert("end", "No expenses recorded yet.")
+            recent_text = "No expenses recorded yet."
         else:
-            for _, title, category, amount, date in expenses:
-                self.recent_box.insert("end", f"{date} - {title} | {category} | {self.controller.format_currency(amount)}\n")
+            recent_text = "".join(
+                f"{date} - {title} | {category} | {self.controller.format_currency(amount)}\n"
+                for _, title, category, amount, date in expenses
+            )
+
+        if total_text != self._rendered_total:
+            self.total_label.configure(text=total_text)
+            self._rendered_total = total_text
+        if recent_text != self._rendered_recent:
+            self.recent_box.configure(state="normal")
+            self.recent_box.delete("1.0", "end")
+            self.recent_box.insert("end", recent_text)
+            self.recent_box.configure(state="disabled")
+            self._rendered_recent = recent_text
 
-        self.recent_box.configure(state="disabled")
+    def destroy(self):
+        self.controller.scheduler.cancel_owner("summary")
+        if self.controller.expense_store:
+            self.controller.expense_store.unsubscribe(self.refresh)
+        super().destroy()
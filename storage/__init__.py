@@ -0,0 +1,63 @@
+import importlib
+
+# Engine name (DB_BACKEND) -> module implementing it
+BACKENDS = {
+    "azure": "storage.azure_sql",
+    "sqlite": "storage.sqlite_local",
+}
+
+# Every backend module also defines DATABASE_ID, a string naming the database it uses
+# Functions every backend module must provide; database.py re-exports them
+BACKEND_FUNCTIONS = (
+    "init_database",
+    "close_pool",
+    "get_pool",
+    "create_user",
+    "get_user",
+    "insert_expense",
+    "bulk_insert_expenses",
+    "fetch_expenses",
+    "fetch_expenses_page",
+    "fetch_expense_ids",
+    "fetch_categories",
+    "fetch_analytics_summary",
+    "fetch_dashboard_bootstrap",
+    "fetch_changes_since",
+    "get_change_watermark",
+    "prune_tombstones",
+    "count_expenses",
+    "stream_expenses",
+    "get_total_amount",
+    "get_total_amount_for_month",
+    "delete_expense",
+    "delete_expenses",
+    "delete_all_expenses",
+    "verify_monthly_totals",
+    "rebuild_monthly_totals",
+    "load_user_settings",
+    "save_user_setting",
+)
+
+
+class BackendConfigError(Exception):
+    """Raised when the selected storage backend is unknown or not configured."""
+
+
+class InvalidExpenseError(ValueError):
+    """Raised when the DB rejects expense values (constraint or data error); retrying cannot help."""
+
+
+def load_backend(name):
+    """Imports the backend module for `name` and checks that it is complete."""
+    module_name = BACKENDS.get(name.lower())
+    if module_name is None:
+        raise BackendConfigError(
+            f"Unknown DB_BACKEND '{name}', expected one of: {', '.join(BACKENDS)}."
+        )
+    backend = importlib.import_module(module_name)
+    missing = [fn for fn in BACKEND_FUNCTIONS if not callable(getattr(backend, fn, None))]
+    if not isinstance(getattr(backend, "DATABASE_ID", None), str):
+        missing.append("DATABASE_ID")
+    if missing:
+        raise BackendConfigError(f"Backend '{name}' does not implement: {', '.join(missing)}.")
+    return backend
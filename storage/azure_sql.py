@@ -0,0 +1,950 @@
+"""Azure SQL (SQL Server) storage backend, accessed through pyodbc."""
+import os
+import pyodbc
+import bcrypt
+from decimal import ROUND_HALF_UP, Decimal
+from dotenv import load_dotenv
+from storage import BackendConfigError, InvalidExpenseError
+from storage.common import (
+    BULK_BATCH_SIZE, EXPENSE_PAGE_SIZE, EXPENSE_SORT_COLUMNS, EXPORT_BATCH_SIZE, FRAME_BATCH_SIZE,
+    RECENT_TIMELINE_LIMIT, SETTING_COLUMNS, TOMBSTONE_RETENTION_DAYS, date_range_filter, rollup_deltas,
+    settings_from_row,
+)
+from utils.connection_pool import ConnectionPool
+from utils.expense_frame import ExpenseFrame
+
+load_dotenv()
+
+DRIVER = '{ODBC Driver 18 for SQL Server}'
+SQL_SERVER = os.getenv('AZURE_SQL_SERVER')
+SQL_DATABASE = os.getenv('AZURE_SQL_DB')
+SQL_USERNAME = os.getenv('AZURE_SQL_UID')
+SQL_PASSWORD = os.getenv('AZURE_SQL_PWD')
+# Identifies the database this backend talks to (see database.STORAGE_ID)
+DATABASE_ID = f"{SQL_SERVER}/{SQL_DATABASE}".lower()
+
+CONNECTION_STRING = (
+    f"DRIVER={DRIVER};"
+    f"SERVER=tcp:{SQL_SERVER},1433;"
+    f"DATABASE={SQL_DATABASE};"
+    f"UID={SQL_USERNAME};"
+    f"PWD={SQL_PASSWORD};"
+    "Encrypt=yes;"
+    "TrustServerCertificate=no;"
+    "Connection Timeout=30;"
+)
+
+POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '5'))
+POOL_IDLE_TIMEOUT = float(os.getenv('DB_POOL_IDLE_TIMEOUT', '300'))
+POOL_PING_AFTER = float(os.getenv('DB_POOL_PING_AFTER', '30'))
+
+# SQL Server accepts at most 2100 parameters per statement (one is the UserID)
+DELETE_CHUNK_SIZE = 2000
+
+
+def _credentials_loaded():
+    return all([SQL_SERVER, SQL_DATABASE, SQL_USERNAME, SQL_PASSWORD])
+
+
+def _get_connection():
+    """Creates a secure Azure SQL connection."""
+    if not _credentials_loaded():
+        raise BackendConfigError("Azure SQL credentials not loaded properly (AZURE_SQL_* variables).")
+    try:
+        return pyodbc.connect(CONNECTION_STRING)
+    except pyodbc.Error as ex:
+        sqlstate = ex.args[0]
+        if '28000' in sqlstate:
+            print("Authentication error (28000).")
+        elif '08001' in sqlstate:
+            print("Connection error (08001).")
+        else:
+            print(f"Unknown connection error: {ex}")
+        raise
+
+
+_pool = ConnectionPool(
+    _get_connection,
+    min_size=POOL_MIN_SIZE,
+    max_size=POOL_MAX_SIZE,
+    idle_timeout=POOL_IDLE_TIMEOUT,
+    ping_after=POOL_PING_AFTER,
+    # A rejected row leaves the connection healthy: roll it back and keep it
+    keep_on=(pyodbc.IntegrityError, pyodbc.DataError),
+)
+
+
+def _money(amount):
+    """Rounds like the DECIMAL(18,2) columns do, so rollups add what is stored."""
+    return Decimal(str(amount)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def _expense_row(r):
+    """Converts a DB row into the (id, title, category, amount, 'YYYY-MM-DD') tuple used by the pages."""
+    return (r[0], r[1], r[2], float(r[3]), r[4].strftime('%Y-%m-%d'))
+
+
+_ROLLUP_FROM_EXPENSES_TEMPLATE = """
+    (UserID, YearMonth, Category, Total, Count)
+    SELECT UserID, CONVERT(CHAR(7), ExpenseDate, 120), Category, SUM(Amount), COUNT(*)
+    FROM Expenses
+    {where}
+    GROUP BY UserID, CONVERT(CHAR(7), ExpenseDate, 120), Category
+"""
+
+
+def _apply_rollup_deltas(cur, user_id, deltas):
+    """Applies grouped deltas to MonthlyCategoryTotals inside the caller's transaction."""
+    if not deltas:
+        return
+    cur.executemany(
+        """
+        MERGE MonthlyCategoryTotals WITH (HOLDLOCK) AS t
+        USING (SELECT ? AS UserID, ? AS YearMonth, ? AS Category, ? AS Total, ? AS Cnt) AS s
+        ON t.UserID = s.UserID AND t.YearMonth = s.YearMonth AND t.Category = s.Category
+        WHEN MATCHED THEN
+            UPDATE SET Total = t.Total + s.Total, Count = t.Count + s.Cnt
+        WHEN NOT MATCHED THEN
+            INSERT (UserID, YearMonth, Category, Total, Count)
+            VALUES (s.UserID, s.YearMonth, s.Category, s.Total, s.Cnt);
+        """,
+        [(user_id, ym, category, total, count) for (ym, category), (total, count) in deltas.items()]
+    )
+    cur.execute("DELETE FROM MonthlyCategoryTotals WHERE UserID = ? AND Count <= 0", (user_id,))
+
+
+def get_pool():
+    """Returns the connection pool (used for instrumentation and diagnostics)."""
+    return _pool
+
+
+def close_pool():
+    """Closes all pooled connections (call on application exit)."""
+    _pool.close()
+
+
+def init_database():
+    """Ensures that all required SQL tables exist. Returns False if the DB is unusable."""
+    if not _credentials_loaded():
+        print("Credentials not loaded properly")
+        return False
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+
+            cur.execute("""
+                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='Users' AND xtype='U')
+                CREATE TABLE Users (
+                    UserID INT IDENTITY(1,1) PRIMARY KEY,
+                    Username NVARCHAR(100) UNIQUE NOT NULL,
+                    PasswordHash VARCHAR(100) NOT NULL
+                )
+            """)
+
+            cur.execute("""
+                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='UserSettings' AND xtype='U')
+                CREATE TABLE UserSettings (
+                    UserID INT PRIMARY KEY,
+                    Currency NVARCHAR(10) DEFAULT 'PLN',
+                    Theme NVARCHAR(50) DEFAULT 'System',
+                    Budget DECIMAL(18, 2) DEFAULT 0.00
+                )
+            """)
+
+            cur.execute("""
+                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='Expenses' AND xtype='U')
+                CREATE TABLE Expenses (
+                    ExpenseID INT IDENTITY(1,1) PRIMARY KEY,
+                    UserID INT NOT NULL,
+                    ExpenseName NVARCHAR(255) NOT NULL,
+                    Category NVARCHAR(100) NOT NULL,
+                    Amount DECIMAL(18, 2) NOT NULL,
+                    ExpenseDate DATE NOT NULL
+                )
+            """)
+
+            # Covers every per-user query (newest-first listing, totals, monthly ranges)
+            cur.execute("""
+                IF NOT EXISTS (
+                    SELECT * FROM sys.indexes
+                    WHERE name='IX_Expenses_User_Date' AND object_id = OBJECT_ID('Expenses')
+                )
+                CREATE NONCLUSTERED INDEX IX_Expenses_User_Date
+                ON Expenses (UserID, ExpenseDate DESC, ExpenseID DESC)
+                INCLUDE (Amount, Category, ExpenseName)
+            """)
+
+            # Change tracking for delta sync: every insert/update stamps RowVer and every
+            # delete leaves a tombstone with its own rowversion (see fetch_changes_since)
+            cur.execute("""
+                IF COL_LENGTH('Expenses', 'RowVer') IS NULL
+                ALTER TABLE Expenses ADD RowVer ROWVERSION
+            """)
+            cur.execute("""
+                IF NOT EXISTS (
+                    SELECT * FROM sys.indexes
+                    WHERE name='IX_Expenses_User_RowVer' AND object_id = OBJECT_ID('Expenses')
+                )
+                CREATE NONCLUSTERED INDEX IX_Expenses_User_RowVer ON Expenses (UserID, RowVer)
+            """)
+            cur.execute("""
+                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='ExpenseTombstones' AND xtype='U')
+                CREATE TABLE ExpenseTombstones (
+                    ExpenseID INT PRIMARY KEY,
+                    UserID INT NOT NULL,
+                    RowVer ROWVERSION,
+                    DeletedAt DATETIME2 NOT NULL
+                        CONSTRAINT DF_ExpenseTombstones_DeletedAt DEFAULT SYSUTCDATETIME(),
+                    INDEX IX_ExpenseTombstones_User_RowVer (UserID, RowVer)
+                )
+            """)
+            cur.execute("""
+                IF COL_LENGTH('ExpenseTombstones', 'DeletedAt') IS NULL
+                ALTER TABLE ExpenseTombstones ADD DeletedAt DATETIME2 NOT NULL
+                    CONSTRAINT DF_ExpenseTombstones_DeletedAt DEFAULT SYSUTCDATETIME()
+            """)
+            # Highest RowVer of the pruned tombstones (see prune_tombstones)
+            cur.execute("""
+                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='TombstoneHorizon' AND xtype='U')
+                CREATE TABLE TombstoneHorizon (Value BIGINT NOT NULL)
+            """)
+            cur.execute("""
+                INSERT INTO TombstoneHorizon (Value)
+                SELECT 0 WHERE NOT EXISTS (SELECT * FROM TombstoneHorizon)
+            """)
+
+            # Per-user monthly rollup kept in sync by every write function
+            cur.execute("SELECT OBJECT_ID('MonthlyCategoryTotals', 'U')")
+            if cur.fetchone()[0] is None:
+                cur.execute("""
+                    CREATE TABLE MonthlyCategoryTotals (
+                        UserID INT NOT NULL,
+                        YearMonth CHAR(7) NOT NULL,
+                        Category NVARCHAR(100) NOT NULL,
+                        Total DECIMAL(18, 2) NOT NULL,
+                        Count INT NOT NULL,
+                        PRIMARY KEY (UserID, YearMonth, Category)
+                    )
+                """)
+                cur.execute(f"INSERT INTO MonthlyCategoryTotals {_ROLLUP_FROM_EXPENSES_TEMPLATE.format(where='')}")
+
+            conn.commit()
+        # Open the remaining DB_POOL_MIN_SIZE connections now, not on the first queries
+        _pool.prefill()
+    except pyodbc.Error as ex:
+        print(f"Error, cannot initialize the schema: {ex}")
+        return False
+    prune_tombstones()
+    return True
+
+
+# ------------ USER MANAGEMENT ------------
+
+def create_user(username, password):
+    """Creates a new user and stores default settings."""
+    password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+
+            cur.execute(
+                """
+                INSERT INTO Users (Username, PasswordHash)
+                OUTPUT INSERTED.UserID
+                VALUES (?, ?)
+                """,
+                (username, password_hash)
+            )
+            user_id = cur.fetchone()[0]
+
+            cur.execute(
+                "INSERT INTO UserSettings (UserID, Currency, Theme, Budget) VALUES (?, ?, ?, ?)",
+                (user_id, 'PLN', 'Dark', Decimal('0.00'))
+            )
+
+            conn.commit()
+            return True
+    except pyodbc.IntegrityError:
+        return False
+    except pyodbc.Error as ex:
+        print(f"Error, cannot create new user: {ex}")
+        return False
+
+
+def get_user(username):
+    """Returns user data including hashed password."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT UserID, Username, PasswordHash FROM Users WHERE Username=?", (username,))
+            row = cur.fetchone()
+            if row:
+                return {"id": row[0], "username": row[1], "password_hash": row[2]}
+            return None
+    except pyodbc.Error as ex:
+        print(f"Error, cannot fetch user: {ex}")
+        return None
+
+
+# ------------ EXPENSE MANAGEMENT ------------
+
+def insert_expense(user_id, title, category, amount, date):
+    """Inserts a new expense and returns its ExpenseID (None on failure)."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            # The rollup gets the same rounded amount that is stored
+            amount = _money(amount)
+            cur.execute(
+                """
+                INSERT INTO Expenses (UserID, ExpenseName, Category, Amount, ExpenseDate)
+                OUTPUT INSERTED.ExpenseID
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (user_id, title, category, amount, date)
+            )
+            expense_id = cur.fetchone()[0]
+            _apply_rollup_deltas(cur, user_id, rollup_deltas([(category, amount, date)], 1))
+            conn.commit()
+            return expense_id
+    except pyodbc.Error as ex:
+        print(f"Error during expenses adding: {ex}")
+        return None
+
+
+def bulk_insert_expenses(user_id, rows, batch_size=BULK_BATCH_SIZE, progress_callback=None):
+    """Inserts many expenses in parameter batches within a single transaction.
+
+    `rows` is an iterable of (title, category, amount, date) tuples.
+    `progress_callback(inserted, total)` is called after every batch.
+    Returns the inserted rows as (id, title, category, amount, date) tuples
+    in input order, or an empty list if the import was rolled back. Raises InvalidExpenseError
+    (nothing saved) when the DB rejects a value, e.g. a NULL or overlong field.
+    """
+    params = [
+        (user_id, str(title), str(category), _money(amount), date)
+        for title, category, amount, date in rows
+    ]
+    if not params:
+        return []
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            # executemany cannot return OUTPUT rows, so the new rows are collected in a
+            # session temp table; rows committed meanwhile by other writers never land there
+            cur.execute(
+                """
+                IF OBJECT_ID('tempdb..#NewExpenses') IS NOT NULL DROP TABLE #NewExpenses;
+                CREATE TABLE #NewExpenses (
+                    ExpenseID INT PRIMARY KEY, ExpenseName NVARCHAR(255), Category NVARCHAR(100),
+                    Amount DECIMAL(18,2), ExpenseDate DATE
+                );
+                """
+            )
+            cur.fast_executemany = True
+            inserted = 0
+            for start in range(0, len(params), batch_size):
+                batch = params[start:start + batch_size]
+                cur.executemany(
+                    """
+                    INSERT INTO Expenses (UserID, ExpenseName, Category, Amount, ExpenseDate)
+                    OUTPUT INSERTED.ExpenseID, INSERTED.ExpenseName, INSERTED.Category,
+                           INSERTED.Amount, INSERTED.ExpenseDate
+                    INTO #NewExpenses
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    batch
+                )
+                inserted += len(batch)
+                if progress_callback:
+                    progress_callback(inserted, len(params))
+            cur.execute(
+                """
+                SELECT ExpenseID, ExpenseName, Category, Amount, ExpenseDate
+                FROM #NewExpenses
+                ORDER BY ExpenseID
+                """
+            )
+            new_rows = [_expense_row(r) for r in cur.fetchall()]
+            # Separate batch: a DROP after the SELECT would stay pending until nextset()
+            cur.execute("DROP TABLE #NewExpenses")
+            _apply_rollup_deltas(cur, user_id, rollup_deltas([(r[2], r[3], r[4]) for r in new_rows], 1))
+            conn.commit()
+            return new_rows
+    except (pyodbc.IntegrityError, pyodbc.DataError) as ex:
+        print(f"Error during bulk expenses adding: {ex}")
+        raise InvalidExpenseError(str(ex)) from ex
+    except pyodbc.Error as ex:
+        print(f"Error during bulk expenses adding: {ex}")
+        return []
+
+
+def fetch_expenses(user_id, limit=None, start_date=None, end_date=None, as_frame=False):
+    """Fetches user expenses sorted by newest first.
+
+    `start_date` / `end_date` restrict the result to the half-open range
+    [start_date, end_date). With `as_frame` the rows are streamed from the
+    cursor in batches straight into an ExpenseFrame instead of a list.
+    """
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+
+            range_sql, range_params = date_range_filter(start_date, end_date)
+            sql = f"""
+            SELECT ExpenseID, ExpenseName, Category, Amount, ExpenseDate
+            FROM Expenses
+            WHERE UserID = ?{range_sql}
+            ORDER BY ExpenseDate DESC, ExpenseID DESC
+            """
+
+            if limit:
+                sql += f" OFFSET 0 ROWS FETCH NEXT {int(limit)} ROWS ONLY"
+
+            cur.execute(sql, (user_id, *range_params))
+            if as_frame:
+                return ExpenseFrame.from_batches(iter(lambda: cur.fetchmany(FRAME_BATCH_SIZE), []))
+            rows = cur.fetchall()
+
+            return [_expense_row(r) for r in rows]
+    except pyodbc.Error as ex:
+        print(f"Error during expenses fetching: {ex}")
+        return ExpenseFrame.empty() if as_frame else []
+
+
+def _export_filter(user_id, start_date, end_date, category):
+    range_sql, params = date_range_filter(start_date, end_date)
+    sql = f"UserID = ?{range_sql}"
+    params.insert(0, user_id)
+    if category is not None:
+        sql += " AND Category = ?"
+        params.append(category)
+    return sql, params
+
+
+def count_expenses(user_id, start_date=None, end_date=None, category=None):
+    """Counts the rows stream_expenses() would return (None on error)."""
+    where, params = _export_filter(user_id, start_date, end_date, category)
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(f"SELECT COUNT(*) FROM Expenses WHERE {where}", params)
+            return cur.fetchone()[0]
+    except pyodbc.Error as ex:
+        print(f"Error during expenses counting: {ex}")
+        return None
+
+
+def stream_expenses(user_id, start_date=None, end_date=None, category=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yields the matching expenses oldest first, in lists of up to `batch_size` rows.
+
+    Rows are read from the open cursor with fetchmany, so memory use does not
+    depend on the result size. Unlike the other readers, DB errors are raised:
+    a half-written export must not look complete.
+    """
+    where, params = _export_filter(user_id, start_date, end_date, category)
+    with _pool.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT ExpenseID, ExpenseName, Category, Amount, ExpenseDate
+            FROM Expenses
+            WHERE {where}
+            ORDER BY ExpenseDate, ExpenseID
+            """,
+            params
+        )
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [_expense_row(r) for r in rows]
+
+
+def fetch_expenses_page(user_id, after=None, page_size=EXPENSE_PAGE_SIZE, sort_by="date",
+                        descending=True, category=None):
+    """Fetches one page of expenses using keyset (seek) pagination.
+
+    Rows are ordered by (`sort_by` column, ExpenseID) and `after` is the
+    cursor returned with the previous page. Returns (rows, next_cursor);
+    next_cursor is None once the last page has been read.
+    """
+    column, position = EXPENSE_SORT_COLUMNS[sort_by]
+    direction, seek_op = ("DESC", "<") if descending else ("ASC", ">")
+
+    where, params = "UserID = ?", [user_id]
+    if category is not None:
+        where += " AND Category = ?"
+        params.append(category)
+    if after is not None:
+        after_value, after_id = after
+        where += f" AND ({column} {seek_op} ? OR ({column} = ? AND ExpenseID {seek_op} ?))"
+        params.extend([after_value, after_value, after_id])
+
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                f"""
+                SELECT TOP (?) ExpenseID, ExpenseName, Category, Amount, ExpenseDate
+                FROM Expenses
+                WHERE {where}
+                ORDER BY {column} {direction}, ExpenseID {direction}
+                """,
+                (int(page_size), *params)
+            )
+            rows = cur.fetchall()
+            next_cursor = None
+            if len(rows) == page_size:
+                last = rows[-1]
+                next_cursor = (last[position], last[0])
+            return [_expense_row(r) for r in rows], next_cursor
+    except pyodbc.Error as ex:
+        print(f"Error during expenses page fetching: {ex}")
+        return [], None
+
+
+def fetch_expense_ids(user_id, category=None):
+    """Returns the ids of all user expenses (optionally of one category)."""
+    sql, params = "SELECT ExpenseID FROM Expenses WHERE UserID = ?", [user_id]
+    if category is not None:
+        sql += " AND Category = ?"
+        params.append(category)
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            return [r[0] for r in cur.fetchall()]
+    except pyodbc.Error as ex:
+        print(f"Error during expense ids fetching: {ex}")
+        return []
+
+
+def fetch_categories(user_id):
+    """Returns the distinct categories used by a user, sorted alphabetically."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT DISTINCT Category FROM Expenses WHERE UserID = ? ORDER BY Category",
+                (user_id,)
+            )
+            return [r[0] for r in cur.fetchall()]
+    except pyodbc.Error as ex:
+        print(f"Error during categories fetching: {ex}")
+        return []
+
+
+def fetch_analytics_summary(user_id, year, month, top_n=5, recent_limit=RECENT_TIMELINE_LIMIT):
+    """Returns the analytics aggregates computed server-side in one batch.
+
+    Result keys:
+      - category_totals: [(category, total)] sorted by total, largest first
+      - monthly_totals: [("YYYY-MM", total)] in chronological order
+      - month_total: total for the given year/month
+      - top: the `top_n` most expensive expenses
+      - recent: the `recent_limit` newest expenses (for the timeline)
+    """
+    summary = {"category_totals": [], "monthly_totals": [], "month_total": 0.0, "top": [], "recent": []}
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                SET NOCOUNT ON;
+
+                SELECT Category, SUM(Total)
+                FROM MonthlyCategoryTotals
+                WHERE UserID = ?
+                GROUP BY Category
+                ORDER BY SUM(Total) DESC;
+
+                SELECT YearMonth, SUM(Total)
+                FROM MonthlyCategoryTotals
+                WHERE UserID = ?
+                GROUP BY YearMonth
+                ORDER BY YearMonth;
+
+                SELECT SUM(Total)
+                FROM MonthlyCategoryTotals
+                WHERE UserID = ? AND YearMonth = ?;
+
+                SELECT TOP (?) ExpenseID, ExpenseName, Category, Amount, ExpenseDate
+                FROM Expenses
+                WHERE UserID = ?
+                ORDER BY Amount DESC, ExpenseID DESC;
+
+                SELECT TOP (?) ExpenseID, ExpenseName, Category, Amount, ExpenseDate
+                FROM Expenses
+                WHERE UserID = ?
+                ORDER BY ExpenseDate DESC, ExpenseID DESC;
+                """,
+                (user_id, user_id, user_id, f"{year:04d}-{month:02d}",
+                 int(top_n), user_id, int(recent_limit), user_id)
+            )
+
+            summary["category_totals"] = [(r[0], float(r[1])) for r in cur.fetchall()]
+            cur.nextset()
+            summary["monthly_totals"] = [(r[0], float(r[1])) for r in cur.fetchall()]
+            cur.nextset()
+            month_total = cur.fetchone()[0]
+            summary["month_total"] = float(month_total) if month_total else 0.0
+            cur.nextset()
+            summary["top"] = [_expense_row(r) for r in cur.fetchall()]
+            cur.nextset()
+            summary["recent"] = [_expense_row(r) for r in cur.fetchall()]
+            return summary
+    except pyodbc.Error as ex:
+        print(f"Error during analytics summary fetching: {ex}")
+        return summary
+
+
+def get_total_amount(user_id, start_date=None, end_date=None, category=None):
+    """Returns total expense amount, optionally within [start_date, end_date) and one category."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            if start_date is None and end_date is None:
+                # Whole-history totals come from the monthly rollup
+                sql, params = "SELECT SUM(Total) FROM MonthlyCategoryTotals WHERE UserID = ?", [user_id]
+            else:
+                range_sql, params = date_range_filter(start_date, end_date)
+                sql = f"SELECT SUM(Amount) FROM Expenses WHERE UserID = ?{range_sql}"
+                params.insert(0, user_id)
+            if category is not None:
+                sql += " AND Category = ?"
+                params.append(category)
+            cur.execute(sql, params)
+            result = cur.fetchone()[0]
+            return float(result) if result else 0.0
+    except pyodbc.Error as ex:
+        print(f"Error during expenses summing: {ex}")
+        return 0.0
+
+
+def get_total_amount_for_month(user_id, year, month):
+    """Returns total expenses for a specific month."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT SUM(Total) FROM MonthlyCategoryTotals WHERE UserID = ? AND YearMonth = ?",
+                (user_id, f"{year:04d}-{month:02d}")
+            )
+            result = cur.fetchone()[0]
+            return float(result) if result else 0.0
+    except pyodbc.Error as ex:
+        print(f"Error during monthly summing: {ex}")
+        return 0.0
+
+
+def delete_expense(expense_id, user_id):
+    """Deletes a specific user expense."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                DELETE FROM Expenses
+                OUTPUT DELETED.ExpenseID, DELETED.UserID INTO ExpenseTombstones (ExpenseID, UserID)
+                OUTPUT DELETED.Category, DELETED.Amount, DELETED.ExpenseDate
+                WHERE ExpenseID = ? AND UserID = ?
+                """,
+                (expense_id, user_id)
+            )
+            deleted = cur.fetchall()
+            _apply_rollup_deltas(cur, user_id, rollup_deltas(deleted, -1))
+            conn.commit()
+            return len(deleted) > 0
+    except pyodbc.Error as ex:
+        print(f"Error during expense deletion: {ex}")
+        return False
+
+
+def delete_expenses(user_id, expense_ids, chunk_size=DELETE_CHUNK_SIZE):
+    """Deletes many user expenses in one transaction.
+
+    Ids are sent in chunks that stay below the SQL Server parameter limit.
+    Returns the list of ids that were actually deleted.
+    """
+    ids = list(dict.fromkeys(int(eid) for eid in expense_ids))
+    if not ids:
+        return []
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            deleted = []
+            for start in range(0, len(ids), chunk_size):
+                chunk = ids[start:start + chunk_size]
+                placeholders = ", ".join("?" * len(chunk))
+                cur.execute(
+                    f"""
+                    DELETE FROM Expenses
+                    OUTPUT DELETED.ExpenseID, DELETED.UserID INTO ExpenseTombstones (ExpenseID, UserID)
+                    OUTPUT DELETED.ExpenseID, DELETED.Category, DELETED.Amount, DELETED.ExpenseDate
+                    WHERE UserID = ? AND ExpenseID IN ({placeholders})
+                    """,
+                    (user_id, *chunk)
+                )
+                deleted.extend(cur.fetchall())
+            _apply_rollup_deltas(cur, user_id, rollup_deltas([r[1:] for r in deleted], -1))
+            conn.commit()
+            return [r[0] for r in deleted]
+    except pyodbc.Error as ex:
+        print(f"Error during expenses deletion: {ex}")
+        return []
+
+
+def delete_all_expenses(user_id):
+    """Deletes all expenses for a user."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                DELETE FROM Expenses
+                OUTPUT DELETED.ExpenseID, DELETED.UserID INTO ExpenseTombstones (ExpenseID, UserID)
+                WHERE UserID = ?
+                """,
+                (user_id,)
+            )
+            cur.execute("DELETE FROM MonthlyCategoryTotals WHERE UserID = ?", (user_id,))
+            conn.commit()
+            return True
+    except pyodbc.Error as ex:
+        print(f"Error during expenses deletion: {ex}")
+        return False
+
+
+def fetch_dashboard_bootstrap(user_id, recent_limit=5):
+    """Loads settings, the total and the newest expenses for the first dashboard paint.
+
+    All three come back as result sets of one batch. Returns
+    {"settings": {...}, "total": float, "recent": [...]} or None on error.
+    """
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                SET NOCOUNT ON;
+
+                SELECT Currency, Theme, Budget FROM UserSettings WHERE UserID = ?;
+
+                SELECT SUM(Total) FROM MonthlyCategoryTotals WHERE UserID = ?;
+
+                SELECT TOP (?) ExpenseID, ExpenseName, Category, Amount, ExpenseDate
+                FROM Expenses
+                WHERE UserID = ?
+                ORDER BY ExpenseDate DESC, ExpenseID DESC;
+                """,
+                (user_id, user_id, int(recent_limit), user_id)
+            )
+            settings = settings_from_row(cur.fetchone())
+            cur.nextset()
+            total = cur.fetchone()[0]
+            cur.nextset()
+            recent = [_expense_row(r) for r in cur.fetchall()]
+            return {"settings": settings, "total": float(total) if total else 0.0, "recent": recent}
+    except pyodbc.Error as ex:
+        print(f"Error during dashboard bootstrap: {ex}")
+        return None
+
+
+def fetch_changes_since(user_id, watermark=None):
+    """Returns the expense changes committed after `watermark`.
+
+    Result: {"upserts": [rows], "deleted": [ids], "watermark": int, "reset": bool}.
+    Pass the returned watermark to the next call. With `watermark=None` every
+    row is returned (initial load). The upper bound is MIN_ACTIVE_ROWVERSION(),
+    so rows of transactions still in flight are picked up by a later call.
+    When tombstones newer than `watermark` have been pruned, every row is
+    returned with "reset" set and the caller must replace its copy.
+    """
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                SET NOCOUNT ON;
+                DECLARE @watermark BIGINT = ?;
+                DECLARE @reset BIT = CASE
+                    WHEN @watermark < (SELECT Value FROM TombstoneHorizon) THEN 1 ELSE 0 END;
+                DECLARE @since BINARY(8) = CAST(
+                    CASE WHEN @reset = 1 THEN 0 ELSE ISNULL(@watermark, 0) END AS BINARY(8));
+                DECLARE @upto BINARY(8) = MIN_ACTIVE_ROWVERSION();
+
+                SELECT CAST(@upto AS BIGINT) - 1, @reset;
+
+                SELECT ExpenseID, ExpenseName, Category, Amount, ExpenseDate
+                FROM Expenses
+                WHERE UserID = ? AND RowVer > @since AND RowVer < @upto;
+
+                SELECT ExpenseID
+                FROM ExpenseTombstones
+                WHERE UserID = ? AND RowVer > @since AND RowVer < @upto
+                  AND @watermark IS NOT NULL AND @reset = 0;
+                """,
+                (watermark, user_id, user_id)
+            )
+            new_watermark, reset = cur.fetchone()
+            cur.nextset()
+            upserts = [_expense_row(r) for r in cur.fetchall()]
+            cur.nextset()
+            deleted = [r[0] for r in cur.fetchall()]
+            return {"upserts": upserts, "deleted": deleted, "watermark": new_watermark,
+                    "reset": bool(reset)}
+    except pyodbc.Error as ex:
+        print(f"Error during change fetching: {ex}")
+        return None
+
+
+def get_change_watermark():
+    """Returns the current change watermark without reading any rows (None on error)."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT CAST(MIN_ACTIVE_ROWVERSION() AS BIGINT) - 1")
+            return cur.fetchone()[0]
+    except pyodbc.Error as ex:
+        print(f"Error during watermark fetching: {ex}")
+        return None
+
+
+def prune_tombstones(retention_days=TOMBSTONE_RETENTION_DAYS):
+    """Deletes tombstones older than `retention_days`.
+
+    The highest pruned RowVer becomes the tombstone horizon: a client whose
+    watermark is below it may have missed a deletion, so fetch_changes_since
+    answers it with a full reset. Returns the number of removed tombstones,
+    or None on error.
+    """
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                SET NOCOUNT ON;
+                DECLARE @pruned BINARY(8) = (
+                    SELECT MAX(RowVer) FROM ExpenseTombstones
+                    WHERE DeletedAt < DATEADD(DAY, -?, SYSUTCDATETIME())
+                );
+                DECLARE @removed INT = 0;
+                IF @pruned IS NOT NULL
+                BEGIN
+                    DELETE FROM ExpenseTombstones WHERE RowVer <= @pruned;
+                    SET @removed = @@ROWCOUNT;
+                    UPDATE TombstoneHorizon SET Value = CAST(@pruned AS BIGINT)
+                    WHERE Value < CAST(@pruned AS BIGINT);
+                END;
+                SELECT @removed;
+                """,
+                (int(retention_days),)
+            )
+            removed = cur.fetchone()[0]
+            conn.commit()
+            return removed
+    except pyodbc.Error as ex:
+        print(f"Error during tombstone pruning: {ex}")
+        return None
+
+
+# ------------ MONTHLY ROLLUP MAINTENANCE ------------
+
+def verify_monthly_totals(user_id=None):
+    """Compares MonthlyCategoryTotals with the raw Expenses rows.
+
+    Returns a list of drifted entries as dicts with the rollup and the
+    actual (total, count) for every mismatching (UserID, YearMonth, Category).
+    """
+    user_filter, params = ("WHERE UserID = ?", [user_id, user_id]) if user_id is not None else ("", [])
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                f"""
+                WITH Actual AS (
+                    SELECT UserID, CONVERT(CHAR(7), ExpenseDate, 120) AS YearMonth, Category,
+                           SUM(Amount) AS Total, COUNT(*) AS Count
+                    FROM Expenses
+                    {user_filter}
+                    GROUP BY UserID, CONVERT(CHAR(7), ExpenseDate, 120), Category
+                ),
+                Rollup AS (
+                    SELECT UserID, YearMonth, Category, Total, Count
+                    FROM MonthlyCategoryTotals
+                    {user_filter}
+                )
+                SELECT COALESCE(a.UserID, r.UserID), COALESCE(a.YearMonth, r.YearMonth),
+                       COALESCE(a.Category, r.Category), r.Total, r.Count, a.Total, a.Count
+                FROM Actual a
+                FULL OUTER JOIN Rollup r
+                  ON a.UserID = r.UserID AND a.YearMonth = r.YearMonth AND a.Category = r.Category
+                WHERE a.UserID IS NULL OR r.UserID IS NULL
+                   OR a.Total <> r.Total OR a.Count <> r.Count
+                """,
+                params
+            )
+            return [
+                {
+                    "user_id": r[0], "year_month": r[1], "category": r[2],
+                    "rollup_total": float(r[3]) if r[3] is not None else None, "rollup_count": r[4],
+                    "actual_total": float(r[5]) if r[5] is not None else None, "actual_count": r[6],
+                }
+                for r in cur.fetchall()
+            ]
+    except pyodbc.Error as ex:
+        print(f"Error during rollup verification: {ex}")
+        return []
+
+
+def rebuild_monthly_totals(user_id=None):
+    """Recomputes MonthlyCategoryTotals from Expenses (for one user or everyone)."""
+    user_filter, params = ("WHERE UserID = ?", [user_id]) if user_id is not None else ("", [])
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(f"DELETE FROM MonthlyCategoryTotals {user_filter}", params)
+            cur.execute(
+                f"INSERT INTO MonthlyCategoryTotals {_ROLLUP_FROM_EXPENSES_TEMPLATE.format(where=user_filter)}",
+                params
+            )
+            conn.commit()
+            return True
+    except pyodbc.Error as ex:
+        print(f"Error during rollup rebuild: {ex}")
+        return False
+
+
+# ------------ USER SETTINGS ------------
+
+def load_user_settings(user_id):
+    """Loads all user settings."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT Currency, Theme, Budget FROM UserSettings WHERE UserID = ?", (user_id,))
+            return settings_from_row(cur.fetchone())
+    except pyodbc.Error as ex:
+        print(f"Error during settings load: {ex}")
+        return {}
+
+
+def save_user_setting(user_id, setting_name, setting_value):
+    """Saves a single user setting (currency/theme/budget)."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+
+            if setting_name.lower() == 'budget':
+                setting_value = Decimal(str(setting_value))
+
+            sql = f"UPDATE UserSettings SET {SETTING_COLUMNS[setting_name.lower()]} = ? WHERE UserID = ?"
+            cur.execute(sql, (setting_value, user_id))
+            conn.commit()
+            return True
+    except pyodbc.Error as ex:
+        print(f"Error during settings saving: {ex}")
+        return False
+
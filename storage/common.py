@@ -0,0 +1,57 @@
+import os
+from decimal import Decimal
+
+# Shared by every backend so both engines page, batch and sort the same way
+BULK_BATCH_SIZE = int(os.getenv('DB_BULK_BATCH_SIZE', '5000'))
+RECENT_TIMELINE_LIMIT = 100
+EXPENSE_PAGE_SIZE = 200
+FRAME_BATCH_SIZE = 10000
+EXPORT_BATCH_SIZE = int(os.getenv('DB_EXPORT_BATCH_SIZE', '5000'))
+# Deletions older than this are forgotten; clients that last synced before them resync fully
+TOMBSTONE_RETENTION_DAYS = int(os.getenv('DB_TOMBSTONE_RETENTION_DAYS', '30'))
+
+# Sort keys accepted by fetch_expenses_page -> (column, position in the raw row)
+EXPENSE_SORT_COLUMNS = {
+    "date": ("ExpenseDate", 4),
+    "amount": ("Amount", 3),
+    "title": ("ExpenseName", 1),
+    "category": ("Category", 2),
+}
+
+# Columns save_user_setting may update
+SETTING_COLUMNS = {"currency": "Currency", "theme": "Theme", "budget": "Budget"}
+
+
+def date_range_filter(start_date=None, end_date=None, convert=lambda d: d):
+    """Builds a sargable `ExpenseDate >= ? AND ExpenseDate < ?` filter."""
+    sql, params = "", []
+    if start_date is not None:
+        sql += " AND ExpenseDate >= ?"
+        params.append(convert(start_date))
+    if end_date is not None:
+        sql += " AND ExpenseDate < ?"
+        params.append(convert(end_date))
+    return sql, params
+
+
+def rollup_deltas(rows, sign):
+    """Groups (category, amount, date) rows into {(YearMonth, Category): (amount, count)} deltas."""
+    deltas = {}
+    for category, amount, expense_date in rows:
+        if not isinstance(expense_date, str):
+            expense_date = expense_date.strftime('%Y-%m-%d')
+        key = (expense_date[:7], category)
+        total, count = deltas.get(key, (Decimal('0'), 0))
+        deltas[key] = (total + sign * Decimal(str(amount)), count + sign)
+    return deltas
+
+
+def settings_from_row(row):
+    """Converts a (Currency, Theme, Budget) row into the settings dict used by the app."""
+    if not row:
+        return {}
+    return {
+        "currency": row[0],
+        "theme": row[1],
+        "budget": float(row[2]) if row[2] is not None else 0.0
+    }
@@ -0,0 +1,830 @@
+"""Embedded SQLite storage backend for offline use, tests and benchmarks.
+
+Implements the same functions as storage.azure_sql on a local database file
+(SQLITE_PATH, ":memory:" is not supported because every pooled connection
+would see its own database). Amounts are stored as REAL rounded to cents and
+dates as 'YYYY-MM-DD' text.
+"""
+import os
+import sqlite3
+import bcrypt
+from datetime import date as date_cls
+from storage import InvalidExpenseError
+from storage.common import (
+    BULK_BATCH_SIZE, EXPENSE_PAGE_SIZE, EXPENSE_SORT_COLUMNS, EXPORT_BATCH_SIZE, FRAME_BATCH_SIZE,
+    RECENT_TIMELINE_LIMIT, SETTING_COLUMNS, TOMBSTONE_RETENTION_DAYS, date_range_filter, rollup_deltas,
+    settings_from_row,
+)
+from utils.connection_pool import ConnectionPool
+from utils.expense_frame import ExpenseFrame
+
+SQLITE_PATH = os.getenv('SQLITE_PATH', os.path.join(os.path.expanduser("~"), ".finance_tracker", "budget.db"))
+SQLITE_POOL_MAX_SIZE = int(os.getenv('SQLITE_POOL_MAX_SIZE', '4'))
+# Identifies the database this backend talks to (see database.STORAGE_ID)
+DATABASE_ID = os.path.abspath(SQLITE_PATH)
+
+# SQLite's default limit on host parameters is 32766; stay well below it
+DELETE_CHUNK_SIZE = 2000
+
+
+def _get_connection():
+    """Opens a connection to the local database file (shared between threads via the pool)."""
+    directory = os.path.dirname(SQLITE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(SQLITE_PATH, timeout=30, check_same_thread=False)
+    # WAL lets the UI read while a worker writes
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+# A rejected row leaves the connection healthy: roll it back and keep it
+_pool = ConnectionPool(_get_connection, min_size=0, max_size=SQLITE_POOL_MAX_SIZE,
+                       keep_on=(sqlite3.IntegrityError, sqlite3.DataError))
+
+
+def _iso(value):
+    """Dates are stored as ISO text, so date objects are converted before binding."""
+    return value.isoformat() if isinstance(value, date_cls) else value
+
+
+def _money(amount):
+    return round(float(amount), 2)
+
+
+def _expense_row(r):
+    """Converts a DB row into the (id, title, category, amount, 'YYYY-MM-DD') tuple used by the pages."""
+    return (r[0], r[1], r[2], float(r[3]), r[4])
+
+
+_ROLLUP_FROM_EXPENSES_TEMPLATE = """
+    (UserID, YearMonth, Category, Total, Count)
+    SELECT UserID, substr(ExpenseDate, 1, 7), Category, ROUND(SUM(Amount), 2), COUNT(*)
+    FROM Expenses
+    {where}
+    GROUP BY UserID, substr(ExpenseDate, 1, 7), Category
+"""
+
+
+def _apply_rollup_deltas(cur, user_id, deltas):
+    """Applies grouped deltas to MonthlyCategoryTotals inside the caller's transaction."""
+    if not deltas:
+        return
+    cur.executemany(
+        """
+        INSERT INTO MonthlyCategoryTotals (UserID, YearMonth, Category, Total, Count)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (UserID, YearMonth, Category) DO UPDATE SET
+            Total = ROUND(Total + excluded.Total, 2),
+            Count = Count + excluded.Count
+        """,
+        [(user_id, ym, category, float(total), count) for (ym, category), (total, count) in deltas.items()]
+    )
+    cur.execute("DELETE FROM MonthlyCategoryTotals WHERE UserID = ? AND Count <= 0", (user_id,))
+
+
+def get_pool():
+    """Returns the connection pool (used for instrumentation and diagnostics)."""
+    return _pool
+
+
+def close_pool():
+    """Closes all pooled connections (call on application exit)."""
+    _pool.close()
+
+
+def init_database():
+    """Ensures that all required tables exist. Returns False if the DB is unusable."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.executescript("""
+                CREATE TABLE IF NOT EXISTS Users (
+                    UserID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Username TEXT UNIQUE NOT NULL COLLATE NOCASE,
+                    PasswordHash TEXT NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS UserSettings (
+                    UserID INTEGER PRIMARY KEY,
+                    Currency TEXT DEFAULT 'PLN',
+                    Theme TEXT DEFAULT 'System',
+                    Budget REAL DEFAULT 0.00
+                );
+
+                CREATE TABLE IF NOT EXISTS Expenses (
+                    ExpenseID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    UserID INTEGER NOT NULL,
+                    ExpenseName TEXT NOT NULL,
+                    Category TEXT NOT NULL,
+                    Amount REAL NOT NULL,
+                    ExpenseDate TEXT NOT NULL
+                );
+
+                -- Covers every per-user query (newest-first listing, totals, monthly ranges)
+                CREATE INDEX IF NOT EXISTS IX_Expenses_User_Date
+                ON Expenses (UserID, ExpenseDate DESC, ExpenseID DESC);
+            """)
+
+            # Change tracking for delta sync. SQLite has no ROWVERSION, so triggers stamp
+            # rows and tombstones from a single counter (see fetch_changes_since)
+            cur.execute("PRAGMA table_info(Expenses)")
+            if "RowVer" not in [r[1] for r in cur.fetchall()]:
+                cur.execute("ALTER TABLE Expenses ADD COLUMN RowVer INTEGER NOT NULL DEFAULT 0")
+            cur.executescript("""
+                CREATE INDEX IF NOT EXISTS IX_Expenses_User_RowVer ON Expenses (UserID, RowVer);
+
+                CREATE TABLE IF NOT EXISTS ChangeCounter (Value INTEGER NOT NULL);
+                INSERT INTO ChangeCounter (Value)
+                SELECT IFNULL(MAX(RowVer), 0) FROM Expenses WHERE NOT EXISTS (SELECT * FROM ChangeCounter);
+
+                CREATE TABLE IF NOT EXISTS ExpenseTombstones (
+                    ExpenseID INTEGER PRIMARY KEY,
+                    UserID INTEGER NOT NULL,
+                    RowVer INTEGER NOT NULL,
+                    DeletedAt TEXT NOT NULL DEFAULT (datetime('now'))
+                );
+                CREATE INDEX IF NOT EXISTS IX_ExpenseTombstones_User_RowVer
+                ON ExpenseTombstones (UserID, RowVer);
+
+                -- Highest RowVer of the pruned tombstones (see prune_tombstones)
+                CREATE TABLE IF NOT EXISTS TombstoneHorizon (Value INTEGER NOT NULL);
+                INSERT INTO TombstoneHorizon (Value)
+                SELECT 0 WHERE NOT EXISTS (SELECT * FROM TombstoneHorizon);
+
+                CREATE TRIGGER IF NOT EXISTS TR_Expenses_Insert AFTER INSERT ON Expenses BEGIN
+                    UPDATE ChangeCounter SET Value = Value + 1;
+                    UPDATE Expenses SET RowVer = (SELECT Value FROM ChangeCounter)
+                    WHERE ExpenseID = NEW.ExpenseID;
+                END;
+
+                CREATE TRIGGER IF NOT EXISTS TR_Expenses_Update
+                AFTER UPDATE OF UserID, ExpenseName, Category, Amount, ExpenseDate ON Expenses BEGIN
+                    UPDATE ChangeCounter SET Value = Value + 1;
+                    UPDATE Expenses SET RowVer = (SELECT Value FROM ChangeCounter)
+                    WHERE ExpenseID = NEW.ExpenseID;
+                END;
+            """)
+            cur.execute("PRAGMA table_info(ExpenseTombstones)")
+            if "DeletedAt" not in [r[1] for r in cur.fetchall()]:
+                # ADD COLUMN only takes constant defaults, so the trigger stamps new rows
+                cur.execute("ALTER TABLE ExpenseTombstones ADD COLUMN DeletedAt TEXT")
+                cur.execute("UPDATE ExpenseTombstones SET DeletedAt = datetime('now')")
+                cur.execute("DROP TRIGGER IF EXISTS TR_Expenses_Delete")
+            cur.execute("""
+                CREATE TRIGGER IF NOT EXISTS TR_Expenses_Delete AFTER DELETE ON Expenses BEGIN
+                    UPDATE ChangeCounter SET Value = Value + 1;
+                    INSERT OR REPLACE INTO ExpenseTombstones (ExpenseID, UserID, RowVer, DeletedAt)
+                    VALUES (OLD.ExpenseID, OLD.UserID, (SELECT Value FROM ChangeCounter), datetime('now'));
+                END
+            """)
+
+            # Per-user monthly rollup kept in sync by every write function
+            cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'MonthlyCategoryTotals'")
+            if cur.fetchone() is None:
+                cur.execute("""
+                    CREATE TABLE MonthlyCategoryTotals (
+                        UserID INTEGER NOT NULL,
+                        YearMonth TEXT NOT NULL,
+                        Category TEXT NOT NULL,
+                        Total REAL NOT NULL,
+                        Count INTEGER NOT NULL,
+                        PRIMARY KEY (UserID, YearMonth, Category)
+                    )
+                """)
+                cur.execute(f"INSERT INTO MonthlyCategoryTotals {_ROLLUP_FROM_EXPENSES_TEMPLATE.format(where='')}")
+
+            conn.commit()
+    except (sqlite3.Error, OSError) as ex:
+        print(f"Error, cannot initialize the schema: {ex}")
+        return False
+    prune_tombstones()
+    return True
+
+
+# ------------ USER MANAGEMENT ------------
+
+def create_user(username, password):
+    """Creates a new user and stores default settings."""
+    password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO Users (Username, PasswordHash) VALUES (?, ?) RETURNING UserID",
+                (username, password_hash)
+            )
+            user_id = cur.fetchone()[0]
+            cur.execute(
+                "INSERT INTO UserSettings (UserID, Currency, Theme, Budget) VALUES (?, ?, ?, ?)",
+                (user_id, 'PLN', 'Dark', 0.0)
+            )
+            conn.commit()
+            return True
+    except sqlite3.IntegrityError:
+        return False
+    except sqlite3.Error as ex:
+        print(f"Error, cannot create new user: {ex}")
+        return False
+
+
+def get_user(username):
+    """Returns user data including hashed password."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT UserID, Username, PasswordHash FROM Users WHERE Username=?", (username,))
+            row = cur.fetchone()
+            if row:
+                return {"id": row[0], "username": row[1], "password_hash": row[2]}
+            return None
+    except sqlite3.Error as ex:
+        print(f"Error, cannot fetch user: {ex}")
+        return None
+
+
+# ------------ EXPENSE MANAGEMENT ------------
+
+def insert_expense(user_id, title, category, amount, date):
+    """Inserts a new expense and returns its ExpenseID (None on failure)."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            # The rollup gets the same rounded amount that is stored
+            amount, date = _money(amount), _iso(date)
+            cur.execute(
+                """
+                INSERT INTO Expenses (UserID, ExpenseName, Category, Amount, ExpenseDate)
+                VALUES (?, ?, ?, ?, ?)
+                RETURNING ExpenseID
+                """,
+                (user_id, title, category, amount, date)
+            )
+            expense_id = cur.fetchone()[0]
+            _apply_rollup_deltas(cur, user_id, rollup_deltas([(category, amount, date)], 1))
+            conn.commit()
+            return expense_id
+    except sqlite3.Error as ex:
+        print(f"Error during expenses adding: {ex}")
+        return None
+
+
+def bulk_insert_expenses(user_id, rows, batch_size=BULK_BATCH_SIZE, progress_callback=None):
+    """Inserts many expenses in parameter batches within a single transaction.
+
+    `rows` is an iterable of (title, category, amount, date) tuples.
+    `progress_callback(inserted, total)` is called after every batch.
+    Returns the inserted rows as (id, title, category, amount, date) tuples
+    in input order, or an empty list if the import was rolled back. Raises InvalidExpenseError
+    (nothing saved) when the DB rejects a value, e.g. a NULL or overlong field.
+    """
+    params = [
+        (user_id, str(title), str(category), _money(amount), _iso(date))
+        for title, category, amount, date in rows
+    ]
+    if not params:
+        return []
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            # Take the write lock first: no other writer can add rows between reading
+            # MAX(ExpenseID) and the commit, so every newer row is one of ours
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute("SELECT IFNULL(MAX(ExpenseID), 0) FROM Expenses WHERE UserID = ?", (user_id,))
+            last_id = cur.fetchone()[0]
+            inserted = 0
+            for start in range(0, len(params), batch_size):
+                batch = params[start:start + batch_size]
+                cur.executemany(
+                    """
+                    INSERT INTO Expenses (UserID, ExpenseName, Category, Amount, ExpenseDate)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    batch
+                )
+                inserted += len(batch)
+                if progress_callback:
+                    progress_callback(inserted, len(params))
+            cur.execute(
+                """
+                SELECT ExpenseID, ExpenseName, Category, Amount, ExpenseDate
+                FROM Expenses
+                WHERE UserID = ? AND ExpenseID > ?
+                ORDER BY ExpenseID
+                """,
+                (user_id, last_id)
+            )
+            new_rows = [_expense_row(r) for r in cur.fetchall()]
+            _apply_rollup_deltas(cur, user_id, rollup_deltas([(r[2], r[3], r[4]) for r in new_rows], 1))
+            conn.commit()
+            return new_rows
+    except (sqlite3.IntegrityError, sqlite3.DataError) as ex:
+        print(f"Error during bulk expenses adding: {ex}")
+        raise InvalidExpenseError(str(ex)) from ex
+    except sqlite3.Error as ex:
+        print(f"Error during bulk expenses adding: {ex}")
+        return []
+
+
+def fetch_expenses(user_id, limit=None, start_date=None, end_date=None, as_frame=False):
+    """Fetches user expenses sorted by newest first.
+
+    `start_date` / `end_date` restrict the result to the half-open range
+    [start_date, end_date). With `as_frame` the rows are streamed from the
+    cursor in batches straight into an ExpenseFrame instead of a list.
+    """
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+
+            range_sql, range_params = date_range_filter(start_date, end_date, convert=_iso)
+            sql = f"""
+            SELECT ExpenseID, ExpenseName, Category, Amount, ExpenseDate
+            FROM Expenses
+            WHERE UserID = ?{range_sql}
+            ORDER BY ExpenseDate DESC, ExpenseID DESC
+            """
+
+            if limit:
+                sql += f" LIMIT {int(limit)}"
+
+            cur.execute(sql, (user_id, *range_params))
+            if as_frame:
+                return ExpenseFrame.from_batches(iter(lambda: cur.fetchmany(FRAME_BATCH_SIZE), []))
+            return [_expense_row(r) for r in cur.fetchall()]
+    except sqlite3.Error as ex:
+        print(f"Error during expenses fetching: {ex}")
+        return ExpenseFrame.empty() if as_frame else []
+
+
+def _export_filter(user_id, start_date, end_date, category):
+    range_sql, params = date_range_filter(start_date, end_date, convert=_iso)
+    sql = f"UserID = ?{range_sql}"
+    params.insert(0, user_id)
+    if category is not None:
+        sql += " AND Category = ?"
+        params.append(category)
+    return sql, params
+
+
+def count_expenses(user_id, start_date=None, end_date=None, category=None):
+    """Counts the rows stream_expenses() would return (None on error)."""
+    where, params = _export_filter(user_id, start_date, end_date, category)
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(f"SELECT COUNT(*) FROM Expenses WHERE {where}", params)
+            return cur.fetchone()[0]
+    except sqlite3.Error as ex:
+        print(f"Error during expenses counting: {ex}")
+        return None
+
+
+def stream_expenses(user_id, start_date=None, end_date=None, category=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yields the matching expenses oldest first, in lists of up to `batch_size` rows.
+
+    Rows are read from the open cursor with fetchmany, so memory use does not
+    depend on the result size. Unlike the other readers, DB errors are raised:
+    a half-written export must not look complete.
+    """
+    where, params = _export_filter(user_id, start_date, end_date, category)
+    with _pool.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT ExpenseID, ExpenseName, Category, Amount, ExpenseDate
+            FROM Expenses
+            WHERE {where}
+            ORDER BY ExpenseDate, ExpenseID
+            """,
+            params
+        )
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [_expense_row(r) for r in rows]
+
+
+def fetch_expenses_page(user_id, after=None, page_size=EXPENSE_PAGE_SIZE, sort_by="date",
+                        descending=True, category=None):
+    """Fetches one page of expenses using keyset (seek) pagination.
+
+    Rows are ordered by (`sort_by` column, ExpenseID) and `after` is the
+    cursor returned with the previous page. Returns (rows, next_cursor);
+    next_cursor is None once the last page has been read.
+    """
+    column, position = EXPENSE_SORT_COLUMNS[sort_by]
+    direction, seek_op = ("DESC", "<") if descending else ("ASC", ">")
+
+    where, params = "UserID = ?", [user_id]
+    if category is not None:
+        where += " AND Category = ?"
+        params.append(category)
+    if after is not None:
+        after_value, after_id = after
+        where += f" AND ({column} {seek_op} ? OR ({column} = ? AND ExpenseID {seek_op} ?))"
+        params.extend([_iso(after_value), _iso(after_value), after_id])
+
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                f"""
+                SELECT ExpenseID, ExpenseName, Category, Amount, ExpenseDate
+                FROM Expenses
+                WHERE {where}
+                ORDER BY {column} {direction}, ExpenseID {direction}
+                LIMIT ?
+                """,
+                (*params, int(page_size))
+            )
+            rows = cur.fetchall()
+            next_cursor = None
+            if len(rows) == page_size:
+                last = rows[-1]
+                next_cursor = (last[position], last[0])
+            return [_expense_row(r) for r in rows], next_cursor
+    except sqlite3.Error as ex:
+        print(f"Error during expenses page fetching: {ex}")
+        return [], None
+
+
+def fetch_expense_ids(user_id, category=None):
+    """Returns the ids of all user expenses (optionally of one category)."""
+    sql, params = "SELECT ExpenseID FROM Expenses WHERE UserID = ?", [user_id]
+    if category is not None:
+        sql += " AND Category = ?"
+        params.append(category)
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            return [r[0] for r in cur.fetchall()]
+    except sqlite3.Error as ex:
+        print(f"Error during expense ids fetching: {ex}")
+        return []
+
+
+def fetch_categories(user_id):
+    """Returns the distinct categories used by a user, sorted alphabetically."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT DISTINCT Category FROM Expenses WHERE UserID = ? ORDER BY Category",
+                (user_id,)
+            )
+            return [r[0] for r in cur.fetchall()]
+    except sqlite3.Error as ex:
+        print(f"Error during categories fetching: {ex}")
+        return []
+
+
+def fetch_analytics_summary(user_id, year, month, top_n=5, recent_limit=RECENT_TIMELINE_LIMIT):
+    """Returns the analytics aggregates in the shape of storage.azure_sql.fetch_analytics_summary().
+
+    SQLite has no multi-result-set batches, but all five queries are local
+    and run on one connection.
+    """
+    summary = {"category_totals": [], "monthly_totals": [], "month_total": 0.0, "top": [], "recent": []}
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                SELECT Category, SUM(Total) FROM MonthlyCategoryTotals
+                WHERE UserID = ? GROUP BY Category ORDER BY SUM(Total) DESC
+                """,
+                (user_id,)
+            )
+            summary["category_totals"] = [(r[0], float(r[1])) for r in cur.fetchall()]
+            cur.execute(
+                """
+                SELECT YearMonth, SUM(Total) FROM MonthlyCategoryTotals
+                WHERE UserID = ? GROUP BY YearMonth ORDER BY YearMonth
+                """,
+                (user_id,)
+            )
+            summary["monthly_totals"] = [(r[0], float(r[1])) for r in cur.fetchall()]
+            cur.execute(
+                "SELECT SUM(Total) FROM MonthlyCategoryTotals WHERE UserID = ? AND YearMonth = ?",
+                (user_id, f"{year:04d}-{month:02d}")
+            )
+            month_total = cur.fetchone()[0]
+            summary["month_total"] = float(month_total) if month_total else 0.0
+            cur.execute(
+                """
+                SELECT ExpenseID, ExpenseName, Category, Amount, ExpenseDate FROM Expenses
+                WHERE UserID = ? ORDER BY Amount DESC, ExpenseID DESC LIMIT ?
+                """,
+                (user_id, int(top_n))
+            )
+            summary["top"] = [_expense_row(r) for r in cur.fetchall()]
+            cur.execute(
+                """
+                SELECT ExpenseID, ExpenseName, Category, Amount, ExpenseDate FROM Expenses
+                WHERE UserID = ? ORDER BY ExpenseDate DESC, ExpenseID DESC LIMIT ?
+                """,
+                (user_id, int(recent_limit))
+            )
+            summary["recent"] = [_expense_row(r) for r in cur.fetchall()]
+            return summary
+    except sqlite3.Error as ex:
+        print(f"Error during analytics summary fetching: {ex}")
+        return summary
+
+
+def get_total_amount(user_id, start_date=None, end_date=None, category=None):
+    """Returns total expense amount, optionally within [start_date, end_date) and one category."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            if start_date is None and end_date is None:
+                # Whole-history totals come from the monthly rollup
+                sql, params = "SELECT SUM(Total) FROM MonthlyCategoryTotals WHERE UserID = ?", [user_id]
+            else:
+                range_sql, params = date_range_filter(start_date, end_date, convert=_iso)
+                sql = f"SELECT SUM(Amount) FROM Expenses WHERE UserID = ?{range_sql}"
+                params.insert(0, user_id)
+            if category is not None:
+                sql += " AND Category = ?"
+                params.append(category)
+            cur.execute(sql, params)
+            result = cur.fetchone()[0]
+            return round(float(result), 2) if result else 0.0
+    except sqlite3.Error as ex:
+        print(f"Error during expenses summing: {ex}")
+        return 0.0
+
+
+def get_total_amount_for_month(user_id, year, month):
+    """Returns total expenses for a specific month."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT SUM(Total) FROM MonthlyCategoryTotals WHERE UserID = ? AND YearMonth = ?",
+                (user_id, f"{year:04d}-{month:02d}")
+            )
+            result = cur.fetchone()[0]
+            return round(float(result), 2) if result else 0.0
+    except sqlite3.Error as ex:
+        print(f"Error during monthly summing: {ex}")
+        return 0.0
+
+
+def delete_expense(expense_id, user_id):
+    """Deletes a specific user expense."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                DELETE FROM Expenses
+                WHERE ExpenseID = ? AND UserID = ?
+                RETURNING Category, Amount, ExpenseDate
+                """,
+                (expense_id, user_id)
+            )
+            deleted = cur.fetchall()
+            _apply_rollup_deltas(cur, user_id, rollup_deltas(deleted, -1))
+            conn.commit()
+            return len(deleted) > 0
+    except sqlite3.Error as ex:
+        print(f"Error during expense deletion: {ex}")
+        return False
+
+
+def delete_expenses(user_id, expense_ids, chunk_size=DELETE_CHUNK_SIZE):
+    """Deletes many user expenses in one transaction and returns the ids actually deleted."""
+    ids = list(dict.fromkeys(int(eid) for eid in expense_ids))
+    if not ids:
+        return []
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            deleted = []
+            for start in range(0, len(ids), chunk_size):
+                chunk = ids[start:start + chunk_size]
+                placeholders = ", ".join("?" * len(chunk))
+                cur.execute(
+                    f"""
+                    DELETE FROM Expenses
+                    WHERE UserID = ? AND ExpenseID IN ({placeholders})
+                    RETURNING ExpenseID, Category, Amount, ExpenseDate
+                    """,
+                    (user_id, *chunk)
+                )
+                deleted.extend(cur.fetchall())
+            _apply_rollup_deltas(cur, user_id, rollup_deltas([r[1:] for r in deleted], -1))
+            conn.commit()
+            return [r[0] for r in deleted]
+    except sqlite3.Error as ex:
+        print(f"Error during expenses deletion: {ex}")
+        return []
+
+
+def delete_all_expenses(user_id):
+    """Deletes all expenses for a user."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM Expenses WHERE UserID = ?", (user_id,))
+            cur.execute("DELETE FROM MonthlyCategoryTotals WHERE UserID = ?", (user_id,))
+            conn.commit()
+            return True
+    except sqlite3.Error as ex:
+        print(f"Error during expenses deletion: {ex}")
+        return False
+
+
+def fetch_dashboard_bootstrap(user_id, recent_limit=5):
+    """Loads settings, the total and the newest expenses for the first dashboard paint.
+
+    Returns {"settings": {...}, "total": float, "recent": [...]} or None on error.
+    """
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT Currency, Theme, Budget FROM UserSettings WHERE UserID = ?", (user_id,))
+            settings = settings_from_row(cur.fetchone())
+            cur.execute("SELECT SUM(Total) FROM MonthlyCategoryTotals WHERE UserID = ?", (user_id,))
+            total = cur.fetchone()[0]
+            cur.execute(
+                """
+                SELECT ExpenseID, ExpenseName, Category, Amount, ExpenseDate FROM Expenses
+                WHERE UserID = ? ORDER BY ExpenseDate DESC, ExpenseID DESC LIMIT ?
+                """,
+                (user_id, int(recent_limit))
+            )
+            recent = [_expense_row(r) for r in cur.fetchall()]
+            return {"settings": settings, "total": round(float(total), 2) if total else 0.0, "recent": recent}
+    except sqlite3.Error as ex:
+        print(f"Error during dashboard bootstrap: {ex}")
+        return None
+
+
+def fetch_changes_since(user_id, watermark=None):
+    """Returns the expense changes committed after `watermark` (see storage.azure_sql).
+
+    SQLite serializes writers, so the counter value read in the same read
+    transaction is a safe upper bound.
+    """
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            # One read transaction so the queries see the same snapshot
+            cur.execute("BEGIN")
+            cur.execute("SELECT (SELECT Value FROM ChangeCounter), (SELECT Value FROM TombstoneHorizon)")
+            new_watermark, horizon = cur.fetchone()
+            reset = watermark is not None and watermark < horizon
+            if reset:
+                # Deletions after `watermark` may have been pruned: start over
+                watermark = None
+            cur.execute(
+                """
+                SELECT ExpenseID, ExpenseName, Category, Amount, ExpenseDate
+                FROM Expenses
+                WHERE UserID = ? AND RowVer > ? AND RowVer <= ?
+                """,
+                (user_id, -1 if watermark is None else watermark, new_watermark)
+            )
+            upserts = [_expense_row(r) for r in cur.fetchall()]
+            deleted = []
+            if watermark is not None:
+                cur.execute(
+                    "SELECT ExpenseID FROM ExpenseTombstones WHERE UserID = ? AND RowVer > ? AND RowVer <= ?",
+                    (user_id, watermark, new_watermark)
+                )
+                deleted = [r[0] for r in cur.fetchall()]
+            return {"upserts": upserts, "deleted": deleted, "watermark": new_watermark, "reset": reset}
+    except sqlite3.Error as ex:
+        print(f"Error during change fetching: {ex}")
+        return None
+
+
+def get_change_watermark():
+    """Returns the current change watermark without reading any rows (None on error)."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT Value FROM ChangeCounter")
+            return cur.fetchone()[0]
+    except sqlite3.Error as ex:
+        print(f"Error during watermark fetching: {ex}")
+        return None
+
+
+def prune_tombstones(retention_days=TOMBSTONE_RETENTION_DAYS):
+    """Deletes tombstones older than `retention_days` (see storage.azure_sql).
+
+    Returns the number of removed tombstones, or None on error.
+    """
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute(
+                "SELECT MAX(RowVer) FROM ExpenseTombstones WHERE DeletedAt < datetime('now', ?)",
+                (f"-{int(retention_days)} days",)
+            )
+            pruned = cur.fetchone()[0]
+            if pruned is None:
+                return 0
+            cur.execute("DELETE FROM ExpenseTombstones WHERE RowVer <= ?", (pruned,))
+            removed = cur.rowcount
+            cur.execute("UPDATE TombstoneHorizon SET Value = MAX(Value, ?)", (pruned,))
+            conn.commit()
+            return removed
+    except sqlite3.Error as ex:
+        print(f"Error during tombstone pruning: {ex}")
+        return None
+
+
+# ------------ MONTHLY ROLLUP MAINTENANCE ------------
+
+def verify_monthly_totals(user_id=None):
+    """Compares MonthlyCategoryTotals with the raw Expenses rows (see storage.azure_sql)."""
+    user_filter, params = ("WHERE UserID = ?", [user_id]) if user_id is not None else ("", [])
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                f"""
+                SELECT UserID, substr(ExpenseDate, 1, 7), Category, SUM(Amount), COUNT(*)
+                FROM Expenses {user_filter}
+                GROUP BY UserID, substr(ExpenseDate, 1, 7), Category
+                """,
+                params
+            )
+            actual = {(r[0], r[1], r[2]): (r[3], r[4]) for r in cur.fetchall()}
+            cur.execute(f"SELECT UserID, YearMonth, Category, Total, Count FROM MonthlyCategoryTotals {user_filter}",
+                        params)
+            rollup = {(r[0], r[1], r[2]): (r[3], r[4]) for r in cur.fetchall()}
+    except sqlite3.Error as ex:
+        print(f"Error during rollup verification: {ex}")
+        return []
+
+    drift = []
+    for key in sorted(actual.keys() | rollup.keys()):
+        r_total, r_count = rollup.get(key, (None, None))
+        a_total, a_count = actual.get(key, (None, None))
+        # REAL sums may differ from the rounded rollup by float noise only
+        if (r_total is None or a_total is None or r_count != a_count
+                or abs(r_total - a_total) >= 0.005):
+            drift.append({
+                "user_id": key[0], "year_month": key[1], "category": key[2],
+                "rollup_total": r_total, "rollup_count": r_count,
+                "actual_total": a_total, "actual_count": a_count,
+            })
+    return drift
+
+
+def rebuild_monthly_totals(user_id=None):
+    """Recomputes MonthlyCategoryTotals from Expenses (for one user or everyone)."""
+    user_filter, params = ("WHERE UserID = ?", [user_id]) if user_id is not None else ("", [])
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(f"DELETE FROM MonthlyCategoryTotals {user_filter}", params)
+            cur.execute(
+                f"INSERT INTO MonthlyCategoryTotals {_ROLLUP_FROM_EXPENSES_TEMPLATE.format(where=user_filter)}",
+                params
+            )
+            conn.commit()
+            return True
+    except sqlite3.Error as ex:
+        print(f"Error during rollup rebuild: {ex}")
+        return False
+
+
+# ------------ USER SETTINGS ------------
+
+def load_user_settings(user_id):
+    """Loads all user settings."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT Currency, Theme, Budget FROM UserSettings WHERE UserID = ?", (user_id,))
+            return settings_from_row(cur.fetchone())
+    except sqlite3.Error as ex:
+        print(f"Error during settings load: {ex}")
+        return {}
+
+
+def save_user_setting(user_id, setting_name, setting_value):
+    """Saves a single user setting (currency/theme/budget)."""
+    try:
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            if setting_name.lower() == 'budget':
+                setting_value = _money(setting_value)
+            sql = f"UPDATE UserSettings SET {SETTING_COLUMNS[setting_name.lower()]} = ? WHERE UserID = ?"
+            cur.execute(sql, (setting_value, user_id))
+            conn.commit()
+            return True
+    except sqlite3.Error as ex:
+        print(f"Error during settings saving: {ex}")
+        return False
@@ -0,0 +1,103 @@
+import itertools
+import os
+import sys
+import tempfile
+
+# database.py picks its backend on import; the tests never need Azure SQL
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", os.path.join(tempfile.mkdtemp(prefix="finance_tests_"), "test.db"))
+os.environ.setdefault("DB_METRICS", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+_user_numbers = itertools.count()
+
+
+@pytest.fixture
+def user_id():
+    """A fresh user in the shared test database, so tests never see each other's rows."""
+    import database
+
+    assert database.init_database()
+    username = f"test_user_{os.getpid()}_{next(_user_numbers)}"
+    assert database.create_user(username, "secret")
+    return database.get_user(username)["id"]
+
+
+class FakeRoot:
+    """Stands in for the Tk root: `after` callbacks run only when the test calls `run_after`."""
+
+    def __init__(self):
+        self.timers = {}  # id -> (delay_ms, callback)
+        self._ids = itertools.count(1)
+
+    def after(self, delay_ms, callback):
+        after_id = next(self._ids)
+        self.timers[after_id] = (delay_ms, callback)
+        return after_id
+
+    def after_cancel(self, after_id):
+        self.timers.pop(after_id, None)
+
+    def run_after(self):
+        """Runs the callbacks scheduled so far; returns their delays."""
+        timers, self.timers = self.timers, {}
+        for _, callback in timers.values():
+            callback()
+        return [delay for delay, _ in timers.values()]
+
+
+class SyncScheduler:
+    """TaskScheduler replacement running every task and callback inline."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, key, fn, *args, on_done=None, on_error=None, supersede=True):
+        self.submitted.append(key)
+        try:
+            result = fn(*args)
+        except Exception as e:
+            if on_error is None:
+                raise
+            on_error(e)
+        else:
+            if on_done is not None:
+                on_done(result)
+
+    def call_in_main(self, fn, *args):
+        fn(*args)
+
+
+class NullRefreshCoordinator:
+    def request(self, callback):
+        pass
+
+
+@pytest.fixture
+def fake_root():
+    return FakeRoot()
+
+
+@pytest.fixture
+def sync_scheduler():
+    return SyncScheduler()
+
+
+@pytest.fixture
+def make_store(user_id, sync_scheduler):
+    """Creates ExpenseStores of `user_id` loaded from the database (one per login)."""
+    from utils.expense_store import ExpenseStore
+
+    def make(**kwargs):
+        store = ExpenseStore(user_id, sync_scheduler, NullRefreshCoordinator(), **kwargs)
+        store.reload()
+        assert store.loaded
+        return store
+    return make
+
+
+@pytest.fixture
+def store(make_store):
+    return make_store()
@@ -0,0 +1,86 @@
+import threading
+import pytest
+from utils.connection_pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class RejectedRow(Exception):
+    pass
+
+
+def make_pool(**kwargs):
+    opened = []
+
+    def connect():
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    return ConnectionPool(connect, min_size=0, **kwargs), opened
+
+
+def test_connections_are_reused_and_rolled_back():
+    pool, opened = make_pool(max_size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    assert len(opened) == 1
+    assert opened[0].rollbacks == 2
+    assert pool.stats() == {"size": 1, "idle": 1, "in_use": 0, "max_size": 2}
+
+
+def test_failed_connection_is_discarded_unless_kept():
+    pool, opened = make_pool(keep_on=(RejectedRow,))
+    with pytest.raises(RuntimeError):
+        with pool.connection():
+            raise RuntimeError("connection lost")
+    assert opened[0].closed
+    assert pool.stats()["size"] == 0
+
+    with pytest.raises(RejectedRow):
+        with pool.connection():
+            raise RejectedRow()
+    assert not opened[1].closed
+    assert opened[1].rollbacks == 1
+    assert pool.stats()["idle"] == 1
+
+
+def test_checkout_waits_for_a_free_connection():
+    pool, opened = make_pool(max_size=1, checkout_timeout=0.05)
+    conn = pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+    released = threading.Timer(0.02, pool.release, (conn,))
+    pool.checkout_timeout = 5
+    released.start()
+    assert pool.acquire() is conn
+    released.join()
+    assert len(opened) == 1
+
+
+def test_close_closes_idle_and_returned_connections():
+    pool, opened = make_pool(max_size=2)
+    busy = pool.acquire()
+    with pool.connection():
+        pass
+    pool.close()
+
+    assert [c.closed for c in opened] == [False, True]
+    pool.release(busy)
+    assert busy.closed
+    with pytest.raises(RuntimeError):
+        pool.acquire()
@@ -0,0 +1,68 @@
+import pytest
+from utils.csv_import import parse_row
+
+
+def record(amount):
+    return {"title": "Coffee", "category": "Food", "amount": amount, "date": "2024-05-01"}
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("12.50", 12.5),
+    ("12,5", 12.5),
+    ("1,234.56", 1234.56),
+    ("1.234,56", 1234.56),
+    ("1,234,567", 1234567.0),
+    ("1.234.567", 1234567.0),
+    ("$1,234.00", 1234.0),
+    ("1 234,50 zł", 1234.5),
+    ("-3.10", -3.1),
+    ("1.23", 1.23),
+])
+def test_amount_separators(raw, expected):
+    assert parse_row(record(raw))[2] == expected
+
+
+@pytest.mark.parametrize("raw, reason", [
+    ("1,234", "ambiguous"),
+    ("12,345", "ambiguous"),
+    ("1.234", "ambiguous"),
+    ("1.230", "ambiguous"),
+    ("-12.500", "ambiguous"),
+    ("0.125", "more than 2 decimal places"),
+    ("0,125", "more than 2 decimal places"),
+    ("1.23456", "more than 2 decimal places"),
+    ("1,2345", "more than 2 decimal places"),
+    ("12,34,56", "ambiguous"),
+    ("1,23.45", "ambiguous"),
+    ("1.2.3", "ambiguous"),
+    ("abc", "invalid amount"),
+    ("", "invalid amount"),
+])
+def test_rejected_amounts(raw, reason):
+    with pytest.raises(ValueError, match=reason):
+        parse_row(record(raw))
+
+
+def test_ambiguous_rows_go_to_rejects_file(tmp_path):
+    import csv
+    import database
+    from utils.csv_import import CsvImport
+
+    database.init_database()
+    database.create_user("csv_import_test", "secret")
+    user_id = database.get_user("csv_import_test")["id"]
+    path = tmp_path / "expenses.csv"
+    path.write_text("title,category,amount,date\n"
+                    "Rent,Home,\"1,234.00\",2024-05-01\n"
+                    "Desk,Home,\"1,234\",2024-05-02\n"
+                    "Pens,Office,0.125,2024-05-03\n", encoding="utf-8")
+
+    result = CsvImport(user_id, str(path), checkpoint_dir=str(tmp_path)).run()
+
+    assert result["inserted"] == 1
+    assert result["rejected"] == 2
+    with open(result["rejects_path"], newline="", encoding="utf-8") as f:
+        rejects = list(csv.DictReader(f))
+    assert [r["title"] for r in rejects] == ["Desk", "Pens"]
+    assert "ambiguous" in rejects[0]["error"]
+    assert "more than 2 decimal places" in rejects[1]["error"]
@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import database
+
+
+def age_tombstones(expense_ids, days):
+    conn = sqlite3.connect(os.environ["SQLITE_PATH"])
+    with conn:
+        conn.executemany(
+            "UPDATE ExpenseTombstones SET DeletedAt = datetime('now', ?) WHERE ExpenseID = ?",
+            [(f"-{days} days", expense_id) for expense_id in expense_ids]
+        )
+    conn.close()
+
+
+def add(user_id, *titles):
+    return [database.insert_expense(user_id, title, "Misc", 10, "2024-06-01") for title in titles]
+
+
+def test_changes_since_a_watermark(user_id):
+    first, second, third = add(user_id, "A", "B", "C")
+    initial = database.fetch_changes_since(user_id)
+    assert sorted(row[0] for row in initial["upserts"]) == [first, second, third]
+    assert initial["deleted"] == [] and not initial["reset"]
+
+    database.delete_expense(second, user_id)
+    (fourth,) = add(user_id, "D")
+    changes = database.fetch_changes_since(user_id, initial["watermark"])
+
+    assert [row[0] for row in changes["upserts"]] == [fourth]
+    assert changes["deleted"] == [second]
+    assert not changes["reset"]
+    assert database.fetch_changes_since(user_id, changes["watermark"])["upserts"] == []
+
+
+def test_pruned_tombstones_force_a_full_resync(user_id):
+    old, recent, kept = add(user_id, "Old", "Recent", "Kept")
+    before_deletes = database.fetch_changes_since(user_id)["watermark"]
+    database.delete_expense(old, user_id)
+    after_old_delete = database.get_change_watermark()
+    database.delete_expense(recent, user_id)
+    age_tombstones([old], 40)
+
+    assert database.prune_tombstones(30) >= 1
+
+    # Older clients may have missed the pruned deletion: everything is sent again
+    changes = database.fetch_changes_since(user_id, before_deletes)
+    assert changes["reset"]
+    assert [row[0] for row in changes["upserts"]] == [kept]
+    assert changes["deleted"] == []
+    # Newer clients still get a normal delta
+    changes = database.fetch_changes_since(user_id, after_old_delete)
+    assert not changes["reset"]
+    assert changes["deleted"] == [recent]
+
+
+def test_store_sync_applies_deltas_and_resets(user_id, store):
+    first, second = add(user_id, "A", "B")
+    store.sync()
+    assert sorted(store.frame().rows()) == sorted(database.fetch_expenses(user_id))
+
+    database.delete_expense(first, user_id)
+    add(user_id, "C")
+    store.sync()
+    assert sorted(store.frame().rows()) == sorted(database.fetch_expenses(user_id))
+
+    stale = store.watermark
+    database.delete_expense(second, user_id)
+    age_tombstones([second], 40)
+    database.prune_tombstones(30)
+    assert database.fetch_changes_since(user_id, stale)["reset"]
+
+    store.sync()
+    assert sorted(store.frame().rows()) == sorted(database.fetch_expenses(user_id))
+    assert store.total() == database.get_total_amount(user_id)
+    assert not database.fetch_changes_since(user_id, store.watermark)["reset"]
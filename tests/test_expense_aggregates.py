@@ -0,0 +1,83 @@
+import random
+import pytest
+from utils.expense_aggregates import ExpenseAggregates
+from utils.expense_frame import ExpenseFrame
+
+
+def random_rows(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        (expense_id, f"Item {expense_id}", rng.choice(["Food", "Home", "Travel", "Fun"]),
+         round(rng.uniform(1, 500), 2), f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+        for expense_id in range(1, count + 1)
+    ]
+
+
+def assert_same(incremental, full):
+    assert incremental.count == full.count
+    assert incremental.total == pytest.approx(full.total)
+    for table in ("month_totals", "category_totals", "month_category_totals"):
+        got, expected = getattr(incremental, table), getattr(full, table)
+        assert got.keys() == expected.keys(), table
+        for key, (total, count) in expected.items():
+            assert got[key][0] == pytest.approx(total), (table, key)
+            assert got[key][1] == count, (table, key)
+    assert incremental.top(10) == full.top(10)
+    assert incremental.newest(10) == full.newest(10)
+
+
+def test_deltas_match_a_full_recompute():
+    rows = random_rows(500)
+    aggregates = ExpenseAggregates()
+    for row in rows:
+        aggregates.apply_insert(row)
+    assert_same(aggregates, ExpenseAggregates.from_frame(ExpenseFrame.from_rows(rows)))
+
+    rng = random.Random(1)
+    removed = set(rng.sample([row[0] for row in rows], 350))
+    for row in rows:
+        if row[0] in removed:
+            aggregates.apply_delete(row)
+    remaining = [row for row in rows if row[0] not in removed]
+    assert_same(aggregates, ExpenseAggregates.from_frame(ExpenseFrame.from_rows(remaining)))
+
+
+def test_seeded_aggregates_take_deltas():
+    rows = random_rows(200, seed=2)
+    aggregates = ExpenseAggregates.from_frame(ExpenseFrame.from_rows(rows[:100]))
+    for row in rows[100:]:
+        aggregates.apply_insert(row)
+    for row in rows[:50]:
+        aggregates.apply_delete(row)
+
+    assert_same(aggregates, ExpenseAggregates.from_frame(ExpenseFrame.from_rows(rows[50:])))
+
+
+def test_deleting_everything_empties_the_aggregates():
+    rows = random_rows(20, seed=3)
+    aggregates = ExpenseAggregates.from_frame(ExpenseFrame.from_rows(rows))
+    for row in rows:
+        aggregates.apply_delete(row)
+
+    assert (aggregates.total, aggregates.count) == (0.0, 0)
+    assert aggregates.month_totals == {} and aggregates.category_totals == {}
+    assert aggregates.top(5) == [] and aggregates.newest(5) == []
+
+
+def test_summary_matches_the_database(user_id):
+    import database
+
+    rows = [(title, category, amount, day) for _, title, category, amount, day in random_rows(120, seed=4)]
+    inserted = database.bulk_insert_expenses(user_id, rows)
+    database.delete_expenses(user_id, [row[0] for row in inserted[:30]])
+    kept = inserted[30:]
+
+    aggregates = ExpenseAggregates.from_frame(ExpenseFrame.from_rows(kept))
+    expected = database.fetch_analytics_summary(user_id, 2024, 6, top_n=5, recent_limit=20)
+    got = aggregates.analytics_summary(2024, 6, top_n=5, recent_limit=20)
+
+    assert dict(got["category_totals"]) == pytest.approx(dict(expected["category_totals"]))
+    assert dict(got["monthly_totals"]) == pytest.approx(dict(expected["monthly_totals"]))
+    assert got["month_total"] == pytest.approx(expected["month_total"])
+    assert got["top"] == expected["top"]
+    assert got["recent"] == expected["recent"]
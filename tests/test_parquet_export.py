@@ -0,0 +1,61 @@
+import os
+import sqlite3
+import pytest
+import database
+
+pytest.importorskip("pyarrow")
+
+from utils.parquet_export import ParquetDataset  # noqa: E402
+
+
+def dataset_rows(dataset):
+    frame, watermark = dataset.read_frame()
+    return sorted(frame.rows()), watermark
+
+
+def db_rows(user_id):
+    return sorted(database.fetch_expenses(user_id))
+
+
+def test_incremental_export_rewrites_only_touched_months(user_id, tmp_path):
+    inserted = database.bulk_insert_expenses(user_id, [
+        ("Rent", "Home", 900, "2024-01-01"),
+        ("Food", "Food", 55.5, "2024-01-12"),
+        ("Rent", "Home", 900, "2024-02-01"),
+        ("Trip", "Travel", 320.25, "2024-03-08"),
+    ])
+    dataset = ParquetDataset(user_id, str(tmp_path))
+
+    assert dataset.export() == ["2024-01", "2024-02", "2024-03"]
+    assert dataset_rows(dataset)[0] == db_rows(user_id)
+    assert dataset.export() == []
+
+    database.delete_expense(inserted[1][0], user_id)
+    database.insert_expense(user_id, "Book", "Fun", 12, "2024-04-02")
+    assert dataset.export() == ["2024-01", "2024-04"]
+    rows, watermark = dataset_rows(dataset)
+    assert rows == db_rows(user_id)
+    assert watermark == database.get_change_watermark()
+
+    database.delete_expenses(user_id, [inserted[3][0]])
+    assert dataset.export() == ["2024-03"]
+    assert not os.path.exists(dataset._partition_path("2024-03"))
+    assert dataset_rows(dataset)[0] == db_rows(user_id)
+
+
+def test_export_older_than_the_prune_horizon_is_rebuilt(user_id, tmp_path):
+    ids = [database.insert_expense(user_id, f"Item {n}", "Misc", n, f"2024-0{n}-01") for n in (1, 2, 3)]
+    dataset = ParquetDataset(user_id, str(tmp_path))
+    dataset.export()
+
+    database.delete_expense(ids[0], user_id)
+    conn = sqlite3.connect(os.environ["SQLITE_PATH"])
+    with conn:
+        conn.execute("UPDATE ExpenseTombstones SET DeletedAt = datetime('now', '-40 days') "
+                     "WHERE ExpenseID = ?", (ids[0],))
+    conn.close()
+    database.prune_tombstones(30)
+
+    assert dataset.export() == ["2024-02", "2024-03"]
+    assert not os.path.exists(dataset._partition_path("2024-01"))
+    assert dataset_rows(dataset)[0] == db_rows(user_id)
@@ -0,0 +1,66 @@
+import os
+import sqlite3
+import pytest
+import database
+
+
+def month_total(user_id, year, month):
+    return database.get_total_amount_for_month(user_id, year, month)
+
+
+def test_insert_and_delete_keep_rollup_in_sync(user_id):
+    ids = [database.insert_expense(user_id, "Lunch", "Food", amount, "2024-03-10")
+           for amount in (12.5, 7.25, 30.0)]
+    assert database.verify_monthly_totals(user_id) == []
+    assert month_total(user_id, 2024, 3) == pytest.approx(49.75)
+
+    assert database.delete_expense(ids[0], user_id)
+    assert database.delete_expenses(user_id, ids[1:2])
+    assert database.verify_monthly_totals(user_id) == []
+    assert month_total(user_id, 2024, 3) == pytest.approx(30.0)
+
+
+def test_rollup_adds_the_rounded_amounts(user_id):
+    for amount in (1.005, 2.675, 0.125, 3.333):
+        database.insert_expense(user_id, "Odd", "Misc", amount, "2024-04-01")
+    database.bulk_insert_expenses(user_id, [("Odd", "Misc", 0.005, "2024-04-02")] * 3)
+
+    assert database.verify_monthly_totals(user_id) == []
+
+
+def test_bulk_insert_and_delete_all(user_id):
+    rows = [(f"Item {i}", f"Cat {i % 3}", i + 0.5, f"2024-{i % 12 + 1:02d}-15") for i in range(50)]
+    inserted = database.bulk_insert_expenses(user_id, rows)
+
+    assert [row[1] for row in inserted] == [row[0] for row in rows]
+    assert database.verify_monthly_totals(user_id) == []
+
+    assert database.delete_expenses(user_id, [row[0] for row in inserted[::2]])
+    assert database.verify_monthly_totals(user_id) == []
+
+    assert database.delete_all_expenses(user_id)
+    assert database.verify_monthly_totals(user_id) == []
+    assert database.get_total_amount(user_id) == 0
+
+
+def test_rejected_bulk_insert_leaves_rollup_untouched(user_id):
+    database.insert_expense(user_id, "Rent", "Home", 900, "2024-05-01")
+    with pytest.raises(database.InvalidExpenseError):
+        database.bulk_insert_expenses(user_id, [("Desk", "Home", 120, "2024-05-02"),
+                                                ("Chair", "Home", 80, None)])
+
+    assert database.count_expenses(user_id) == 1
+    assert database.verify_monthly_totals(user_id) == []
+    assert month_total(user_id, 2024, 5) == pytest.approx(900)
+
+
+def test_rebuild_repairs_a_drifted_rollup(user_id):
+    database.insert_expense(user_id, "Rent", "Home", 900, "2024-05-01")
+    conn = sqlite3.connect(os.environ["SQLITE_PATH"])
+    with conn:
+        conn.execute("UPDATE MonthlyCategoryTotals SET Total = Total + 1 WHERE UserID = ?", (user_id,))
+    conn.close()
+    assert len(database.verify_monthly_totals(user_id)) == 1
+
+    assert database.rebuild_monthly_totals(user_id)
+    assert database.verify_monthly_totals(user_id) == []
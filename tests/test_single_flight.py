@@ -0,0 +1,57 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from utils.single_flight import single_flight
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    @single_flight
+    def fetch(user_id):
+        calls.append(user_id)
+        if user_id == 1:
+            started.set()
+            release.wait(5)
+        return [user_id]
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        leader = executor.submit(fetch, 1)
+        started.wait(5)
+        followers = [executor.submit(fetch, 1) for _ in range(3)]
+        assert executor.submit(fetch, 2).result(5) == [2]
+        time.sleep(0.1)  # let the followers reach the in-flight call
+        release.set()
+        results = [leader.result(5)] + [f.result(5) for f in followers]
+
+    assert sorted(calls) == [1, 2]
+    assert all(result is results[0] for result in results)
+
+
+def test_errors_are_shared_and_not_cached():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    @single_flight
+    def fetch():
+        calls.append(1)
+        if len(calls) == 1:
+            started.set()
+            release.wait(5)
+            raise RuntimeError("DB unreachable")
+        return "ok"
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(fetch)
+        started.wait(5)
+        follower = executor.submit(fetch)
+        time.sleep(0.1)  # let the follower reach the in-flight call
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError):
+                future.result(5)
+
+    assert fetch() == "ok"
+    assert len(calls) == 2
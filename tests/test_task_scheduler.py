@@ -0,0 +1,82 @@
+import threading
+import time
+import pytest
+from utils.task_scheduler import TaskScheduler
+
+
+@pytest.fixture
+def scheduler(fake_root):
+    scheduler = TaskScheduler(fake_root, max_workers=2)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def wait_idle(scheduler, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not scheduler.is_idle():
+        assert time.monotonic() < deadline, "scheduler did not finish"
+        time.sleep(0.005)
+
+
+def test_newest_submission_supersedes_queued_and_running_ones(scheduler, fake_root):
+    release = threading.Event()
+    runs, results = [], []
+
+    def load(n):
+        runs.append(n)
+        if n == 1:
+            release.wait(5)
+        return n
+
+    for n in (1, 2, 3):
+        scheduler.submit("expenses:page", load, n, on_done=results.append)
+    release.set()
+    wait_idle(scheduler)
+    fake_root.run_after()
+
+    assert runs == [1, 3]
+    assert results == [3]
+
+
+def test_cancel_owner_drops_only_that_pages_results(scheduler, fake_root):
+    release = threading.Event()
+    results = []
+
+    def slow(value):
+        release.wait(5)
+        return value
+
+    scheduler.submit("expenses:page", slow, "expenses", on_done=results.append)
+    scheduler.submit("summary:load", slow, "summary", on_done=results.append)
+    scheduler.cancel_owner("expenses")
+    release.set()
+    wait_idle(scheduler)
+    fake_root.run_after()
+
+    assert results == ["summary"]
+
+
+def test_cancel_all_drops_results_delivered_after_logout(scheduler, fake_root):
+    results = []
+    scheduler.submit("expenses:page", lambda: "rows", on_done=results.append)
+    wait_idle(scheduler)
+    scheduler.cancel_all()
+    fake_root.run_after()
+
+    assert results == []
+
+
+def test_errors_reach_on_error_and_unkeyed_tasks_all_run(scheduler, fake_root):
+    errors, results = [], []
+
+    def fail():
+        raise ValueError("boom")
+
+    scheduler.submit("writes:flush", fail, on_error=errors.append, supersede=False)
+    for n in range(3):
+        scheduler.submit("writes:flush", lambda n=n: n, on_done=results.append, supersede=False)
+    wait_idle(scheduler)
+    fake_root.run_after()
+
+    assert [str(e) for e in errors] == ["boom"]
+    assert sorted(results) == [0, 1, 2]
@@ -0,0 +1,121 @@
+import json
+import os
+import pytest
+import database
+import utils.write_queue as write_queue
+from utils.write_queue import GROUP_COMMIT_MS, WARN_AFTER_ATTEMPTS, WriteQueue
+
+
+@pytest.fixture
+def make_queue(fake_root, sync_scheduler, store, user_id, tmp_path):
+    def make(**kwargs):
+        return WriteQueue(fake_root, user_id, sync_scheduler, store, directory=str(tmp_path), **kwargs)
+    return make
+
+
+def journal(user_id, tmp_path):
+    path = os.path.join(str(tmp_path), database.STORAGE_ID, f"user_{user_id}.jsonl")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["title"] for line in f]
+
+
+def saved_titles(user_id):
+    return sorted(row[1] for row in database.fetch_expenses(user_id))
+
+
+def test_group_commit_replaces_pending_rows(make_queue, fake_root, store, user_id, tmp_path):
+    queue = make_queue()
+    for title in ("Coffee", "Bread", "Milk"):
+        queue.enqueue(title, "Food", 2.5, "2024-05-01")
+
+    assert [row[1] for row in store.pending_rows()] == ["Milk", "Bread", "Coffee"]
+    assert journal(user_id, tmp_path) == ["Coffee", "Bread", "Milk"]
+    assert fake_root.run_after() == [GROUP_COMMIT_MS]
+
+    assert store.pending_rows() == []
+    assert saved_titles(user_id) == ["Bread", "Coffee", "Milk"]
+    assert sorted(store.frame().rows()) == sorted(database.fetch_expenses(user_id))
+    assert journal(user_id, tmp_path) is None
+    assert queue.pending_count() == 0
+
+
+def test_failed_flush_keeps_rows_and_backs_off(make_queue, fake_root, store, user_id, tmp_path,
+                                               monkeypatch):
+    warnings = []
+    queue = make_queue(on_failure=warnings.append)
+    monkeypatch.setattr(write_queue, "bulk_insert_expenses", lambda *args: [])
+    queue.enqueue("Taxi", "Travel", 18, "2024-05-02")
+    queue.enqueue("Train", "Travel", 42, "2024-05-02")
+
+    delays = [fake_root.run_after()[0] for _ in range(WARN_AFTER_ATTEMPTS + 1)]
+
+    assert delays[1:] == [GROUP_COMMIT_MS * 2 ** n for n in range(1, WARN_AFTER_ATTEMPTS + 1)]
+    assert warnings == [2]
+    assert len(store.pending_rows()) == 2
+    assert journal(user_id, tmp_path) == ["Taxi", "Train"]
+
+    monkeypatch.setattr(write_queue, "bulk_insert_expenses", database.bulk_insert_expenses)
+    fake_root.run_after()
+
+    assert saved_titles(user_id) == ["Taxi", "Train"]
+    assert store.pending_rows() == []
+    assert journal(user_id, tmp_path) is None
+
+
+def test_invalid_row_is_dropped_without_blocking_the_batch(make_queue, fake_root, store, user_id,
+                                                          tmp_path, monkeypatch):
+    rejected = []
+    queue = make_queue(on_rejected=rejected.extend)
+
+    def bulk_insert(user_id, rows):
+        if any(title == "Broken" for title, *_ in rows):
+            raise database.InvalidExpenseError("CHECK constraint failed")
+        return database.bulk_insert_expenses(user_id, rows)
+
+    monkeypatch.setattr(write_queue, "bulk_insert_expenses", bulk_insert)
+    for title in ("Soap", "Broken", "Towel", "Brush"):
+        queue.enqueue(title, "Home", 3, "2024-05-03")
+    queue.enqueue("Infinite", "Home", float("inf"), "2024-05-03")
+    fake_root.run_after()
+
+    assert sorted(title for title, _ in rejected) == ["Broken", "Infinite"]
+    assert saved_titles(user_id) == ["Brush", "Soap", "Towel"]
+    assert store.pending_rows() == []
+    assert journal(user_id, tmp_path) is None
+    assert fake_root.timers == {}
+
+
+def test_journal_is_replayed_on_the_next_login(make_queue, make_store, fake_root, sync_scheduler,
+                                               user_id, tmp_path):
+    # A session that crashed before its flush, then one that logged out before it
+    make_queue().enqueue("Gift", "Fun", 25, "2024-05-04")
+    queue = make_queue()
+    queue.enqueue("Cake", "Food", 12, "2024-05-04")
+    queue.stop()
+    assert journal(user_id, tmp_path) == ["Gift", "Cake"]
+    assert saved_titles(user_id) == []
+
+    store = make_store()
+    fake_root.timers.clear()
+    replayed = WriteQueue(fake_root, user_id, sync_scheduler, store, directory=str(tmp_path))
+    assert sorted(row[1] for row in store.pending_rows()) == ["Cake", "Gift"]
+
+    fake_root.run_after()
+    assert saved_titles(user_id) == ["Cake", "Gift"]
+    assert store.pending_rows() == []
+    assert replayed.pending_count() == 0
+    assert journal(user_id, tmp_path) is None
+
+
+def test_discarded_rows_are_never_saved(make_queue, fake_root, store, user_id, tmp_path):
+    queue = make_queue()
+    keep = queue.enqueue("Book", "Fun", 15, "2024-05-05")
+    drop = queue.enqueue("Typo", "Fun", 1500, "2024-05-05")
+    queue.discard([drop])
+
+    assert [row[0] for row in store.pending_rows()] == [keep]
+    assert journal(user_id, tmp_path) == ["Book"]
+    fake_root.run_after()
+    assert saved_titles(user_id) == ["Book"]
@@ -1,29 +1,115 @@
-import threading
-from database import load_user_settings
+from database import fetch_dashboard_bootstrap, load_user_settings
 from tkinter import messagebox
 
 class AppInitializer:
+    """Post-login bootstrap pipeline.
+
+    `begin()` is scheduled on the Tk thread by the login worker as soon as the
+    user id is verified and loads settings, the total and the recent expenses
+    in one batch while the UI switches screens. `start_loading()` (Tk thread) builds
+    the main app as soon as both the screen switch and the data are ready.
+
+    If an on-disk snapshot from the previous session exists, the main app is
+    built from it immediately and patched once the fresh data arrives
+    (stale-while-revalidate).
+    """
+
     def __init__(self, controller):
         self.controller = controller
         self.user_id = None  # <--- Ustawienie user_id na None na początku
-        
+        self.dashboard_data = None
+        self.snapshot = None
+        self._started_for = None
+        self._result = None
+        self._waiting = False
+        self._revalidating = False
+
+    def begin(self, user_id):
+        """Starts the bootstrap queries (Tk thread; workers go through call_in_main)."""
+        self.user_id = user_id
+        self._started_for = user_id
+        self._result = None
+        self._waiting = False
+        self._revalidating = False
+        self.dashboard_data = None
+        self.snapshot = self.controller.snapshot_cache.load(user_id)
+        self.controller.scheduler.submit(
+            "init:bootstrap", self._perform_bootstrap, user_id,
+            on_done=self._on_bootstrap_loaded
+        )
+
     def start_loading(self):
-        """Uruchamia ładowanie ustawień w wątku tła."""
+        """Uruchamia ładowanie ustawień w wątku tła (lub czeka na już rozpoczęte)."""
         if self.user_id is None:
              raise ValueError("User ID must be set before starting initializer.")
-        
-        thread = threading.Thread(target=self._perform_settings_load)
-        thread.start()
 
-    def _perform_settings_load(self):
-        """(WĄTEK TŁA) Ładuje ustawienia z bazy danych."""
-        settings_data = {}
+        if self._started_for != self.user_id:
+            self.begin(self.user_id)
+        self._waiting = True
+        if self._result is not None:
+            self._finish()
+        elif self.snapshot and "settings" in self.snapshot:
+            # Show the previous session's data now; _on_bootstrap_loaded patches it
+            self._waiting = False
+            self._revalidating = True
+            self.dashboard_data = self.snapshot.get("dashboard")
+            self.controller.complete_main_app_load(self.snapshot["settings"])
+
+    def take_dashboard_data(self):
+        """Returns the prefetched dashboard data once; later refreshes query normally."""
+        data, self.dashboard_data = self.dashboard_data, None
+        return data
+
+    def snapshot_analytics(self, year, month):
+        """Returns the cached analytics summary of one month, if the snapshot has it."""
+        analytics = (self.snapshot or {}).get("analytics")
+        if analytics and analytics.get("month") == f"{year:04d}-{month:02d}":
+            return analytics["summary"]
+        return None
+
+    def _perform_bootstrap(self, user_id):
+        """(WĄTEK TŁA) Ładuje ustawienia i dane dashboardu z bazy danych."""
         try:
-            # Zakładamy, że load_user_settings jest zaimportowane z database.py
-            settings_data = load_user_settings(self.user_id)  # Wolna operacja DB
+            data = fetch_dashboard_bootstrap(user_id)
+            if data is None:
+                # Fall back to settings only; the dashboard will query on its own
+                return {"settings": load_user_settings(user_id), "total": None, "recent": None}
+            self.controller.snapshot_cache.save(
+                user_id, settings=data["settings"],
+                dashboard={"total": data["total"], "recent": data["recent"]}
+            )
+            return data
         except Exception as e:
             print(f"Błąd ładowania ustawień: {e}")
-            self.controller.after(1, lambda: messagebox.showerror("Startup Error", "Failed to load user settings."))
+            self.controller.scheduler.call_in_main(
+                lambda: messagebox.showerror("Startup Error", "Failed to load user settings.")
+            )
+            return {"settings": {}, "total": None, "recent": None}
+
+    def _on_bootstrap_loaded(self, data):
+        if self._revalidating:
+            self._revalidate(data)
+            return
+        self._result = data
+        if self._waiting:
+            self._finish()
+
+    def _finish(self):
+        data, self._result = self._result, None
+        self._waiting = False
+        self._started_for = None
+        if data["total"] is not None:
+            self.dashboard_data = {"total": data["total"], "recent": data["recent"]}
+        self.controller.complete_main_app_load(data["settings"])
 
-        # Powrót do wątku głównego
-        self.controller.after(1, lambda: self.controller.complete_main_app_load(settings_data))
\ No newline at end of file
+    def _revalidate(self, data):
+        """Patches the UI built from the snapshot with the fresh bootstrap data."""
+        self._revalidating = False
+        self._started_for = None
+        main_app = getattr(self.controller, "main_app", None)
+        if data["total"] is not None:
+            self.dashboard_data = {"total": data["total"], "recent": data["recent"]}
+        changed = bool(data["settings"]) and self.controller.apply_settings(data["settings"])
+        if not changed and main_app and "summary" in main_app.pages:
+            # Settings changes already refresh every page
+            main_app.pages["summary"].refresh()
@@ -0,0 +1,196 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class ConnectionPool:
+    """Thread-safe pool of reusable DB connections.
+
+    Connections are created with `connect_fn`, kept between `min_size` and
+    `max_size`, evicted after `idle_timeout` seconds of inactivity and
+    pinged on checkout when they have been idle longer than `ping_after`.
+    An optional `tracer` (see utils.db_metrics.DbMetrics) is told the
+    checkout time of every `connection()` and may wrap the connection.
+    Exceptions of the `keep_on` types (e.g. constraint violations) leave the
+    connection usable, so it is rolled back and reused instead of discarded.
+    """
+
+    def __init__(self, connect_fn, min_size=1, max_size=5, idle_timeout=300,
+                 ping_after=30, checkout_timeout=30, ping_sql="SELECT 1", keep_on=()):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool size configuration.")
+        self._connect_fn = connect_fn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self.checkout_timeout = checkout_timeout
+        self.ping_sql = ping_sql
+        self.keep_on = tuple(keep_on)
+
+        self.tracer = None
+
+        self._idle = []          # [(connection, last_used_timestamp)], most recent last
+        self._size = 0           # idle + checked out
+        self._closed = False
+        self._cond = threading.Condition()
+
+    # ------------ PUBLIC API ------------
+
+    @contextmanager
+    def connection(self):
+        """Checks out a connection for the duration of the `with` block.
+
+        Uncommitted work is rolled back on exit. A connection that raised
+        inside the block is discarded instead of being returned to the pool,
+        unless the exception is one of `keep_on`.
+        """
+        tracer = self.tracer
+        started = time.perf_counter()
+        try:
+            conn = self.acquire()
+        except BaseException:
+            if tracer is not None:
+                tracer.on_checkout(time.perf_counter() - started, failed=True)
+            raise
+        if tracer is not None:
+            tracer.on_checkout(time.perf_counter() - started)
+        try:
+            yield conn if tracer is None else tracer.wrap(conn)
+        except BaseException as e:
+            self.release(conn, discard=not isinstance(e, self.keep_on))
+            raise
+        else:
+            self.release(conn)
+
+    def acquire(self):
+        """Returns a healthy connection, creating one if the pool has room."""
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            conn, last_used = self._take_idle_or_reserve(deadline)
+            if conn is None:
+                # Slot reserved - open a fresh connection outside the lock.
+                try:
+                    return self._connect_fn()
+                except BaseException:
+                    self._forget_one()
+                    raise
+            if self._is_healthy(conn, last_used):
+                return conn
+            self._close_quietly(conn)
+            self._forget_one()
+
+    def release(self, conn, discard=False):
+        """Returns a connection to the pool (or closes it when `discard` is set)."""
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            if discard or self._closed:
+                self._size -= 1
+                self._cond.notify()
+                close_it = True
+            else:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+                close_it = False
+        if close_it:
+            self._close_quietly(conn)
+        self.evict_idle()
+
+    def evict_idle(self):
+        """Closes connections idle longer than `idle_timeout`, keeping `min_size`."""
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            while (self._idle and self._size > self.min_size
+                   and now - self._idle[0][1] > self.idle_timeout):
+                conn, _ = self._idle.pop(0)
+                self._size -= 1
+                expired.append(conn)
+        for conn in expired:
+            self._close_quietly(conn)
+
+    def prefill(self):
+        """Opens connections up to `min_size` so the first queries start warm."""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect_fn()
+            except BaseException:
+                self._forget_one()
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def close(self):
+        """Closes all idle connections; checked out ones are closed on release."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        """Returns a snapshot of the pool occupancy."""
+        with self._cond:
+            return {"size": self._size, "idle": len(self._idle),
+                    "in_use": self._size - len(self._idle), "max_size": self.max_size}
+
+    # ------------ INTERNALS ------------
+
+    def _take_idle_or_reserve(self, deadline):
+        """Pops the most recently used idle connection or reserves a new slot."""
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed.")
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(
+                        f"No DB connection available within {self.checkout_timeout}s."
+                    )
+                self._cond.wait(remaining)
+
+    def _is_healthy(self, conn, last_used):
+        """Pings connections that have been idle long enough to be suspect."""
+        if time.monotonic() - last_used < self.ping_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute(self.ping_sql)
+            cur.fetchall()
+            cur.close()
+            return True
+        except Exception:
+            return False
+
+    def _forget_one(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
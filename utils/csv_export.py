@@ -0,0 +1,43 @@
+import csv
+import gzip
+import os
+from database import count_expenses, stream_expenses
+
+EXPORT_COLUMNS = ["id", "title", "category", "amount", "date"]
+
+
+def export_expenses_csv(user_id, file_path, start_date=None, end_date=None, category=None,
+                        compress=None, progress_callback=None):
+    """Streams a user's expenses into a CSV file (background worker).
+
+    The filters are applied in SQL and rows are written batch by batch, so
+    memory use is constant. `compress` defaults to gzip when the path ends in
+    ".gz". The file is written under a temporary name and moved into place
+    only when complete; when no rows match, the target file is left untouched.
+    `progress_callback(written, total)` runs after every batch. Returns the
+    number of exported rows.
+    """
+    if compress is None:
+        compress = file_path.lower().endswith(".gz")
+    total = count_expenses(user_id, start_date, end_date, category)
+    tmp_path = f"{file_path}.part"
+    opener = gzip.open if compress else open
+    written = 0
+    try:
+        with opener(tmp_path, "wt", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_COLUMNS)
+            for batch in stream_expenses(user_id, start_date, end_date, category):
+                writer.writerows(batch)
+                written += len(batch)
+                if progress_callback:
+                    progress_callback(written, total)
+        if written:
+            os.replace(tmp_path, file_path)
+        else:
+            os.remove(tmp_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return written
@@ -0,0 +1,230 @@
+import csv
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from database import bulk_insert_expenses
+from utils.expense_validation import AMOUNT_LIMIT, validate_expense
+
+# Rows validated and committed per transaction
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+# Directory holding the resume checkpoints of unfinished imports
+IMPORT_CHECKPOINT_DIR = os.getenv(
+    "IMPORT_CHECKPOINT_DIR", os.path.join(os.path.expanduser("~"), ".finance_tracker", "imports")
+)
+
+REQUIRED_COLUMNS = ("title", "category", "amount", "date")
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%d.%m.%Y", "%d/%m/%Y", "%Y-%m-%d %H:%M:%S")
+# Currency symbols/codes tolerated before or after the amount
+_CURRENCY_RE = re.compile(r"^(?:[$€£]|zł|PLN|USD|EUR|GBP)|(?:[$€£]|zł|PLN|USD|EUR|GBP)$", re.IGNORECASE)
+# Whole numbers written with a thousands separator, e.g. "1,234,567"
+_GROUPED = {sep: re.compile(rf"^[+-]?\d{{1,3}}(?:{re.escape(sep)}\d{{3}})+$") for sep in ",."}
+# One separator followed by exactly three digits, e.g. "1,234" or "1.230": thousands or decimals?
+_LONE_GROUP = {sep: re.compile(rf"^[+-]?[1-9]\d{{0,2}}{re.escape(sep)}\d{{3}}$") for sep in ",."}
+
+
+def parse_row(record):
+    """Validates and normalizes one CSV record.
+
+    Returns (title, category, amount, 'YYYY-MM-DD') or raises ValueError
+    with a reason that is written to the rejects file.
+    """
+    title = (record.get("title") or "").strip()
+    category = " ".join((record.get("category") or "").split())
+    amount = validate_expense(title, category, _parse_amount(record.get("amount") or ""))
+
+    raw_date = (record.get("date") or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            expense_date = datetime.strptime(raw_date, fmt).date()
+            break
+        except ValueError:
+            continue
+    else:
+        raise ValueError(f"invalid date {raw_date!r}")
+
+    return title, category, float(amount), expense_date.isoformat()
+
+
+def _parse_amount(raw):
+    """Parses an amount with an optional currency and thousands/decimal separators.
+
+    The decimal separator is the last of "," and "." when both are present;
+    a single "," or "." is the decimal separator unless exactly three digits
+    follow it, which is ambiguous ("1,234", "1.230") and rejected like any
+    other unclear grouping.
+    Amounts with more than 2 decimal places are rejected, not rounded.
+    """
+    text = _CURRENCY_RE.sub("", raw.replace(" ", "").replace("\u00a0", ""))
+    if "," in text and "." in text:
+        decimal_sep = "," if text.rfind(",") > text.rfind(".") else "."
+        group_sep = "." if decimal_sep == "," else ","
+        whole, _, fraction = text.rpartition(decimal_sep)
+        if not _GROUPED[group_sep].match(whole):
+            raise ValueError(f"ambiguous amount {raw!r}")
+        text = whole.replace(group_sep, "") + "." + fraction
+    elif text.count(",") + text.count(".") == 1:
+        sep = "," if "," in text else "."
+        if _LONE_GROUP[sep].match(text):
+            raise ValueError(f"ambiguous amount {raw!r} (thousands or decimal separator?)")
+        text = text.replace(",", ".")  # decimal comma
+    elif "," in text or text.count(".") > 1:
+        sep = "," if "," in text else "."
+        if not _GROUPED[sep].match(text):
+            raise ValueError(f"ambiguous amount {raw!r}")
+        text = text.replace(sep, "")  # thousands separators only
+
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f"invalid amount {raw!r}") from None
+    if not amount.is_finite() or abs(amount) >= AMOUNT_LIMIT:
+        raise ValueError(f"invalid amount {raw!r}")
+    if amount != amount.quantize(Decimal("0.01")):
+        raise ValueError(f"amount {raw!r} has more than 2 decimal places")
+    return amount.quantize(Decimal("0.01"))
+
+
+class CsvImport:
+    """Streaming, resumable CSV import for one user and one file.
+
+    The file is read row by row; valid rows are inserted in chunks of
+    `chunk_size`, each in its own transaction, and a checkpoint with the
+    number of consumed rows is written after every commit. Invalid rows are
+    appended to `<file>.rejects.csv` with the reason. If the import is
+    interrupted, `run()` on a new instance continues after the last
+    committed chunk (a crash between a commit and its checkpoint can repeat
+    that one chunk).
+    """
+
+    def __init__(self, user_id, file_path, chunk_size=IMPORT_CHUNK_SIZE,
+                 checkpoint_dir=IMPORT_CHECKPOINT_DIR):
+        self.user_id = user_id
+        self.file_path = os.path.abspath(file_path)
+        self.chunk_size = chunk_size
+        self.rejects_path = os.path.splitext(self.file_path)[0] + ".rejects.csv"
+        stat = os.stat(self.file_path)
+        # A checkpoint only applies to the same user and the same unchanged file
+        job_key = f"{user_id}|{self.file_path}|{stat.st_size}|{stat.st_mtime_ns}"
+        self.checkpoint_path = os.path.join(
+            checkpoint_dir, hashlib.sha1(job_key.encode()).hexdigest() + ".json"
+        )
+        self.file_size = stat.st_size
+        self.rows_done = 0
+        self.inserted = 0
+        self.rejected = 0
+        self._load_checkpoint()
+
+    @property
+    def resumable(self):
+        """True when a previous run of this import stopped partway."""
+        return self.rows_done > 0
+
+    def discard_checkpoint(self):
+        """Forgets earlier progress so `run()` starts from the first row."""
+        self.rows_done = self.inserted = self.rejected = 0
+        self._remove_checkpoint()
+
+    def run(self, progress_callback=None, chunk_callback=None):
+        """Imports the remaining rows.
+
+        `progress_callback(rows_done, inserted, rejected, fraction)` runs after
+        every chunk and `chunk_callback(rows)` receives the inserted rows.
+        Returns {"inserted", "rejected", "rejects_path"}.
+        """
+        if self.rows_done == 0 and os.path.exists(self.rejects_path):
+            os.remove(self.rejects_path)  # left over from an earlier, finished import
+        with open(self.file_path, newline="", encoding="utf-8-sig") as f:
+            position = [0]
+
+            def lines():
+                for line in f:
+                    position[0] += len(line)
+                    yield line
+
+            reader = csv.DictReader(lines())
+            columns = [c.strip().lower() for c in reader.fieldnames or []]
+            missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+            if missing:
+                raise ValueError(f"CSV must contain columns:\n{', '.join(REQUIRED_COLUMNS)}")
+            reader.fieldnames = columns
+
+            skip = self.rows_done
+            chunk, rejects, consumed = [], [], 0
+            for record in reader:
+                if skip:
+                    skip -= 1
+                    continue
+                consumed += 1
+                try:
+                    chunk.append(parse_row(record))
+                except ValueError as e:
+                    rejects.append((record, str(e)))
+                if consumed >= self.chunk_size:
+                    self._commit_chunk(chunk, rejects, consumed, columns, chunk_callback)
+                    chunk, rejects, consumed = [], [], 0
+                    if progress_callback:
+                        progress_callback(self.rows_done, self.inserted, self.rejected,
+                                          min(position[0] / max(self.file_size, 1), 1.0))
+            if consumed:
+                self._commit_chunk(chunk, rejects, consumed, columns, chunk_callback)
+
+        if progress_callback:
+            progress_callback(self.rows_done, self.inserted, self.rejected, 1.0)
+        self._remove_checkpoint()
+        return {"inserted": self.inserted, "rejected": self.rejected,
+                "rejects_path": self.rejects_path if self.rejected else None}
+
+    # ------------ INTERNALS ------------
+
+    def _commit_chunk(self, rows, rejects, consumed, columns, chunk_callback):
+        if rows:
+            inserted = bulk_insert_expenses(self.user_id, rows)
+            if len(inserted) < len(rows):
+                raise RuntimeError(
+                    f"Saving rows {self.rows_done + 1}-{self.rows_done + consumed} failed; "
+                    "the import can be resumed from there."
+                )
+            self.inserted += len(inserted)
+            if chunk_callback:
+                chunk_callback(inserted)
+        if rejects:
+            self._write_rejects(rejects, columns)
+            self.rejected += len(rejects)
+        self.rows_done += consumed
+        self._save_checkpoint()
+
+    def _write_rejects(self, rejects, columns):
+        new_file = not os.path.exists(self.rejects_path)
+        with open(self.rejects_path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(columns + ["error"])
+            for record, reason in rejects:
+                writer.writerow([record.get(c, "") for c in columns] + [reason])
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.rows_done = int(data.get("rows_done", 0))
+        self.inserted = int(data.get("inserted", 0))
+        self.rejected = int(data.get("rejected", 0))
+
+    def _save_checkpoint(self):
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"file": self.file_path, "rows_done": self.rows_done,
+                       "inserted": self.inserted, "rejected": self.rejected}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _remove_checkpoint(self):
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
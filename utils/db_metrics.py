@@ -0,0 +1,346 @@
+import inspect
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+# DB_METRICS=0 turns the instrumentation off (the functions are then not wrapped at all)
+DB_METRICS_ENABLED = os.getenv("DB_METRICS", "1") != "0"
+# Calls slower than this are appended to the slow-query log
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "500"))
+# JSON lines file of slow calls; off unless a path is set
+SLOW_QUERY_LOG = os.getenv("DB_SLOW_QUERY_LOG", "")
+# Past this size the log is moved to "<path>.1" (replacing the previous one)
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv("DB_SLOW_QUERY_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+
+# Histogram bucket upper bounds: 50 µs to ~100 s, 10 buckets per decade
+_BUCKET_BOUNDS = tuple(5e-5 * 10 ** (i / 10) for i in range(64))
+PHASES = ("total", "connect", "execute", "fetch")
+
+
+class LatencyHistogram:
+    """Log-scale latency histogram; percentiles are accurate to one bucket (~26%)."""
+
+    def __init__(self):
+        self.counts = [0] * (len(_BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect_left(_BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (0 < q <= 1), in seconds."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(_BUCKET_BOUNDS[i] if i < len(_BUCKET_BOUNDS) else self.max, self.max)
+        return self.max
+
+    def summary(self):
+        """Milliseconds: count, mean, p50, p95, p99 and max."""
+        return {
+            "count": self.count,
+            "mean_ms": self.sum / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(0.50) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class _FunctionStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.bytes = 0
+        self.histograms = {phase: LatencyHistogram() for phase in PHASES}
+
+
+class _Call:
+    """Timings of one in-flight call, filled in by the traced pool, connection and cursor."""
+
+    def __init__(self, name):
+        self.name = name
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.rows = 0
+        self.bytes = 0
+        self.errors = 0
+        self.statement = None  # slowest statement of the call
+        self.statement_time = 0.0
+
+
+def _estimate_bytes(rows):
+    """Approximate payload size of fetched rows, extrapolated from the first row."""
+    if not rows:
+        return 0
+    sample = rows[0]
+    row_size = sum(len(v) if isinstance(v, (str, bytes)) else 8 for v in sample)
+    return row_size * len(rows)
+
+
+def _one_line(sql, limit=300):
+    sql = " ".join(str(sql).split())
+    return sql if len(sql) <= limit else sql[:limit] + "..."
+
+
+class DbMetrics:
+    """In-process latency histograms and slow-query log for the DB functions.
+
+    `instrument(name, fn)` wraps a backend function; while it runs, the
+    connection pool (see ConnectionPool.tracer) reports the checkout time and
+    the traced cursors report execute and fetch times, row counts and
+    estimated payload sizes. Each call is added to the histograms of its
+    function, and calls slower than `slow_query_ms` are appended to the slow
+    query log with their slowest statement (without parameters).
+    """
+
+    def __init__(self, slow_query_ms=SLOW_QUERY_MS, slow_query_log=SLOW_QUERY_LOG,
+                 slow_query_log_max_bytes=SLOW_QUERY_LOG_MAX_BYTES):
+        self.slow_query_ms = slow_query_ms
+        self.slow_query_log = slow_query_log
+        self.slow_query_log_max_bytes = slow_query_log_max_bytes
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._stats = {}
+        self._local = threading.local()
+
+    # ------------ WRAPPING ------------
+
+    def instrument(self, name, fn):
+        """Returns `fn` wrapped so every call is recorded under `name`."""
+        if inspect.isgeneratorfunction(fn):
+            @wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                call = _Call(name)
+                generator = fn(*args, **kwargs)
+                try:
+                    while True:
+                        # Only the time spent inside the generator counts, not the consumer's
+                        with self._active(call):
+                            try:
+                                item = next(generator)
+                            except StopIteration:
+                                return
+                        yield item
+                except GeneratorExit:
+                    # The consumer stopped early (close()); not a failed call
+                    raise
+                except BaseException:
+                    call.errors += 1
+                    raise
+                finally:
+                    generator.close()
+                    self._finish(call)
+
+            return generator_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            call = _Call(name)
+            try:
+                with self._active(call):
+                    return fn(*args, **kwargs)
+            except BaseException:
+                call.errors += 1
+                raise
+            finally:
+                self._finish(call)
+
+        return wrapper
+
+    @contextmanager
+    def _active(self, call):
+        previous = getattr(self._local, "call", None)
+        self._local.call = call
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            call.phases["total"] += time.perf_counter() - started
+            self._local.call = previous
+
+    def _current(self):
+        return getattr(self._local, "call", None)
+
+    # ------------ TRACER (called by ConnectionPool and the traced cursors) ------------
+
+    def on_checkout(self, seconds, failed=False):
+        call = self._current()
+        if call is not None:
+            call.phases["connect"] += seconds
+            call.errors += failed
+
+    def wrap(self, conn):
+        return _TracedConnection(conn, self)
+
+    def _on_execute(self, sql, seconds, failed):
+        call = self._current()
+        if call is None:
+            return
+        call.phases["execute"] += seconds
+        call.errors += failed
+        if sql is not None and seconds >= call.statement_time:
+            call.statement, call.statement_time = sql, seconds
+
+    def _on_fetch(self, seconds, rows, size):
+        call = self._current()
+        if call is not None:
+            call.phases["fetch"] += seconds
+            call.rows += rows
+            call.bytes += size
+
+    # ------------ RESULTS ------------
+
+    def _finish(self, call):
+        with self._lock:
+            stats = self._stats.get(call.name)
+            if stats is None:
+                stats = self._stats[call.name] = _FunctionStats()
+            stats.calls += 1
+            stats.errors += 1 if call.errors else 0
+            stats.rows += call.rows
+            stats.bytes += call.bytes
+            for phase, seconds in call.phases.items():
+                stats.histograms[phase].record(seconds)
+        if self.slow_query_log and call.phases["total"] * 1000 >= self.slow_query_ms:
+            self._log_slow(call)
+
+    def _log_slow(self, call):
+        entry = {
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "function": call.name,
+            **{f"{phase}_ms": round(seconds * 1000, 2) for phase, seconds in call.phases.items()},
+            "rows": call.rows,
+            "bytes": call.bytes,
+            "errors": call.errors,
+            "statement": _one_line(call.statement) if call.statement else None,
+        }
+        try:
+            with self._log_lock:
+                os.makedirs(os.path.dirname(self.slow_query_log) or ".", exist_ok=True)
+                self._rotate_log()
+                with open(self.slow_query_log, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            print(f"Error writing the slow query log: {e}")
+
+    def _rotate_log(self):
+        """Keeps one previous log file once the current one reaches the size limit."""
+        try:
+            size = os.path.getsize(self.slow_query_log)
+        except OSError:
+            return
+        if size >= self.slow_query_log_max_bytes:
+            os.replace(self.slow_query_log, f"{self.slow_query_log}.1")
+
+    def snapshot(self):
+        """Returns {function: {calls, errors, rows, bytes, total/connect/execute/fetch summaries}}."""
+        with self._lock:
+            return {
+                name: {
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "rows": stats.rows,
+                    "bytes": stats.bytes,
+                    **{phase: h.summary() for phase, h in stats.histograms.items()},
+                }
+                for name, stats in self._stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class _TracedConnection:
+    """Connection proxy handing out traced cursors."""
+
+    def __init__(self, conn, metrics):
+        self._conn = conn
+        self._metrics = metrics
+
+    def cursor(self, *args, **kwargs):
+        return _TracedCursor(self._conn.cursor(*args, **kwargs), self._metrics)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class _TracedCursor:
+    """Cursor proxy timing execute/fetch calls (attributes pass through, e.g. fast_executemany)."""
+
+    __slots__ = ("_cursor", "_metrics")
+
+    def __init__(self, cursor, metrics):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_metrics", metrics)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def _timed_execute(self, method, sql, *args):
+        started = time.perf_counter()
+        try:
+            method(sql, *args)
+        except BaseException:
+            self._metrics._on_execute(sql, time.perf_counter() - started, True)
+            raise
+        self._metrics._on_execute(sql, time.perf_counter() - started, False)
+        return self
+
+    def execute(self, sql, *args):
+        return self._timed_execute(self._cursor.execute, sql, *args)
+
+    def executemany(self, sql, *args):
+        return self._timed_execute(self._cursor.executemany, sql, *args)
+
+    def nextset(self):
+        # Moving to the next result set runs the next statement of the batch
+        started = time.perf_counter()
+        result = self._cursor.nextset()
+        self._metrics._on_execute(None, time.perf_counter() - started, False)
+        return result
+
+    def _timed_fetch(self, method, *args):
+        started = time.perf_counter()
+        rows = method(*args)
+        return rows, time.perf_counter() - started
+
+    def fetchone(self):
+        row, seconds = self._timed_fetch(self._cursor.fetchone)
+        self._metrics._on_fetch(seconds, 0 if row is None else 1, _estimate_bytes([row] if row else []))
+        return row
+
+    def fetchall(self):
+        rows, seconds = self._timed_fetch(self._cursor.fetchall)
+        self._metrics._on_fetch(seconds, len(rows), _estimate_bytes(rows))
+        return rows
+
+    def fetchmany(self, *args):
+        rows, seconds = self._timed_fetch(self._cursor.fetchmany, *args)
+        self._metrics._on_fetch(seconds, len(rows), _estimate_bytes(rows))
+        return rows
+
+
+# Shared by database.py and the diagnostics panel
+db_metrics = DbMetrics()
@@ -0,0 +1,153 @@
+import heapq
+from datetime import date
+
+
+class RemovableHeap:
+    """Max-heap of expense rows with lazy removal by ExpenseID.
+
+    `key` maps a row to a sortable tuple; the largest keys come out first.
+    Removed rows stay in the heap until they surface and are then dropped.
+    """
+
+    def __init__(self, key):
+        self._key = key
+        self._heap = []   # [(negated key, row)]
+        self._live = {}   # ExpenseID -> row
+
+    def build(self, rows):
+        self._live = {row[0]: row for row in rows}
+        self._heap = [(self._neg_key(row), row) for row in self._live.values()]
+        heapq.heapify(self._heap)
+
+    def push(self, row):
+        self._live[row[0]] = row
+        heapq.heappush(self._heap, (self._neg_key(row), row))
+
+    def remove(self, expense_id):
+        self._live.pop(expense_id, None)
+        if len(self._heap) > 2 * len(self._live) + 64:
+            self.build(list(self._live.values()))
+
+    def clear(self):
+        self._heap, self._live = [], {}
+
+    def largest(self, k):
+        """Returns the `k` rows with the largest keys, in descending order."""
+        found, popped = [], []
+        while self._heap and len(found) < k:
+            entry = heapq.heappop(self._heap)
+            row = entry[1]
+            if self._live.get(row[0]) is row:
+                found.append(row)
+                popped.append(entry)
+        for entry in popped:
+            heapq.heappush(self._heap, entry)
+        return found
+
+    def _neg_key(self, row):
+        return tuple(-part for part in self._key(row))
+
+
+def _amount_key(row):
+    return (row[3], row[0])
+
+
+def _date_key(row):
+    return (date.fromisoformat(row[4]).toordinal(), row[0])
+
+
+class ExpenseAggregates:
+    """Analytics aggregates maintained incrementally from insert/delete deltas.
+
+    Keeps running per-month, per-category and per-(month, category) totals and
+    removable heaps for the most expensive and the newest expenses, so a single
+    write costs O(log n) instead of a full recomputation.
+    """
+
+    def __init__(self):
+        self.total = 0.0
+        self.count = 0
+        self.month_totals = {}           # "YYYY-MM" -> [total, count]
+        self.category_totals = {}        # category -> [total, count]
+        self.month_category_totals = {}  # ("YYYY-MM", category) -> [total, count]
+        self._by_amount = RemovableHeap(_amount_key)
+        self._by_date = RemovableHeap(_date_key)
+
+    # ------------ SEEDING ------------
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Seeds the aggregates from an ExpenseFrame using its vectorized group-bys."""
+        aggregates = cls()
+        aggregates.total = frame.total()
+        aggregates.count = len(frame)
+        aggregates.month_totals = {m: [t, c] for m, t, c in frame.group_by_month(with_counts=True)}
+        aggregates.category_totals = {k: [t, c] for k, t, c in frame.group_by_category(with_counts=True)}
+        aggregates.month_category_totals = {
+            (m, k): [t, c] for m, k, t, c in frame.group_by_month_category()
+        }
+        rows = frame.rows()
+        aggregates._by_amount.build(rows)
+        aggregates._by_date.build(rows)
+        return aggregates
+
+    # ------------ DELTAS ------------
+
+    def apply_insert(self, row):
+        """Adds one (id, title, category, amount, 'YYYY-MM-DD') row."""
+        self._add(row, 1)
+        self._by_amount.push(row)
+        self._by_date.push(row)
+
+    def apply_delete(self, row):
+        """Removes a row previously added or seeded."""
+        self._add(row, -1)
+        self._by_amount.remove(row[0])
+        self._by_date.remove(row[0])
+
+    def clear(self):
+        self.__init__()
+
+    def _add(self, row, sign):
+        _, _, category, amount, expense_date = row
+        month = expense_date[:7]
+        self.total += sign * amount
+        self.count += sign
+        for table, key in ((self.month_totals, month),
+                           (self.category_totals, category),
+                           (self.month_category_totals, (month, category))):
+            entry = table.setdefault(key, [0.0, 0])
+            entry[0] += sign * amount
+            entry[1] += sign
+            if entry[1] <= 0:
+                del table[key]
+        if self.count <= 0:
+            self.total, self.count = 0.0, 0
+
+    # ------------ READS ------------
+
+    def top(self, k=5):
+        return self._by_amount.largest(k)
+
+    def newest(self, k):
+        return self._by_date.largest(k)
+
+    def month_total(self, year, month):
+        return self.month_totals.get(f"{year:04d}-{month:02d}", [0.0, 0])[0]
+
+    def categories_for_month(self, year, month):
+        """Returns [(category, total)] for one month, largest first."""
+        key = f"{year:04d}-{month:02d}"
+        totals = [(c, t) for (m, c), (t, _) in self.month_category_totals.items() if m == key]
+        return sorted(totals, key=lambda item: item[1], reverse=True)
+
+    def analytics_summary(self, year, month, top_n=5, recent_limit=100):
+        """Returns the analytics aggregates in the shape of database.fetch_analytics_summary()."""
+        return {
+            "category_totals": sorted(((c, t) for c, (t, _) in self.category_totals.items()),
+                                      key=lambda item: item[1], reverse=True),
+            "monthly_totals": sorted((m, t) for m, (t, _) in self.month_totals.items()),
+            "month_total": self.month_total(year, month),
+            "top": self.top(top_n),
+            "recent": self.newest(recent_limit),
+        }
@@ -0,0 +1,166 @@
+import numpy as np
+
+
+class ExpenseFrame:
+    """Columnar (NumPy) view of a user's expenses for vectorized analytics.
+
+    Columns: int64 `ids`, object `titles`, float64 `amounts`,
+    datetime64[D] `dates` and int32 `category_codes` indexing `categories`.
+    """
+
+    def __init__(self, ids, titles, amounts, dates, category_codes, categories):
+        self.ids = ids
+        self.titles = titles
+        self.amounts = amounts
+        self.dates = dates
+        self.category_codes = category_codes
+        self.categories = categories
+
+    # ------------ CONSTRUCTION ------------
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=object),
+                   np.empty(0, dtype=np.float64), np.empty(0, dtype="datetime64[D]"),
+                   np.empty(0, dtype=np.int32), [])
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Builds a frame from (id, title, category, amount, date) rows."""
+        return cls.from_batches([rows])
+
+    @classmethod
+    def from_batches(cls, batches):
+        """Builds a frame from an iterable of row batches (e.g. cursor.fetchmany results).
+
+        Dates may be `datetime.date` objects or 'YYYY-MM-DD' strings and
+        amounts anything convertible to float (including Decimal).
+        """
+        ids, titles, categories, amounts, dates = [], [], [], [], []
+        for batch in batches:
+            if not batch:
+                continue
+            b_ids, b_titles, b_categories, b_amounts, b_dates = zip(*batch)
+            ids.extend(b_ids)
+            titles.extend(b_titles)
+            categories.extend(b_categories)
+            amounts.extend(b_amounts)
+            dates.extend(b_dates)
+        if not ids:
+            return cls.empty()
+
+        uniques, codes = np.unique(np.array(categories, dtype=object), return_inverse=True)
+        return cls(
+            np.array(ids, dtype=np.int64),
+            np.array(titles, dtype=object),
+            np.array(amounts, dtype=np.float64),
+            np.array(dates, dtype="datetime64[D]"),
+            codes.astype(np.int32),
+            [str(c) for c in uniques],
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def select(self, mask):
+        """Returns a frame with the rows picked by a boolean mask or index array."""
+        return ExpenseFrame(self.ids[mask], self.titles[mask], self.amounts[mask],
+                            self.dates[mask], self.category_codes[mask], self.categories)
+
+    def rows(self, indices=None):
+        """Converts rows back into (id, title, category, amount, 'YYYY-MM-DD') tuples."""
+        if indices is None:
+            indices = np.arange(len(self))
+        date_strings = self.dates[indices].astype(str).tolist()
+        return [
+            (int(self.ids[i]), self.titles[i], self.categories[self.category_codes[i]],
+             float(self.amounts[i]), date_strings[n])
+            for n, i in enumerate(indices)
+        ]
+
+    # ------------ FILTERS ------------
+
+    def mask_date_range(self, start=None, end=None):
+        """Boolean mask of rows within the half-open range [start, end)."""
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.dates >= np.datetime64(start, "D")
+        if end is not None:
+            mask &= self.dates < np.datetime64(end, "D")
+        return mask
+
+    def mask_month(self, year, month):
+        month_start = np.datetime64(f"{year:04d}-{month:02d}", "M")
+        return self.mask_date_range(month_start, month_start + 1)
+
+    # ------------ AGGREGATIONS ------------
+
+    def total(self, mask=None):
+        return float(self.amounts.sum() if mask is None else self.amounts[mask].sum())
+
+    def group_by_month(self, with_counts=False):
+        """Returns [("YYYY-MM", total)] (or (month, total, count)) in chronological order."""
+        if not len(self):
+            return []
+        months, inverse = np.unique(self.dates.astype("datetime64[M]"), return_inverse=True)
+        totals = np.bincount(inverse, weights=self.amounts, minlength=len(months))
+        labels = months.astype(str).tolist()
+        if with_counts:
+            counts = np.bincount(inverse, minlength=len(months))
+            return list(zip(labels, totals.tolist(), counts.tolist()))
+        return list(zip(labels, totals.tolist()))
+
+    def group_by_category(self, with_counts=False):
+        """Returns [(category, total)] (or (category, total, count)) sorted by total, largest first."""
+        if not len(self):
+            return []
+        size = len(self.categories)
+        totals = np.bincount(self.category_codes, weights=self.amounts, minlength=size)
+        counts = np.bincount(self.category_codes, minlength=size)
+        codes = np.flatnonzero(counts > 0)
+        codes = codes[np.argsort(-totals[codes], kind="stable")]
+        if with_counts:
+            return [(self.categories[c], float(totals[c]), int(counts[c])) for c in codes]
+        return [(self.categories[c], float(totals[c])) for c in codes]
+
+    def group_by_month_category(self):
+        """Returns [("YYYY-MM", category, total, count)] for every non-empty pair."""
+        if not len(self):
+            return []
+        months, month_idx = np.unique(self.dates.astype("datetime64[M]"), return_inverse=True)
+        size = len(self.categories)
+        pair_idx = month_idx * size + self.category_codes
+        totals = np.bincount(pair_idx, weights=self.amounts, minlength=len(months) * size)
+        counts = np.bincount(pair_idx, minlength=len(months) * size)
+        labels = months.astype(str).tolist()
+        return [(labels[p // size], self.categories[p % size], float(totals[p]), int(counts[p]))
+                for p in np.flatnonzero(counts).tolist()]
+
+    def top_k(self, k):
+        """Indices of the `k` most expensive rows (amount desc, id desc)."""
+        if k <= 0 or not len(self):
+            return np.empty(0, dtype=np.int64)
+        candidates = np.arange(len(self))
+        if len(self) > k:
+            # Keep every row tied with the k-th amount so the id tie-break stays exact
+            threshold = np.partition(self.amounts, len(self) - k)[len(self) - k]
+            candidates = np.flatnonzero(self.amounts >= threshold)
+        order = np.lexsort((-self.ids[candidates], -self.amounts[candidates]))
+        return candidates[order[:k]]
+
+    def newest(self, k):
+        """Indices of the `k` newest rows (date desc, id desc)."""
+        if k <= 0 or not len(self):
+            return np.empty(0, dtype=np.int64)
+        order = np.lexsort((self.ids, self.dates))[::-1]
+        return order[:k]
+
+    def analytics_summary(self, year, month, top_n=5, recent_limit=100):
+        """Returns the analytics aggregates in the shape of database.fetch_analytics_summary()."""
+        return {
+            "category_totals": self.group_by_category(),
+            "monthly_totals": self.group_by_month(),
+            "month_total": self.total(self.mask_month(year, month)),
+            "top": self.rows(self.top_k(top_n)),
+            "recent": self.rows(self.newest(recent_limit)),
+        }
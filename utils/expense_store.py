@@ -0,0 +1,288 @@
+import threading
+from datetime import datetime
+from tkinter import messagebox
+from database import fetch_changes_since
+from utils.expense_frame import ExpenseFrame
+from utils.expense_aggregates import ExpenseAggregates
+
+
+class ExpenseStore:
+    """In-memory snapshot of one user's expenses shared by all pages.
+
+    The snapshot is downloaded once on the shared TaskScheduler and then kept
+    current with `sync()`, which only fetches rows changed since the last
+    watermark. Writes made by the app are applied to it (and to the
+    incremental aggregates) locally and subscribers are notified through the
+    debouncing RefreshCoordinator.
+    With a SnapshotCache, the dashboard and analytics data are also written to
+    disk after every change so the next login can show them immediately.
+    With a ParquetDataset, the initial download reads the local Parquet copy
+    and fetches only the changes made since it was exported; the copy is
+    brought up to date in the background after every load and sync.
+    """
+
+    def __init__(self, user_id, scheduler, refresh_coordinator, snapshot_cache=None,
+                 parquet_dataset=None):
+        self.user_id = user_id
+        self._scheduler = scheduler
+        self._refresh_coordinator = refresh_coordinator
+        self._snapshot_cache = snapshot_cache
+        self._parquet_dataset = parquet_dataset
+        self._lock = threading.RLock()
+        self._expenses = {}  # ExpenseID -> (id, title, category, amount, date)
+        self._frame = None   # cached ExpenseFrame, rebuilt after every change
+        self.aggregates = ExpenseAggregates()
+        self.watermark = None  # change watermark of the last download/sync
+        self._pending = {}     # temporary id -> optimistic row not saved yet (see WriteQueue)
+        self._subscribers = []
+        self.loaded = False
+        self.loading = False
+
+    # ------------ SUBSCRIPTIONS ------------
+
+    def subscribe(self, callback):
+        """Registers a no-argument callback run on the Tk thread after changes (debounced)."""
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def _notify(self):
+        for callback in list(self._subscribers):
+            self._refresh_coordinator.request(callback)
+        self._save_snapshot()
+
+    def _save_snapshot(self):
+        """Writes the dashboard and analytics data to disk on a worker (coalesced)."""
+        if self._snapshot_cache is None or not self.loaded:
+            return
+        now = datetime.now()
+        with self._lock:
+            dashboard = {"total": self.aggregates.total, "recent": self.aggregates.newest(5)}
+            analytics = {"month": f"{now.year:04d}-{now.month:02d}",
+                         "summary": self.aggregates.analytics_summary(now.year, now.month)}
+        self._scheduler.submit("store:snapshot", self._snapshot_cache.save, self.user_id,
+                               dashboard=dashboard, analytics=analytics)
+
+    def _export_parquet(self):
+        """Updates the local Parquet copy on a worker (coalesced)."""
+        if self._parquet_dataset is None:
+            return
+        self._scheduler.submit("store:parquet", self._parquet_dataset.export,
+                               on_error=lambda e: print(f"Error exporting Parquet snapshot: {e}"))
+
+    # ------------ LOADING ------------
+
+    def ensure_loaded(self):
+        """Starts the initial download unless the snapshot is loaded or loading."""
+        if not self.loaded and not self.loading:
+            self.reload()
+
+    def reload(self):
+        """Re-downloads the whole snapshot on a background worker."""
+        with self._lock:
+            self.loading = True
+        self._scheduler.submit("store:reload", self._perform_load,
+                               on_done=self._complete_load, on_error=self._on_load_error)
+
+    def sync(self):
+        """Fetches and applies only the changes made since the last download or sync."""
+        if not self.loaded:
+            self.ensure_loaded()
+            return
+        if self.watermark is None:
+            # The last download failed, so there is nothing to diff against
+            self.reload()
+            return
+        self._scheduler.submit("store:sync", fetch_changes_since, self.user_id, self.watermark,
+                               on_done=self._apply_changes)
+
+    def _perform_load(self):
+        """(Background) Downloads every row with its watermark and seeds the aggregates."""
+        cached = self._read_parquet()
+        if cached is None:
+            changes = fetch_changes_since(self.user_id, None)
+            if changes is None:
+                raise RuntimeError("expense download failed")
+            expenses = {row[0]: row for row in changes["upserts"]}
+            frame = ExpenseFrame.from_rows(list(expenses.values()))
+        else:
+            frame, watermark = cached
+            changes = fetch_changes_since(self.user_id, watermark)
+            if changes is None:
+                raise RuntimeError("expense download failed")
+            if changes["reset"]:
+                # The copy predates pruned deletions, so the result is a full download
+                expenses = {row[0]: row for row in changes["upserts"]}
+                frame = ExpenseFrame.from_rows(list(expenses.values()))
+            else:
+                expenses = {row[0]: row for row in frame.rows()}
+                if changes["deleted"] or changes["upserts"]:
+                    for expense_id in changes["deleted"]:
+                        expenses.pop(expense_id, None)
+                    expenses.update((row[0], row) for row in changes["upserts"])
+                    frame = ExpenseFrame.from_rows(list(expenses.values()))
+        return expenses, frame, ExpenseAggregates.from_frame(frame), changes["watermark"]
+
+    def _read_parquet(self):
+        """Returns (frame, watermark) from the local Parquet copy, or None to download."""
+        if self._parquet_dataset is None:
+            return None
+        try:
+            return self._parquet_dataset.read_frame()
+        except Exception as e:
+            print(f"Ignoring unreadable Parquet snapshot: {e}")
+            return None
+
+    def _complete_load(self, result):
+        expenses, frame, aggregates, watermark = result
+        with self._lock:
+            if self._pending:
+                # Rows queued while the snapshot was downloading
+                expenses.update(self._pending)
+                for row in self._pending.values():
+                    aggregates.apply_insert(row)
+                frame = None
+            self._expenses = expenses
+            self._frame = frame
+            self.aggregates = aggregates
+            self.watermark = watermark
+            self.loaded = True
+            self.loading = False
+        self._notify()
+        if watermark is not None:
+            self._export_parquet()
+
+    def _on_load_error(self, error):
+        print(f"Error loading expenses: {error}")
+        messagebox.showerror("DB Error", "Failed to load expense data.")
+        self._complete_load(({}, ExpenseFrame.empty(), ExpenseAggregates(), None))
+
+    def _apply_changes(self, changes):
+        """Applies a fetch_changes_since() result; notifies only if something changed."""
+        if changes is None:
+            return
+        if changes["reset"]:
+            # Deletions since our watermark were pruned, so the diff is incomplete
+            self.reload()
+            return
+        with self._lock:
+            changed = False
+            for expense_id in changes["deleted"]:
+                expense = self._expenses.pop(expense_id, None)
+                if expense:
+                    self.aggregates.apply_delete(expense)
+                    changed = True
+            for expense in changes["upserts"]:
+                previous = self._expenses.get(expense[0])
+                if previous == expense:
+                    continue  # already applied locally by the write that created it
+                if previous:
+                    self.aggregates.apply_delete(previous)
+                self._expenses[expense[0]] = expense
+                self.aggregates.apply_insert(expense)
+                changed = True
+            self.watermark = max(self.watermark, changes["watermark"])
+            if changed:
+                self._frame = None
+        if changed:
+            self._notify()
+            self._export_parquet()
+
+    # ------------ LOCAL WRITES ------------
+
+    def apply_insert(self, expense):
+        """Adds a row that has already been written to the DB."""
+        self.apply_inserts([expense])
+
+    def apply_inserts(self, expenses):
+        """Adds rows that have already been written to the DB (e.g. a CSV import)."""
+        with self._lock:
+            for expense in expenses:
+                previous = self._expenses.get(expense[0])
+                if previous:
+                    self.aggregates.apply_delete(previous)
+                self._expenses[expense[0]] = expense
+                self.aggregates.apply_insert(expense)
+            self._frame = None
+        self._notify()
+
+    def add_pending(self, expense):
+        """Adds an optimistic row (temporary negative id) that is not saved yet."""
+        with self._lock:
+            self._pending[expense[0]] = expense
+        self.apply_insert(expense)
+
+    def resolve_pending(self, temp_ids, saved=()):
+        """Replaces pending rows with the saved rows (or just drops them) in one notification."""
+        with self._lock:
+            for temp_id in temp_ids:
+                self._pending.pop(temp_id, None)
+                expense = self._expenses.pop(temp_id, None)
+                if expense:
+                    self.aggregates.apply_delete(expense)
+            for expense in saved:
+                previous = self._expenses.get(expense[0])
+                if previous:
+                    self.aggregates.apply_delete(previous)
+                self._expenses[expense[0]] = expense
+                self.aggregates.apply_insert(expense)
+            self._frame = None
+        self._notify()
+
+    def is_pending(self, expense_id):
+        return expense_id in self._pending
+
+    def pending_rows(self, category=None):
+        """Returns the rows not saved yet (newest first), optionally of one category."""
+        with self._lock:
+            rows = sorted(self._pending.values(), key=lambda e: e[0])
+        return [e for e in rows if category is None or e[2] == category]
+
+    def apply_delete(self, expense_ids):
+        """Removes rows that have already been deleted from the DB."""
+        with self._lock:
+            for expense_id in expense_ids:
+                expense = self._expenses.pop(expense_id, None)
+                if expense:
+                    self.aggregates.apply_delete(expense)
+            self._frame = None
+        self._notify()
+
+    def apply_clear(self):
+        """Empties the snapshot after all expenses were deleted."""
+        with self._lock:
+            # Queued rows are saved after the delete, so they stay
+            self._expenses = dict(self._pending)
+            self.aggregates.clear()
+            for row in self._pending.values():
+                self.aggregates.apply_insert(row)
+            self._frame = None
+        self._notify()
+
+    # ------------ QUERIES ------------
+
+    def total(self, category=None):
+        with self._lock:
+            if category is None:
+                return self.aggregates.total
+            return self.aggregates.category_totals.get(category, [0.0, 0])[0]
+
+    def analytics_summary(self, year, month):
+        """Returns the analytics aggregates maintained from the write deltas."""
+        with self._lock:
+            return self.aggregates.analytics_summary(year, month)
+
+    def frame(self):
+        """Returns the snapshot as a columnar ExpenseFrame (cached until the next change)."""
+        with self._lock:
+            if self._frame is None:
+                self._frame = ExpenseFrame.from_rows(list(self._expenses.values()))
+            return self._frame
+
+    def recent(self, limit=5):
+        """Returns the newest `limit` expenses."""
+        with self._lock:
+            return self.aggregates.newest(limit)
@@ -0,0 +1,30 @@
+from decimal import Decimal, InvalidOperation
+
+# Column limits of the Expenses table (ExpenseName NVARCHAR(255), Category NVARCHAR(100))
+TITLE_MAX_LENGTH = 255
+CATEGORY_MAX_LENGTH = 100
+# Amount DECIMAL(18, 2) holds at most 16 digits before the decimal point
+AMOUNT_LIMIT = Decimal("1e16")
+
+
+def validate_expense(title, category, amount):
+    """Checks that an expense fits the Expenses columns.
+
+    Returns the amount as a Decimal or raises ValueError with the reason.
+    Amounts are not rounded here; callers decide how to treat extra decimals.
+    """
+    if not title:
+        raise ValueError("empty title")
+    if len(title) > TITLE_MAX_LENGTH:
+        raise ValueError(f"title longer than {TITLE_MAX_LENGTH} characters")
+    if not category:
+        raise ValueError("empty category")
+    if len(category) > CATEGORY_MAX_LENGTH:
+        raise ValueError(f"category longer than {CATEGORY_MAX_LENGTH} characters")
+    try:
+        value = Decimal(str(amount))
+    except InvalidOperation:
+        raise ValueError(f"invalid amount {amount!r}") from None
+    if not value.is_finite() or abs(value) >= AMOUNT_LIMIT:
+        raise ValueError(f"invalid amount {amount!r}")
+    return value
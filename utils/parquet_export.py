@@ -0,0 +1,189 @@
+import json
+import os
+from datetime import date
+from decimal import Decimal
+import numpy as np
+from database import STORAGE_ID, fetch_changes_since, get_change_watermark, stream_expenses
+from utils.expense_frame import ExpenseFrame
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = pc = pq = None
+
+PARQUET_AVAILABLE = pa is not None
+
+# Root directory of the per-user datasets (point Power BI or other tools here)
+PARQUET_EXPORT_DIR = os.getenv(
+    "PARQUET_EXPORT_DIR", os.path.join(os.path.expanduser("~"), ".finance_tracker", "parquet")
+)
+MANIFEST_NAME = "_manifest.json"
+
+
+def _schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("title", pa.string()),
+        ("category", pa.dictionary(pa.int32(), pa.string())),
+        ("amount", pa.decimal128(18, 2)),
+        ("date", pa.date32()),
+    ])
+
+
+def _month_bounds(year_month):
+    year, month = int(year_month[:4]), int(year_month[5:7])
+    start = date(year, month, 1)
+    end = date(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+
+class ParquetDataset:
+    """A user's expenses as a Parquet dataset partitioned by month.
+
+    Layout: `<root>/<STORAGE_ID>/user_<id>/year_month=YYYY-MM/part.parquet` plus a manifest
+    with the change watermark of the last export. `export()` asks the DB for
+    the changes since that watermark (see fetch_changes_since) and rewrites
+    only the partitions they touch. `read_frame()` memory-maps the files into
+    an ExpenseFrame. Requires the optional `pyarrow` package.
+    """
+
+    def __init__(self, user_id, root=PARQUET_EXPORT_DIR):
+        if not PARQUET_AVAILABLE:
+            raise RuntimeError("Parquet export requires the 'pyarrow' package.")
+        self.user_id = user_id
+        self.directory = os.path.join(root, STORAGE_ID, f"user_{int(user_id)}")
+        self.manifest_path = os.path.join(self.directory, MANIFEST_NAME)
+
+    # ------------ EXPORT ------------
+
+    def export(self):
+        """Brings the dataset up to date; returns the list of rewritten months."""
+        manifest = self._load_manifest()
+        if manifest is None:
+            return self._export_full()
+
+        changes = fetch_changes_since(self.user_id, manifest["watermark"])
+        if changes is None:
+            raise RuntimeError("Fetching changes for the Parquet export failed.")
+        if changes["reset"]:
+            # Deletions since the last export were pruned from the DB
+            return self._export_full()
+        changed_ids = set(changes["deleted"]) | {row[0] for row in changes["upserts"]}
+        dirty = {row[4][:7] for row in changes["upserts"]}
+        if changed_ids:
+            # Rows can also leave a partition (deleted or moved to another month)
+            dirty |= self._months_containing(changed_ids)
+
+        months = manifest["months"]
+        for year_month in sorted(dirty):
+            start, end = _month_bounds(year_month)
+            rows = [row for batch in stream_expenses(self.user_id, start, end) for row in batch]
+            months[year_month] = self._write_partition(year_month, rows)
+        manifest["months"] = {m: n for m, n in months.items() if n}
+        manifest["watermark"] = changes["watermark"]
+        self._save_manifest(manifest)
+        return sorted(dirty)
+
+    def _export_full(self):
+        # Watermark first: anything committed while streaming is re-exported next time
+        watermark = get_change_watermark()
+        if watermark is None:
+            raise RuntimeError("Fetching the change watermark for the Parquet export failed.")
+        months, current, rows = {}, None, []
+        for batch in stream_expenses(self.user_id):  # oldest first, so months arrive in order
+            for row in batch:
+                if row[4][:7] != current:
+                    if rows:
+                        months[current] = self._write_partition(current, rows)
+                    current, rows = row[4][:7], []
+                rows.append(row)
+        if rows:
+            months[current] = self._write_partition(current, rows)
+        for year_month in self._partition_months() - months.keys():
+            self._write_partition(year_month, [])
+        self._save_manifest({"watermark": watermark, "months": months})
+        return sorted(months)
+
+    def _write_partition(self, year_month, rows):
+        """Replaces one month's file (or removes it when empty); returns the row count."""
+        path = self._partition_path(year_month)
+        if not rows:
+            if os.path.exists(path):
+                os.remove(path)
+            return 0
+        ids, titles, categories, amounts, dates = zip(*rows)
+        table = pa.table({
+            "id": pa.array(ids, pa.int64()),
+            "title": pa.array(titles, pa.string()),
+            "category": pa.array(categories, pa.string()).dictionary_encode(),
+            "amount": pa.array([Decimal(str(a)).quantize(Decimal("0.01")) for a in amounts],
+                               pa.decimal128(18, 2)),
+            "date": pa.array([date.fromisoformat(d) for d in dates], pa.date32()),
+        }, schema=_schema())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+        return len(rows)
+
+    def _months_containing(self, ids):
+        """Months whose partition holds any of `ids` (reads only the id column)."""
+        wanted = pa.array(list(ids), pa.int64())
+        months = set()
+        for year_month in self._partition_months():
+            column = pq.read_table(self._partition_path(year_month), columns=["id"],
+                                   memory_map=True).column("id")
+            if pc.any(pc.is_in(column, value_set=wanted)).as_py():
+                months.add(year_month)
+        return months
+
+    # ------------ READ ------------
+
+    def read_frame(self):
+        """Memory-maps all partitions into an ExpenseFrame; returns (frame, watermark) or None."""
+        manifest = self._load_manifest()
+        if manifest is None:
+            return None
+        tables = [pq.read_table(self._partition_path(m), memory_map=True)
+                  for m in sorted(manifest["months"])]
+        if not tables:
+            return ExpenseFrame.empty(), manifest["watermark"]
+        table = pa.concat_tables(tables).unify_dictionaries().combine_chunks()
+        category = table.column("category").chunk(0)
+        frame = ExpenseFrame(
+            table.column("id").to_numpy(),
+            np.array(table.column("title").to_pylist(), dtype=object),
+            table.column("amount").cast(pa.float64()).to_numpy(),
+            table.column("date").to_numpy().astype("datetime64[D]"),
+            category.indices.to_numpy().astype(np.int32),
+            category.dictionary.to_pylist(),
+        )
+        return frame, manifest["watermark"]
+
+    # ------------ FILES ------------
+
+    def _partition_path(self, year_month):
+        return os.path.join(self.directory, f"year_month={year_month}", "part.parquet")
+
+    def _partition_months(self):
+        if not os.path.isdir(self.directory):
+            return set()
+        return {name.split("=", 1)[1] for name in os.listdir(self.directory)
+                if name.startswith("year_month=")
+                and os.path.exists(os.path.join(self.directory, name, "part.parquet"))}
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_manifest(self, manifest):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
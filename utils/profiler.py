@@ -0,0 +1,265 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from importlib.machinery import ExtensionFileLoader, SourceFileLoader, SourcelessFileLoader
+
+# `python main.py --profile` or APP_PROFILE=1 starts a profiling session
+PROFILE_ENABLED = "--profile" in sys.argv[1:] or os.getenv("APP_PROFILE", "0") == "1"
+PROFILE_DIR = os.getenv(
+    "PROFILE_DIR", os.path.join(os.path.expanduser("~"), ".finance_tracker", "profiles")
+)
+# An action ends once the workers and pending refreshes have been idle this long
+ACTION_SETTLE_MS = 500
+# How often a running action checks for background work (its wall time resolution)
+ACTION_POLL_MS = 10
+SAMPLE_MS = 5
+TOP_IMPORTS = 40
+
+_session = None
+
+
+def start_session(directory=PROFILE_DIR):
+    """Starts timing imports and startup; call before the application's imports."""
+    global _session
+    if _session is None:
+        _session = ProfileSession(directory)
+    return _session
+
+
+def current_session():
+    return _session
+
+
+def profile_action(name):
+    """Marks the start of a named user action (no-op unless profiling)."""
+    if _session is not None:
+        _session.begin_action(name)
+
+
+class ImportTimer:
+    """Times the execution of every module imported while installed (like -X importtime).
+
+    Wraps `exec_module` of the file based loaders found through sys.meta_path
+    and records the cumulative and self time of each module.
+    """
+
+    _LOADERS = (SourceFileLoader, SourcelessFileLoader, ExtensionFileLoader)
+
+    def __init__(self):
+        self.times = {}  # module -> (cumulative seconds, self seconds)
+        self._local = threading.local()
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if type(spec.loader) in self._LOADERS:
+            self._wrap(fullname, spec.loader)
+        return spec
+
+    def _wrap(self, fullname, loader):
+        original = loader.exec_module
+
+        def exec_module(module):
+            stack = self._local.__dict__.setdefault("stack", [])
+            stack.append(0.0)
+            started = time.perf_counter()
+            try:
+                original(module)
+            finally:
+                elapsed = time.perf_counter() - started
+                children = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                self.times[fullname] = (elapsed, elapsed - children)
+
+        loader.exec_module = exec_module
+
+    def table(self, limit=TOP_IMPORTS):
+        rows = sorted(self.times.items(), key=lambda item: item[1][1], reverse=True)
+        lines = [f"{'self ms':>10}{'cumulative ms':>15}  module"]
+        for name, (cumulative, own) in rows[:limit]:
+            lines.append(f"{own * 1000:>10.1f}{cumulative * 1000:>15.1f}  {name}")
+        return "\n".join(lines)
+
+
+class _Action:
+    def __init__(self, index, name):
+        self.index = index
+        self.name = name
+        self.started = time.perf_counter()
+        self.idle_since = None
+        self.profile = cProfile.Profile()
+        self.samples = Counter()  # folded stack -> samples
+
+
+class ProfileSession:
+    """One profiling run of the app, written to its own directory.
+
+    Records import times, startup milestones (see `mark()`) and, for every
+    named action started with profile_action(), a cProfile of the Tk thread
+    plus stack samples of all threads until the background work the action
+    triggered has settled. `close()` writes the files and a summary table.
+    """
+
+    def __init__(self, directory=PROFILE_DIR):
+        self.directory = os.path.join(directory, datetime.now().strftime("%Y%m%d-%H%M%S"))
+        self.started = time.perf_counter()
+        self.milestones = {}  # name -> seconds since the session started
+        self.imports = ImportTimer()
+        self.imports.install()
+        self.actions = []  # finished: {"name", "wall_ms", "tk_busy_ms", "samples", "top"}
+        self._root = None
+        self._action = None
+        self._count = 0
+        self._main_thread_id = threading.get_ident()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True).start()
+
+    # ------------ STARTUP ------------
+
+    def mark(self, name):
+        self.milestones.setdefault(name, time.perf_counter() - self.started)
+
+    def attach(self, app):
+        """Hooks into the AppController: records the first paint, tracks its workers."""
+        self._root = app
+
+        def on_first_expose(event):
+            self.mark("first_paint")
+            app.unbind("<Expose>", binding)
+
+        binding = app.bind("<Expose>", on_first_expose, add="+")
+
+    # ------------ ACTIONS ------------
+
+    def begin_action(self, name):
+        """Starts profiling a user action (Tk thread); ends the previous one first."""
+        if self._action is not None:
+            self._finish_action()
+        self._count += 1
+        action = _Action(self._count, name)
+        with self._lock:
+            self._action = action
+        action.profile.enable()
+        if self._root is not None:
+            self._root.after(ACTION_POLL_MS, self._poll_action, action)
+
+    def _poll_action(self, action):
+        if action is not self._action:
+            return
+        now = time.perf_counter()
+        if not self._root.scheduler.is_idle() or self._root.refresh_coordinator.has_pending():
+            action.idle_since = None
+        elif action.idle_since is None:
+            action.idle_since = now
+        if action.idle_since is not None and now - action.idle_since >= ACTION_SETTLE_MS / 1000:
+            self._finish_action()
+        else:
+            self._root.after(ACTION_POLL_MS, self._poll_action, action)
+
+    def _finish_action(self):
+        with self._lock:
+            action, self._action = self._action, None
+        action.profile.disable()
+        ended = action.idle_since or time.perf_counter()
+        stem = os.path.join(self.directory, "actions", f"{action.index:03d}-{action.name}")
+        os.makedirs(os.path.dirname(stem), exist_ok=True)
+        action.profile.dump_stats(f"{stem}.prof")
+        with open(f"{stem}.folded", "w", encoding="utf-8") as f:
+            for stack, count in action.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+        stats = pstats.Stats(action.profile, stream=io.StringIO())
+        top = max(stats.stats.items(), key=lambda item: item[1][2], default=None)
+        self.actions.append({
+            "name": action.name,
+            "wall_ms": round((ended - action.started) * 1000, 1),
+            "tk_busy_ms": round(stats.total_tt * 1000, 1),
+            "samples": sum(action.samples.values()),
+            "top": pstats.func_std_string(top[0]) if top else "",
+        })
+
+    def _sample_loop(self):
+        while not self._stop.wait(SAMPLE_MS / 1000):
+            with self._lock:
+                action = self._action
+            if action is None:
+                continue
+            own_id = threading.get_ident()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+                    stack.append(f"{module}.{getattr(code, 'co_qualname', code.co_name)}")
+                    frame = frame.f_back
+                thread = "tk" if thread_id == self._main_thread_id else names.get(thread_id, thread_id)
+                action.samples[f"{thread};" + ";".join(reversed(stack))] += 1
+
+    # ------------ REPORT ------------
+
+    def summary(self):
+        """Text table: startup milestones, then wall and Tk thread time per action."""
+        lines = ["Startup (seconds since the session started):"]
+        for name, seconds in sorted(self.milestones.items(), key=lambda item: item[1]):
+            lines.append(f"  {name:<24}{seconds * 1000:>10.1f} ms")
+        if "init_database" in self.milestones and "first_paint" in self.milestones:
+            gap = self.milestones["first_paint"] - self.milestones["init_database"]
+            lines.append(f"  init_database -> first paint: {gap * 1000:.1f} ms")
+
+        lines.append("")
+        lines.append(f"{'action':<12}{'runs':>6}{'wall ms p50':>13}{'wall ms max':>13}"
+                     f"{'Tk busy ms p50':>16}  slowest function (Tk thread, self time)")
+        by_name = {}
+        for action in self.actions:
+            by_name.setdefault(action["name"], []).append(action)
+        for name, runs in by_name.items():
+            walls = [a["wall_ms"] for a in runs]
+            slowest = max(runs, key=lambda a: a["wall_ms"])
+            lines.append(f"{name:<12}{len(runs):>6}{statistics.median(walls):>13.1f}{max(walls):>13.1f}"
+                         f"{statistics.median(a['tk_busy_ms'] for a in runs):>16.1f}  {slowest['top']}")
+        return "\n".join(lines)
+
+    def close(self):
+        """Ends the running action and writes imports, startup, actions and the summary."""
+        if self._action is not None:
+            self._finish_action()
+        self._stop.set()
+        self.imports.uninstall()
+        os.makedirs(self.directory, exist_ok=True)
+        summary = self.summary()
+        with open(os.path.join(self.directory, "imports.txt"), "w", encoding="utf-8") as f:
+            f.write(self.imports.table(limit=None) + "\n")
+        with open(os.path.join(self.directory, "session.json"), "w", encoding="utf-8") as f:
+            json.dump({"milestones_ms": {k: round(v * 1000, 1) for k, v in self.milestones.items()},
+                       "actions": self.actions}, f, indent=2)
+        with open(os.path.join(self.directory, "summary.txt"), "w", encoding="utf-8") as f:
+            f.write(summary + "\n\nSlowest imports:\n" + self.imports.table() + "\n")
+        print(summary)
+        print(f"Profile written to {self.directory}")
@@ -0,0 +1,42 @@
+class RefreshCoordinator:
+    """Debounces page refresh requests on the Tk thread.
+
+    Requests arriving within `delay_ms` of each other are collected and every
+    distinct callback runs once when the window closes, so a burst of store
+    notifications or refresh_all_pages() calls renders each page only once.
+    """
+
+    def __init__(self, root, delay_ms=50):
+        self._root = root
+        self.delay_ms = delay_ms
+        self._pending = {}  # callback -> None (insertion-ordered set)
+        self._after_id = None
+
+    def request(self, callback):
+        """Schedules `callback()` for the next flush (call from the Tk thread)."""
+        self._pending[callback] = None
+        if self._after_id is None:
+            self._after_id = self._root.after(self.delay_ms, self.flush)
+
+    def has_pending(self):
+        return bool(self._pending)
+
+    def flush(self):
+        """Runs all pending callbacks now."""
+        self._after_id = None
+        pending, self._pending = list(self._pending), {}
+        for callback in pending:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error during page refresh: {e}")
+
+    def cancel(self):
+        """Drops pending refreshes (e.g. on logout)."""
+        self._pending.clear()
+        if self._after_id is not None:
+            try:
+                self._root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
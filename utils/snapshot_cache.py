@@ -0,0 +1,71 @@
+import json
+import os
+import threading
+from database import STORAGE_ID
+
+# Directory holding one JSON snapshot per database and user
+SNAPSHOT_DIR = os.getenv(
+    "SNAPSHOT_DIR", os.path.join(os.path.expanduser("~"), ".finance_tracker", "snapshots")
+)
+# Bumped whenever the layout of a snapshot changes; older files are ignored
+SNAPSHOT_VERSION = 1
+
+
+def _as_rows(rows):
+    """JSON turns row tuples into lists; convert them back."""
+    return [tuple(row) for row in rows or []]
+
+
+class SnapshotCache:
+    """Per-user on-disk copy of the last dashboard/analytics data that was shown.
+
+    A snapshot has up to three sections: "settings", "dashboard"
+    ({"total", "recent"}) and "analytics" ({"month": "YYYY-MM", "summary"}).
+    It is rendered right after login and then revalidated against the DB.
+    Files are replaced atomically, so a crash never leaves a torn snapshot.
+    """
+
+    def __init__(self, directory=SNAPSHOT_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def path(self, user_id):
+        return os.path.join(self.directory, STORAGE_ID, f"user_{int(user_id)}.json")
+
+    def load(self, user_id):
+        """Returns the snapshot dict of a user, or None if there is no usable one."""
+        try:
+            with open(self.path(user_id), encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable snapshot: {e}")
+            return None
+        if data.get("version") != SNAPSHOT_VERSION:
+            return None
+
+        dashboard = data.get("dashboard")
+        if dashboard:
+            dashboard["recent"] = _as_rows(dashboard.get("recent"))
+        analytics = data.get("analytics")
+        if analytics:
+            summary = analytics["summary"]
+            for key in ("category_totals", "monthly_totals", "top", "recent"):
+                summary[key] = _as_rows(summary.get(key))
+        return data
+
+    def save(self, user_id, **sections):
+        """Merges the given sections into the user's snapshot (safe from any thread)."""
+        with self._lock:
+            data = self.load(user_id) or {"version": SNAPSHOT_VERSION}
+            data.update(sections)
+            path = self.path(user_id)
+            tmp_path = f"{path}.tmp"
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Error writing snapshot: {e}")
@@ -0,0 +1,150 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class _Task:
+    def __init__(self, key, fn, args, on_done, on_error, generation, epoch, session):
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.on_done = on_done
+        self.on_error = on_error
+        self.generation = generation
+        self.epoch = epoch
+        self.session = session
+
+
+class TaskScheduler:
+    """Fixed-size worker pool shared by all pages.
+
+    Tasks are identified by keys of the form "owner:action" (e.g.
+    "expenses:import"). With `supersede=True` (the default) a newer task with
+    the same key replaces the older one: at most one runs per key, a queued
+    task is replaced by the newest submission and results of superseded runs
+    are dropped before they reach Tk. `cancel_owner` / `cancel_all` drop
+    every pending task and result of a page or of the whole session.
+
+    Callbacks always run on the Tk thread, scheduled through `root.after`.
+    """
+
+    def __init__(self, root, max_workers=4):
+        self._root = root
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="budget-worker")
+        self._lock = threading.Lock()
+        self._generations = {}  # key -> latest generation
+        self._running = set()   # keys of superseding tasks currently running
+        self._pending = {}      # key -> newest _Task waiting for the running one
+        self._epochs = {}       # owner -> epoch, bumped on cancel_owner
+        self._session = 0       # bumped on cancel_all, covers every owner
+        self._active = 0        # tasks submitted to the executor and not finished yet
+        self._closed = False
+
+    # ------------ PUBLIC API ------------
+
+    def submit(self, key, fn, *args, on_done=None, on_error=None, supersede=True):
+        """Runs `fn(*args)` on a worker; `on_done(result)` / `on_error(exc)` run on the Tk thread."""
+        owner = self._owner(key)
+        with self._lock:
+            if self._closed:
+                return
+            generation = self._generations.get(key, 0) + 1 if supersede else None
+            if supersede:
+                self._generations[key] = generation
+            task = _Task(key, fn, args, on_done, on_error, generation,
+                         self._epochs.get(owner, 0), self._session)
+            if supersede and key in self._running:
+                self._pending[key] = task
+                return
+            if supersede:
+                self._running.add(key)
+            self._active += 1
+        self._executor.submit(self._run, task)
+
+    def is_idle(self):
+        """True when no task is running or waiting for a worker."""
+        with self._lock:
+            return self._active == 0
+
+    def call_in_main(self, fn, *args):
+        """Schedules `fn(*args)` on the Tk thread."""
+        try:
+            self._root.after(0, lambda: fn(*args))
+        except RuntimeError:
+            pass  # main loop already gone
+
+    def is_current(self, task):
+        """True while the task has been neither superseded nor cancelled."""
+        with self._lock:
+            if self._closed or task.session != self._session:
+                return False
+            if self._epochs.get(self._owner(task.key), 0) != task.epoch:
+                return False
+            return task.generation is None or self._generations.get(task.key) == task.generation
+
+    def cancel(self, key):
+        """Drops the queued run and any in-flight result for one key."""
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._pending.pop(key, None)
+
+    def cancel_owner(self, owner):
+        """Drops every queued task and in-flight result of one page."""
+        with self._lock:
+            self._epochs[owner] = self._epochs.get(owner, 0) + 1
+            for key in [k for k in self._pending if self._owner(k) == owner]:
+                del self._pending[key]
+
+    def cancel_all(self):
+        """Drops all queued tasks and in-flight results (e.g. on logout)."""
+        with self._lock:
+            self._session += 1
+            self._pending.clear()
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            self._pending.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ------------ INTERNALS ------------
+
+    @staticmethod
+    def _owner(key):
+        return key.split(":", 1)[0]
+
+    def _run(self, task):
+        try:
+            if self.is_current(task):
+                try:
+                    result = task.fn(*task.args)
+                except Exception as e:
+                    self._deliver(task, task.on_error, e)
+                else:
+                    self._deliver(task, task.on_done, result)
+        finally:
+            if task.generation is not None:
+                self._start_next(task.key)
+            with self._lock:
+                self._active -= 1
+
+    def _deliver(self, task, callback, value):
+        if callback is None:
+            if isinstance(value, Exception):
+                print(f"Background task {task.key} failed: {value}")
+            return
+
+        def deliver():
+            # Checked again on the Tk thread: the task may have been superseded meanwhile
+            if self.is_current(task):
+                callback(value)
+
+        self.call_in_main(deliver)
+
+    def _start_next(self, key):
+        with self._lock:
+            task = self._pending.pop(key, None)
+            if task is None or self._closed:
+                self._running.discard(key)
+                return
+            self._active += 1
+        self._executor.submit(self._run, task)
@@ -0,0 +1,202 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from utils.db_metrics import LatencyHistogram
+
+# Opt-in: UI_WATCHDOG=1 starts the watchdog with the app
+UI_WATCHDOG_ENABLED = os.getenv("UI_WATCHDOG", "0") == "1"
+HEARTBEAT_MS = int(os.getenv("UI_WATCHDOG_HEARTBEAT_MS", "50"))
+# A heartbeat this late counts as a stall
+STALL_MS = int(os.getenv("UI_WATCHDOG_STALL_MS", "200"))
+SAMPLE_MS = 20
+UI_WATCHDOG_REPORT = os.getenv(
+    "UI_WATCHDOG_REPORT", os.path.join(os.path.expanduser("~"), ".finance_tracker", "ui_stalls.json")
+)
+RECENT_STALLS = 50
+
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _is_project_frame(filename):
+    filename = os.path.abspath(filename)
+    return filename.startswith(_PROJECT_DIR) and "site-packages" not in filename
+
+
+def _describe(frame):
+    code = frame.f_code
+    filename = code.co_filename
+    if _is_project_frame(filename):
+        filename = os.path.relpath(filename, _PROJECT_DIR)
+    return f"{filename}:{frame.f_lineno} {getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _culprit(frame):
+    """Innermost page method on the stack, else the innermost project frame, else the top frame."""
+    project_frame = None
+    current = frame
+    while current is not None:
+        filename = current.f_code.co_filename
+        if _is_project_frame(filename):
+            if os.path.relpath(filename, _PROJECT_DIR).startswith("pages" + os.sep):
+                return _qualname(current)
+            if project_frame is None:
+                project_frame = current
+        current = current.f_back
+    return _qualname(project_frame or frame)
+
+
+def _qualname(frame):
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class UiWatchdog:
+    """Measures how long the Tk main loop is blocked and finds out by what.
+
+    A heartbeat `after` callback is scheduled every `heartbeat_ms`; how late
+    it runs is the dispatch lag and goes into a LatencyHistogram. A sampler
+    thread checks every SAMPLE_MS whether the last heartbeat is older than
+    `stall_ms` and, if so, captures the main thread's stack. When the late
+    heartbeat finally runs, the stall is recorded and attributed to the page
+    method seen most often in its samples (see report()).
+    """
+
+    def __init__(self, root, heartbeat_ms=HEARTBEAT_MS, stall_ms=STALL_MS):
+        self._root = root
+        self.heartbeat_interval = heartbeat_ms / 1000
+        self.stall_threshold = stall_ms / 1000
+        self.lag = LatencyHistogram()
+        self.stalls = []  # recent stalls, newest last
+        self._by_culprit = {}  # culprit -> [stalls, total seconds, max seconds]
+        self._lock = threading.Lock()
+        self._samples = Counter()  # culprit -> samples during the current stall
+        self._stacks = {}          # culprit -> formatted stack of its last sample
+        self._last_beat = None
+        self._main_thread_id = None
+        self._after_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+    # ------------ LIFECYCLE ------------
+
+    def start(self):
+        """Starts the heartbeat and the sampler (call from the Tk thread)."""
+        self._main_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._after_id = self._root.after(int(self.heartbeat_interval * 1000), self._heartbeat)
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, name="ui-watchdog", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._after_id is not None:
+            try:
+                self._root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    # ------------ HEARTBEAT (Tk thread) ------------
+
+    def _heartbeat(self):
+        now = time.perf_counter()
+        with self._lock:
+            lag = max(now - self._last_beat - self.heartbeat_interval, 0.0)
+            self.lag.record(lag)
+            if lag >= self.stall_threshold:
+                self._record_stall(lag)
+            self._samples.clear()
+            self._stacks.clear()
+            self._last_beat = now
+        self._after_id = self._root.after(int(self.heartbeat_interval * 1000), self._heartbeat)
+
+    def _record_stall(self, lag):
+        if self._samples:
+            culprit, samples = self._samples.most_common(1)[0]
+            stack = self._stacks[culprit]
+        else:
+            culprit, samples, stack = "unknown (no stack sample)", 0, []
+        stall = {
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "duration_ms": round(lag * 1000, 1),
+            "culprit": culprit,
+            "samples": samples,
+            "stack": stack,
+        }
+        self.stalls = self.stalls[-(RECENT_STALLS - 1):] + [stall]
+        entry = self._by_culprit.setdefault(culprit, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += lag
+        entry[2] = max(entry[2], lag)
+        print(f"UI stall: main loop blocked for {lag * 1000:.0f} ms in {culprit}")
+
+    # ------------ SAMPLER (background thread) ------------
+
+    def _sample_loop(self):
+        while not self._stop.wait(SAMPLE_MS / 1000):
+            with self._lock:
+                if time.perf_counter() - self._last_beat < self.heartbeat_interval + self.stall_threshold:
+                    continue
+            frame = sys._current_frames().get(self._main_thread_id)
+            if frame is None:
+                continue
+            culprit = _culprit(frame)
+            stack = []
+            current = frame
+            while current is not None:
+                stack.append(_describe(current))
+                current = current.f_back
+            del frame, current
+            with self._lock:
+                self._samples[culprit] += 1
+                self._stacks[culprit] = stack
+
+    # ------------ REPORT ------------
+
+    def report(self):
+        """Lag percentiles, stalls grouped by culprit (worst total first) and the recent stalls."""
+        with self._lock:
+            by_culprit = sorted(
+                ({"culprit": culprit, "stalls": n, "total_ms": round(total * 1000, 1),
+                  "max_ms": round(worst * 1000, 1)}
+                 for culprit, (n, total, worst) in self._by_culprit.items()),
+                key=lambda entry: entry["total_ms"], reverse=True,
+            )
+            return {
+                "heartbeat_ms": self.heartbeat_interval * 1000,
+                "stall_ms": self.stall_threshold * 1000,
+                "lag": self.lag.summary(),
+                "stalls": sum(entry["stalls"] for entry in by_culprit),
+                "by_culprit": by_culprit,
+                "recent": list(self.stalls),
+            }
+
+    def format_report(self):
+        report = self.report()
+        lag = report["lag"]
+        lines = [f"Main loop lag: p50 {lag['p50_ms']:.1f} ms, p95 {lag['p95_ms']:.1f} ms, "
+                 f"p99 {lag['p99_ms']:.1f} ms, max {lag['max_ms']:.1f} ms; "
+                 f"{report['stalls']} stalls over {report['stall_ms']:.0f} ms"]
+        if report["by_culprit"]:
+            lines.append(f"{'culprit':<60}{'stalls':>8}{'total ms':>11}{'max ms':>10}")
+            for entry in report["by_culprit"]:
+                lines.append(f"{entry['culprit']:<60}{entry['stalls']:>8}"
+                             f"{entry['total_ms']:>11.0f}{entry['max_ms']:>10.0f}")
+        return "\n".join(lines)
+
+    def save_report(self, path=UI_WATCHDOG_REPORT):
+        """Writes report() as JSON; returns the path or None on failure."""
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.report(), f, indent=2)
+            return path
+        except OSError as e:
+            print(f"Error writing the UI stall report: {e}")
+            return None
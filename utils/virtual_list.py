@@ -0,0 +1,196 @@
+import customtkinter as ctk
+
+
+class SelectionModel:
+    """Tracks checked rows by id, including rows that are not loaded yet.
+
+    With `all_selected` set, `exceptions` holds the ids the user unchecked;
+    otherwise it holds the ids the user checked.
+    """
+
+    def __init__(self):
+        self.all_selected = False
+        self.exceptions = set()
+
+    def is_selected(self, item_id):
+        return (item_id in self.exceptions) != self.all_selected
+
+    def set_selected(self, item_id, selected):
+        if selected != self.all_selected:
+            self.exceptions.add(item_id)
+        else:
+            self.exceptions.discard(item_id)
+
+    def select_all(self, selected):
+        self.all_selected = selected
+        self.exceptions.clear()
+
+    def clear(self):
+        self.select_all(False)
+
+    def is_everything_selected(self):
+        return self.all_selected and not self.exceptions
+
+    def has_selection(self):
+        return self.all_selected or bool(self.exceptions)
+
+    def needs_full_id_list(self):
+        """True when the selection cannot be resolved from explicitly checked ids."""
+        return self.all_selected
+
+    def resolve(self, all_ids=()):
+        """Returns the selected ids; `all_ids` is required when everything is selected."""
+        if self.all_selected:
+            return [i for i in all_ids if i not in self.exceptions]
+        return list(self.exceptions)
+
+
+class VirtualCheckList(ctk.CTkFrame):
+    """Scrollable checkbox list that only materializes the visible rows.
+
+    A fixed pool of checkboxes (visible rows plus `buffer` rows above and
+    below) is re-bound to different items while scrolling, so the widget
+    cost does not depend on the number of items.
+    """
+
+    def __init__(self, parent, format_row, item_id=lambda item: item[0], row_height=30,
+                 buffer=5, on_near_end=None, on_selection_change=None,
+                 empty_text="No expenses found.", **kwargs):
+        super().__init__(parent, **kwargs)
+        self.format_row = format_row
+        self.item_id = item_id
+        self.row_height = row_height
+        self.buffer = buffer
+        self.on_near_end = on_near_end
+        self.on_selection_change = on_selection_change
+
+        self.items = []
+        self.has_more = False
+        self.selection = SelectionModel()
+        self._offset = 0
+        self._rows = []  # [(checkbox, variable)]
+        self._row_items = {}  # pooled row index -> item id currently shown
+
+        self.viewport = ctk.CTkFrame(self, fg_color="transparent")
+        self.viewport.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.empty_label = ctk.CTkLabel(self.viewport, text=empty_text)
+
+        self.viewport.bind("<Configure>", lambda e: self._render())
+        self.viewport.bind("<Enter>", self._bind_mousewheel)
+        self.viewport.bind("<Leave>", self._unbind_mousewheel)
+
+    # ------------ DATA ------------
+
+    def set_items(self, items, has_more=False, keep_position=False):
+        """Replaces the displayed items."""
+        self.items = list(items)
+        self.has_more = has_more
+        if not keep_position:
+            self._offset = 0
+        self._render()
+
+    def append_items(self, items, has_more=False):
+        """Appends a freshly loaded page of items."""
+        self.items.extend(items)
+        self.has_more = has_more
+        self._render()
+
+    def refresh_visible(self):
+        """Re-applies labels and check states of the materialized rows."""
+        self._render()
+
+    # ------------ SCROLLING ------------
+
+    def yview(self, *args):
+        """Scrollbar command handler ('moveto' / 'scroll')."""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self._offset = float(args[1]) * self._content_height()
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            step = self.viewport.winfo_height() if args[2] == "pages" else self.row_height
+            self._offset += amount * step
+        self._render()
+
+    def _on_mousewheel(self, event):
+        if getattr(event, "num", None) == 4:
+            units = -1
+        elif getattr(event, "num", None) == 5:
+            units = 1
+        else:
+            units = -1 if event.delta > 0 else 1
+        self.yview("scroll", units * 3, "units")
+
+    def _bind_mousewheel(self, _event=None):
+        self.bind_all("<MouseWheel>", self._on_mousewheel)
+        self.bind_all("<Button-4>", self._on_mousewheel)
+        self.bind_all("<Button-5>", self._on_mousewheel)
+
+    def _unbind_mousewheel(self, _event=None):
+        self.unbind_all("<MouseWheel>")
+        self.unbind_all("<Button-4>")
+        self.unbind_all("<Button-5>")
+
+    # ------------ RENDERING ------------
+
+    def _content_height(self):
+        return len(self.items) * self.row_height
+
+    def _render(self):
+        view_height = max(self.viewport.winfo_height(), self.row_height)
+        content_height = self._content_height()
+        self._offset = max(0, min(self._offset, max(content_height - view_height, 0)))
+
+        if content_height:
+            self.scrollbar.set(self._offset / content_height,
+                               min((self._offset + view_height) / content_height, 1.0))
+        else:
+            self.scrollbar.set(0, 1)
+
+        if not self.items:
+            for cb, _ in self._rows:
+                cb.place_forget()
+            self._row_items.clear()
+            self.empty_label.place(relx=0.5, y=10, anchor="n")
+            return
+        self.empty_label.place_forget()
+
+        first = max(int(self._offset // self.row_height) - self.buffer, 0)
+        visible_count = int(view_height // self.row_height) + 1
+        last = min(first + visible_count + 2 * self.buffer, len(self.items))
+        self._ensure_pool(last - first)
+
+        self._row_items.clear()
+        for slot, (cb, var) in enumerate(self._rows):
+            index = first + slot
+            if index >= last:
+                cb.place_forget()
+                continue
+            item = self.items[index]
+            item_id = self.item_id(item)
+            self._row_items[slot] = item_id
+            cb.configure(text=self.format_row(item))
+            var.set(self.selection.is_selected(item_id))
+            cb.place(x=5, y=index * self.row_height - self._offset)
+
+        if self.has_more and self.on_near_end and last >= len(self.items) - self.buffer:
+            self.on_near_end()
+
+    def _ensure_pool(self, count):
+        while len(self._rows) < count:
+            slot = len(self._rows)
+            var = ctk.BooleanVar(value=False)
+            cb = ctk.CTkCheckBox(self.viewport, text="", variable=var,
+                                 command=lambda s=slot: self._on_row_toggled(s))
+            self._rows.append((cb, var))
+
+    def _on_row_toggled(self, slot):
+        item_id = self._row_items.get(slot)
+        if item_id is None:
+            return
+        self.selection.set_selected(item_id, self._rows[slot][1].get())
+        if self.on_selection_change:
+            self.on_selection_change()
@@ -0,0 +1,309 @@
+import itertools
+import json
+import os
+import threading
+from database import STORAGE_ID, InvalidExpenseError, bulk_insert_expenses, delete_expenses
+from utils.expense_validation import validate_expense
+
+# Directory holding one append-only journal of unsaved expenses per database and user
+WRITE_QUEUE_DIR = os.getenv(
+    "WRITE_QUEUE_DIR", os.path.join(os.path.expanduser("~"), ".finance_tracker", "pending")
+)
+# Queued writes are committed together once per window
+GROUP_COMMIT_MS = int(os.getenv("GROUP_COMMIT_MS", "300"))
+# Failed flushes are retried with exponential backoff up to this delay; the rows
+# stay queued (and in the journal) until they are saved or the user removes them
+MAX_RETRY_DELAY_MS = 60000
+# The user is told about the delay after this many failed attempts in a row
+WARN_AFTER_ATTEMPTS = 3
+
+
+class WriteQueue:
+    """Durable write-behind queue for new expenses.
+
+    `enqueue()` appends the expense to a per-user journal, shows it in the
+    ExpenseStore right away under a temporary negative id (a pending row) and
+    returns. Every `GROUP_COMMIT_MS` the queued rows are inserted in one
+    transaction on a worker; the pending rows are then replaced with the
+    server rows. Rows left in the journal (e.g. after a crash or while the DB
+    was unreachable) are replayed on the next login, so delivery is
+    at-least-once. Flushes that fail for a transient reason (e.g. the DB is
+    unreachable) are retried with a capped backoff; a row the DB can never
+    accept (invalid value) is split off the batch, dropped and reported
+    through `on_rejected`, so it cannot hold back the others. All methods run
+    on the Tk thread except the flush worker (`_insert_batch`).
+    """
+
+    def __init__(self, root, user_id, scheduler, store, on_failure=None, on_rejected=None,
+                 directory=WRITE_QUEUE_DIR):
+        self._root = root
+        self.user_id = user_id
+        self._scheduler = scheduler
+        self._store = store
+        self._on_failure = on_failure
+        self._on_rejected = on_rejected  # called with [(title, reason)] of dropped rows
+        self._path = os.path.join(directory, STORAGE_ID, f"user_{int(user_id)}.jsonl")
+        self._temp_ids = itertools.count(-1, -1)
+        self._queued = []        # [entry] waiting for the next flush
+        self._in_flight = []     # [entry] currently being committed
+        self._cancelled = set()  # temp ids removed by the user while in flight
+        self._after_id = None
+        self._attempts = 0
+        self._stopped = False
+        self._completed = None   # result of the flush worker, not yet delivered
+        self._worker_done = threading.Event()  # cleared while a flush worker is running
+        self._worker_done.set()
+        self._lock = threading.Lock()
+        self._replay_journal()
+
+    # ------------ PUBLIC API ------------
+
+    def enqueue(self, title, category, amount, date):
+        """Queues one expense and shows it immediately as a pending row."""
+        entry = {"temp_id": next(self._temp_ids), "title": title, "category": category,
+                 "amount": round(float(amount), 2), "date": date}
+        self._append_journal(entry)
+        self._queued.append(entry)
+        self._store.add_pending(self._row(entry))
+        self._schedule_flush()
+        return entry["temp_id"]
+
+    def discard(self, temp_ids):
+        """Drops queued rows the user deleted before they were saved."""
+        temp_ids = set(temp_ids)
+        self._queued = [e for e in self._queued if e["temp_id"] not in temp_ids]
+        # Rows already being committed are deleted on the server once their ids are known
+        self._cancelled |= temp_ids & {e["temp_id"] for e in self._in_flight}
+        self._store.resolve_pending(temp_ids)
+        self._rewrite_journal()
+
+    def pending_count(self):
+        return len(self._queued) + len(self._in_flight)
+
+    def stop(self, timeout=None):
+        """Stops flushing (e.g. on logout); unsaved rows stay in the journal.
+
+        A flush already in flight still commits; its result only updates the
+        journal, nothing is scheduled again for this user. With `timeout`
+        (on exit, before the pool closes) waits up to that many seconds for
+        the flush worker to finish.
+        """
+        with self._lock:
+            self._stopped = True
+            if self._completed is not None:
+                # Finished, but the result would no longer be delivered after logout
+                self._drop_finished(self._completed)
+                self._completed = None
+        if self._after_id is not None:
+            try:
+                self._root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        if timeout is not None and not self._worker_done.wait(timeout):
+            print("A queued expense flush is still running; its rows stay in the journal.")
+
+    # ------------ FLUSHING ------------
+
+    def _schedule_flush(self, delay_ms=GROUP_COMMIT_MS):
+        if self._after_id is None and not self._stopped:
+            self._after_id = self._root.after(delay_ms, self._flush)
+
+    def _flush(self):
+        self._after_id = None
+        if self._stopped or self._in_flight or not self._queued:
+            return
+        batch, invalid = [], []
+        for entry in self._queued:
+            try:
+                validate_expense(entry["title"], entry["category"], entry["amount"])
+                batch.append(entry)
+            except ValueError as e:
+                invalid.append((entry, str(e)))
+        self._in_flight, self._queued = batch, []
+        if invalid:
+            # e.g. rows journaled by an older version; they would fail every group commit
+            self._reject(invalid)
+            self._rewrite_journal()
+        if not batch:
+            return
+        rows = [(e["title"], e["category"], e["amount"], e["date"]) for e in batch]
+        self._worker_done.clear()
+        self._scheduler.submit("writes:flush", self._insert_batch, rows,
+                               on_done=self._on_flushed, on_error=self._on_flush_error,
+                               supersede=False)
+
+    def _insert_batch(self, rows):
+        """Flush worker; returns (inserted rows, [(index, reason)] rejected, [index] failed)."""
+        try:
+            result = self._insert_rows(rows)
+            with self._lock:
+                if self._stopped:
+                    # Logged out meanwhile: take the finished rows out of the journal here
+                    self._drop_finished(result)
+                else:
+                    self._completed = result
+            return result
+        finally:
+            self._worker_done.set()
+
+    def _insert_rows(self, rows, offset=0):
+        """Inserts `rows`; a batch the DB rejects is split until the invalid rows are isolated.
+
+        Rows that fail for any other reason (e.g. the DB is unreachable) are
+        reported as failed and retried later.
+        """
+        try:
+            inserted = bulk_insert_expenses(self.user_id, rows)
+        except InvalidExpenseError as e:
+            # Split outside the except block, so the failed statement is released first
+            inserted, reason = None, str(e)
+        if inserted is None:
+            if len(rows) == 1:
+                return [], [(offset, reason)], []
+            middle = len(rows) // 2
+            first = self._insert_rows(rows[:middle], offset)
+            second = self._insert_rows(rows[middle:], offset + middle)
+            return first[0] + second[0], first[1] + second[1], first[2] + second[2]
+        if not inserted:
+            return [], [], list(range(offset, offset + len(rows)))
+        return inserted, [], []
+
+    def _drop_finished(self, result):
+        """Keeps only the failed in-flight rows in the journal (called with the lock held)."""
+        failed = set(result[2])
+        self._in_flight = [e for i, e in enumerate(self._in_flight) if i in failed]
+        self._rewrite_journal()
+
+    def _on_flushed(self, result):
+        with self._lock:
+            self._completed = None
+        if self._stopped:
+            # The worker or stop() already took the finished rows out of the journal
+            return
+        inserted, rejected, failed = result
+        entries, self._in_flight = self._in_flight, []
+        unsaved = {i for i, _ in rejected} | set(failed)
+        saved = [e for i, e in enumerate(entries) if i not in unsaved]
+        pairs, orphaned = self._match(saved, inserted)
+        self._store.resolve_pending([e["temp_id"] for e in saved], [row for _, row in pairs])
+
+        cancelled = [row[0] for entry, row in pairs if entry["temp_id"] in self._cancelled]
+        if cancelled:
+            self._store.apply_delete(cancelled)
+            self._scheduler.submit("writes:cancel", delete_expenses, self.user_id, cancelled,
+                                   supersede=False)
+        if orphaned:
+            # Saved rows that could not be paired with a queued entry are still shown
+            self._store.apply_inserts(orphaned)
+        if rejected:
+            self._reject([(entries[i], reason) for i, reason in rejected
+                          if entries[i]["temp_id"] not in self._cancelled])
+        retry = [entries[i] for i in failed]
+        if retry:
+            self._retry_later(retry, "no rows were saved")
+            return
+        self._cancelled.clear()
+        self._attempts = 0
+        self._rewrite_journal()
+        if self._queued:
+            self._schedule_flush()
+
+    def _on_flush_error(self, error):
+        if self._stopped:
+            print(f"Error saving queued expenses: {error}")
+            return
+        entries, self._in_flight = self._in_flight, []
+        self._retry_later(entries, error)
+
+    def _retry_later(self, entries, error):
+        """Re-queues rows that failed for a transient reason and retries with backoff."""
+        print(f"Error saving queued expenses: {error}")
+        # Rows the user removed meanwhile are already gone from the store
+        entries = [e for e in entries if e["temp_id"] not in self._cancelled]
+        self._cancelled.clear()
+        self._attempts += 1
+        # Keep the rows (still pending in the store and in the journal) and try again later
+        self._queued = entries + self._queued
+        self._rewrite_journal()
+        self._schedule_flush(min(GROUP_COMMIT_MS * 2 ** self._attempts, MAX_RETRY_DELAY_MS))
+        if self._attempts == WARN_AFTER_ATTEMPTS and self._on_failure:
+            self._on_failure(len(self._queued))
+
+    def _reject(self, rejected):
+        """Drops rows the DB can never accept and reports them; the rest of the batch is unaffected."""
+        for entry, reason in rejected:
+            print(f"Dropping queued expense {entry['title']!r}: {reason}")
+        self._store.resolve_pending([entry["temp_id"] for entry, _ in rejected])
+        if rejected and self._on_rejected:
+            self._on_rejected([(entry["title"], reason) for entry, reason in rejected])
+
+    @staticmethod
+    def _match(entries, inserted):
+        """Pairs queued entries with the inserted rows.
+
+        bulk_insert_expenses returns the rows in input order, so a complete
+        result is paired by position; otherwise rows are paired by content.
+        Returns ([(entry, row)], unmatched rows).
+        """
+        if len(inserted) == len(entries):
+            return list(zip(entries, inserted)), []
+        remaining = list(inserted)
+        pairs = []
+        for entry in entries:
+            key = (entry["title"], entry["category"], round(float(entry["amount"]), 2), entry["date"])
+            for i, row in enumerate(remaining):
+                # The Azure backend may hand back Decimal amounts
+                if (row[1], row[2], round(float(row[3]), 2), str(row[4])) == key:
+                    pairs.append((entry, remaining.pop(i)))
+                    break
+        return pairs, remaining
+
+    @staticmethod
+    def _row(entry):
+        return (entry["temp_id"], entry["title"], entry["category"], entry["amount"], entry["date"])
+
+    # ------------ JOURNAL ------------
+
+    def _replay_journal(self):
+        """Re-queues the rows a previous session could not save."""
+        try:
+            with open(self._path, encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable write journal: {e}")
+            return
+        for entry in entries:
+            entry["temp_id"] = next(self._temp_ids)
+            self._queued.append(entry)
+            self._store.add_pending(self._row(entry))
+        if self._queued:
+            self._rewrite_journal()
+            self._schedule_flush()
+
+    def _append_journal(self, entry):
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            with open(self._path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            print(f"Error writing the write journal: {e}")
+
+    def _rewrite_journal(self):
+        """Replaces the journal with the rows that are still unsaved."""
+        entries = self._in_flight + self._queued
+        tmp_path = f"{self._path}.tmp"
+        try:
+            if not entries:
+                if os.path.exists(self._path):
+                    os.remove(self._path)
+                return
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(e) + "\n" for e in entries)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            print(f"Error writing the write journal: {e}")